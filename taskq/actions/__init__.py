@@ -1,5 +1,4 @@
-from . import read, write, add, backend, config, explore
-from .base import INFO
+from .base import ACTION_SPECS, INFO
 
 
-__all__ = ['INFO']
+__all__ = ['ACTION_SPECS', 'INFO']
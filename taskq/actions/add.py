@@ -9,6 +9,7 @@ import argparse
 import itertools
 
 from ..common import STDIN_TTY, FilterArgs
+from ..utils import parse_duration
 from .base import register_action, DryActionBase
 from .base import CLIError
 from .filter import parse_id_selector
@@ -22,7 +23,7 @@ from .repeat import (
 )
 
 
-@register_action('add', 'add jobs', aliases=['a'])
+@register_action('add')
 class AddAction(DryActionBase):
     add_options = {
         ('-G', '--gpus'): {
@@ -35,6 +36,27 @@ class AddAction(DryActionBase):
             'default': None,
             'help': 'Number of slots required.',
         },
+        ('-T', '--time'): {
+            'type': str,
+            'default': None,
+            'metavar': 'DURATION',
+            'help': (
+                'Expected run time, e.g. "90", "30m" or "2h". Lets the '
+                'scheduler start the job ahead of larger blocked jobs.'),
+        },
+        ('-P', '--priority'): {
+            'type': int,
+            'default': None,
+            'help': (
+                'Scheduling priority; higher runs first on queues with '
+                'scheduler = "priority", and may preempt preemptible jobs.'),
+        },
+        ('--preemptible', ): {
+            'action': 'store_true',
+            'help': (
+                'Let jobs of higher priority suspend or requeue this job, '
+                'see the preempt setting.'),
+        },
         ('-D', '--depends-on'): {
             'type': str,
             'default': None,
@@ -102,6 +124,11 @@ class AddAction(DryActionBase):
         if args.implicit_merge_head:
             args.ref = 'HEAD'
         args.repeat = validate_repeat_count(args.repeat)
+        if args.time is not None:
+            try:
+                args.time = parse_duration(args.time)
+            except ValueError as e:
+                raise CLIError(str(e)) from e
         return args
 
     @staticmethod
@@ -201,6 +228,12 @@ class AddAction(DryActionBase):
         )
         return gpus, slots
 
+    def _validate_option_support(self, value, feature, option):
+        if value is not None and not getattr(
+                self.backend, f'supports_{feature}', False):
+            raise CLIError(
+                f"backend {self.backend.name!r} does not support {option}")
+
     def _validate_ref_support(self, ref):
         if ref and not getattr(self.backend, 'supports_git_ref', False):
             raise CLIError(
@@ -232,8 +265,18 @@ class AddAction(DryActionBase):
         return {}
 
     @staticmethod
-    def _request_kwargs(ref_kwargs, merge_kwargs=None):
-        return dict(ref_kwargs, **(merge_kwargs or {}))
+    def _request_kwargs(
+        ref_kwargs, merge_kwargs=None, runtime=None, priority=None,
+        preemptible=False,
+    ):
+        kwargs = dict(ref_kwargs, **(merge_kwargs or {}))
+        if runtime is not None:
+            kwargs['runtime'] = runtime
+        if priority is not None:
+            kwargs['priority'] = priority
+        if preemptible:
+            kwargs['preemptible'] = True
+        return kwargs
 
     def _resolve_merge(self, branch, commit=True):
         if branch is None:
@@ -268,6 +311,10 @@ class AddAction(DryActionBase):
                 print('Use "-f -" to read commands from stdin.')
             return
         self._validate_ref_support(args.ref)
+        self._validate_option_support(args.time, 'runtime_estimate', '--time')
+        self._validate_option_support(args.priority, 'priority', '--priority')
+        self._validate_option_support(
+            args.preemptible or None, 'preemption', '--preemptible')
         if args.implicit_merge_head:
             merge_kwargs = self._resolve_merge(
                 args.merge, commit=args.commit)
@@ -282,7 +329,9 @@ class AddAction(DryActionBase):
             requests = [
                 AddRequest(
                     c, gpus, slots, args.depends_on,
-                    kwargs=self._request_kwargs(ref_kwargs, merge_kwargs),
+                    kwargs=self._request_kwargs(
+                        ref_kwargs, merge_kwargs, args.time, args.priority,
+                        args.preemptible),
                 )
                 for c in commands
             ]
@@ -297,6 +346,9 @@ class AddAction(DryActionBase):
                         depends_on,
                         request.kwargs.get('git_ref'),
                         args.merge,
+                        request.kwargs.get('runtime'),
+                        request.kwargs.get('priority'),
+                        request.kwargs.get('preemptible', False),
                     )
                 ),
                 chain=args.chain,
@@ -309,7 +361,9 @@ class AddAction(DryActionBase):
         requests = [
             AddRequest(
                 c, args.gpus, args.slots, args.depends_on,
-                kwargs=self._request_kwargs(ref_kwargs, merge_kwargs),
+                kwargs=self._request_kwargs(
+                    ref_kwargs, merge_kwargs, args.time, args.priority,
+                    args.preemptible),
             )
             for c in commands
         ]
@@ -6,7 +6,7 @@ from ..common import tqdm, FilterArgs
 from .base import register_action, ActionBase
 
 
-@register_action('backend', 'backend actions', aliases=['b'])
+@register_action('backend')
 class BackendAction(ActionBase):
     backend_options = {
         ('backend_action', ): {
@@ -1,9 +1,11 @@
 import sys
 from abc import abstractmethod
-from typing import Mapping, Type
+from dataclasses import dataclass
+from typing import Mapping, Tuple
 
 from .. import TOOL_NAME
 from ..backends import BACKENDS, BackendError, BackendNotFoundError
+from ..common import LazyRegistry
 
 
 class CLIError(Exception):
@@ -68,30 +70,61 @@ class DryActionBase(ActionBase):
         return args
 
 
-_actions: Mapping[str, Type[ActionBase]] = {}
-_aliases: Mapping[str, str] = {}
+@dataclass(frozen=True)
+class ActionSpec:
+    """Parser metadata of an action, known without importing its module."""
+    module: str
+    help: str = None
+    aliases: Tuple[str, ...] = ()
+
+
+ACTION_SPECS: Mapping[str, ActionSpec] = {
+    'list': ActionSpec('read', 'show job infos in compact format', ('ls',)),
+    'ids': ActionSpec('read', 'show job IDs', ('id',)),
+    'info': ActionSpec('read', 'show job infos'),
+    'commands': ActionSpec('read', 'show job commands', ('cmd', 'c')),
+    'export': ActionSpec(
+        'read', 'show job infos in machine-readable format', ('e',)),
+    'outputs': ActionSpec('read', 'show job outputs', ('o',)),
+    'interact': ActionSpec('read', 'attach to a running job', ('i',)),
+    'wait': ActionSpec('read', 'wait for jobs to finish', ('w',)),
+    'kill': ActionSpec('write', 'kill jobs', ('k',)),
+    'remove': ActionSpec('write', 'remove jobs', ('rm',)),
+    'rerun': ActionSpec('write', 'rerun jobs', ('rr',)),
+    'requeue': ActionSpec('write', 'requeue jobs', ('rq',)),
+    'add': ActionSpec('add', 'add jobs', ('a',)),
+    'backend': ActionSpec('backend', 'backend actions', ('b',)),
+    'config': ActionSpec('config', 'config action'),
+    'explore': ActionSpec(
+        'explore', 'run autonomous optimization campaigns', ('x',)),
+}
+_actions: Mapping[str, ActionBase] = LazyRegistry({
+    name: f'{__package__}.{spec.module}'
+    for name, spec in ACTION_SPECS.items()
+})
+_aliases: Mapping[str, str] = {
+    alias: name
+    for name, spec in ACTION_SPECS.items()
+    for alias in [*spec.aliases, name]
+}
 INFO = {
-    'default': None,
+    'default': 'list',
     'actions': _actions,
     'aliases': _aliases,
 }
 
 
-def register_action(name, help=None, aliases=(), default=False):
+def register_action(name):
+    """Instantiate the action ``name`` declared in ``ACTION_SPECS``."""
     def decorator(cls):
-        if name in INFO['actions']:
+        if name in _actions.entries:
             raise ValueError(f'Action {name!r} already registered.')
+        spec = ACTION_SPECS[name]
         kwargs = {
             'name': name,
-            'help': help,
-            'aliases': aliases,
+            'help': spec.help,
+            'aliases': list(spec.aliases),
         }
-        INFO['actions'][name] = cls(name, kwargs)
-        INFO['aliases'].update({a: name for a in list(aliases) + [name]})
-        if default:
-            if INFO['default'] is not None:
-                raise ValueError(
-                    f'Default action already set to {INFO["default"]!r}.')
-            INFO['default'] = name
+        _actions[name] = cls(name, kwargs)
         return cls
     return decorator
@@ -14,8 +14,7 @@ from ..explore.wizard import (
 from ..explore.workflow import ExploreWorkflow
 
 
-@register_action(
-    'explore', 'run autonomous optimization campaigns', aliases=['x'])
+@register_action('explore')
 class ExploreAction(ActionBase):
     options = {
         ('explore_action',): {
@@ -59,6 +59,10 @@ class FilterActionBase(ActionBase):
             'action': 'store_true',
             'help': 'Perform the action on queued/allocating jobs.',
         },
+        ('--suspended', ): {
+            'action': 'store_true',
+            'help': 'Perform the action on preempted, suspended jobs.',
+        },
         ('--merging', ): {
             'action': 'store_true',
             'help': 'Perform the action on jobs waiting to merge.',
@@ -98,6 +102,7 @@ class FilterActionBase(ActionBase):
             force_all=args.all,
             running=args.running,
             queued=args.queued,
+            suspended=args.suspended,
             merging=args.merging,
             success=args.success,
             failed=args.failed,
@@ -7,28 +7,34 @@ from pathlib import Path
 from datetime import datetime
 from abc import abstractmethod
 
-import tabulate
-from blessed import Terminal
-
 from ..common import ACTIVE_STATUSES, tqdm, FilterArgs, file_tail_lines
+from ..backends import watch_paths
 from ..utils import escape_command_display, timedelta_format
-from .base import register_action
+from ..watch import Watcher
+from .base import CLIError, register_action
 from .filter import FilterActionBase
 from .repeat import dry_add_command, merge_replay_options
 
 
-term = Terminal()
 COLOR_STATUS = {
-    'running': term.green,
-    'queued': term.yellow,
-    'merging': term.cyan,
-    'failed': term.red,
-    'killed': term.orange,
-    'success': term.blue,
-    'interrupted': term.orange,
+    'running': 'green',
+    'queued': 'yellow',
+    'suspended': 'magenta',
+    'merging': 'cyan',
+    'failed': 'red',
+    'killed': 'orange',
+    'success': 'blue',
+    'interrupted': 'orange',
 }
 
 
+@functools.lru_cache(maxsize=None)
+def terminal():
+    # blessed is slow to import; only tables and refresh loops need it.
+    from blessed import Terminal
+    return Terminal()
+
+
 class ReadActionBase(FilterActionBase):
     read_options = {
         ('-n', '--interval'): {
@@ -47,6 +53,7 @@ class ReadActionBase(FilterActionBase):
         raise NotImplementedError
 
     def loop(self, args):
+        term = terminal()
         with term.hidden_cursor(), term.fullscreen():
             while True:
                 try:
@@ -76,9 +83,7 @@ class ReadActionBase(FilterActionBase):
         return 0
 
 
-@register_action(
-    'list', 'show job infos in compact format',
-    aliases=['ls'], default=True)
+@register_action('list')
 class ListAction(ReadActionBase):
     list_options = {
         ('-l', '--length'): {
@@ -115,7 +120,8 @@ class ListAction(ReadActionBase):
 
     @staticmethod
     def _color_status(status):
-        return COLOR_STATUS[status](status).replace('\x1b(B', '')
+        color = getattr(terminal(), COLOR_STATUS[status])
+        return color(status).replace('\x1b(B', '')
 
     @staticmethod
     def _format_time(dt):
@@ -168,20 +174,21 @@ class ListAction(ReadActionBase):
         maxcolwidths = [
             None if c not in ['output', 'command'] else args.length
             for c in columns]
+        import tabulate
         table = tabulate.tabulate(
             rows, headers='keys', tablefmt=args.table_format,
             maxcolwidths=maxcolwidths)
         return table
 
 
-@register_action('ids', help='show job IDs', aliases=['id'])
+@register_action('ids')
 class IdsAction(ReadActionBase):
     def format(self, args, tqdm_disable=False):
         jobs = self.backend.job_info(self.ids, self.filters)
         return ', '.join(str(i['id']) for i in jobs)
 
 
-@register_action('info', 'show job infos')
+@register_action('info')
 class InfoAction(ReadActionBase):
     def format(self, args, tqdm_disable=False):
         info = self.backend.full_info(
@@ -204,7 +211,7 @@ class InfoAction(ReadActionBase):
         return '\n'.join(outputs)
 
 
-@register_action('commands', 'show job commands', aliases=['cmd', 'c'])
+@register_action('commands')
 class CommandsAction(ReadActionBase):
     commands_options = {
         ('-j', '--no-job-ids'): {
@@ -234,6 +241,9 @@ class CommandsAction(ReadActionBase):
                     i.get('depends_on'),
                     i.get('git_commit') or i.get('git_ref'),
                     merge_replay_options(i),
+                    i.get('runtime_estimate'),
+                    i.get('priority'),
+                    bool(i.get('preemptible')),
                 )
             else:
                 command = escape_command_display(i['command'])
@@ -244,8 +254,7 @@ class CommandsAction(ReadActionBase):
         return '\n'.join(outputs)
 
 
-@register_action(
-    'export', 'show job infos in machine-readable format', aliases=['e'])
+@register_action('export')
 class ExportAction(ReadActionBase):
     export_options = {
         ('-e', '--export-format'): {
@@ -289,7 +298,24 @@ class ExportAction(ReadActionBase):
             raise ValueError(f'Unknown format: {args.export_format}')
 
 
-@register_action('outputs', 'show job outputs', aliases=['o'])
+def parse_line_range(value):
+    """Parse ``A-B``, ``A-`` or ``A`` into 0-based ``(first, stop)``."""
+    start, dash, end = value.strip().partition('-')
+    if not start.isdigit() or int(start) < 1 or (end and not end.isdigit()):
+        raise CLIError(
+            f'invalid line range {value!r}; expected "A-B", "A-" or "A" '
+            'with line numbers from 1')
+    first = int(start) - 1
+    if not dash:
+        return first, first + 1
+    stop = int(end) if end else sys.maxsize
+    if stop <= first:
+        raise CLIError(
+            f'invalid line range {value!r}; start is greater than end')
+    return first, stop
+
+
+@register_action('outputs')
 class OutputsAction(ReadActionBase):
     outputs_options = {
         ('-F', '--follow'): {
@@ -303,6 +329,13 @@ class OutputsAction(ReadActionBase):
                 'Number of lines. '
                 'If 0, all lines will be shown.',
         },
+        ('-L', '--lines'): {
+            'type': str,
+            'default': None,
+            'help':
+                'Only show lines A-B, counted from 1; "A-" runs to the end. '
+                'Overrides --tail.',
+        },
         ('-R', '--raw'): {
             'action': 'store_true',
             'help': 'Do not format lines.',
@@ -313,6 +346,12 @@ class OutputsAction(ReadActionBase):
         super().__init__(name, parser_kwargs)
         self.options.update(self.outputs_options)
 
+    def transform_args(self, args):
+        args = super().transform_args(args)
+        if args.lines is not None:
+            args.lines = parse_line_range(args.lines)
+        return args
+
     def format(self, args, tqdm_disable=False):
         info = self.backend.job_info(self.ids, self.filters)
         if not info:
@@ -322,7 +361,10 @@ class OutputsAction(ReadActionBase):
             if i['status'] in ['queued']:
                 continue
             outputs.append(f'Job {i["id"]}:')
-            out = self.backend.output(i, args.tail, shell=False)
+            if args.lines is not None:
+                out = self.backend.output_lines(i, *args.lines)
+            else:
+                out = self.backend.output(i, args.tail, shell=False)
             if not args.raw:
                 out = textwrap.indent(out, '> ') + '\n'
             outputs.append(out)
@@ -346,29 +388,50 @@ class OutputsAction(ReadActionBase):
         elif output_file.exists():
             self._print_follow_chunk(output_file.read_text(
                 encoding='utf-8', errors='replace'))
+        elif info.get('status') not in ACTIVE_STATUSES:
+            # A finished job's log may only exist in compressed form.
+            self._print_follow_chunk(self.backend.output(info, tail))
         position = output_file.stat().st_size if output_file.exists() else 0
+        watcher = Watcher(watch_paths(self.backend, [info]), modify=True)
+        changes = None
         try:
-            while True:
-                if output_file.exists():
-                    size = output_file.stat().st_size
-                    if size < position:
-                        position = 0
-                    if size > position:
-                        with open(output_file, 'r', encoding='utf-8',
-                                  errors='replace') as f:
-                            f.seek(position)
-                            self._print_follow_chunk(f.read())
-                            position = f.tell()
-                current = self.backend.job_info([info['id']], FilterArgs())
-                if not current or current[0]['status'] not in ACTIVE_STATUSES:
-                    return 0
-                time.sleep(interval)
+            with watcher:
+                while True:
+                    if output_file.exists():
+                        size = output_file.stat().st_size
+                        if size < position:
+                            position = 0
+                        if size > position:
+                            with open(output_file, 'r', encoding='utf-8',
+                                      errors='replace') as f:
+                                f.seek(position)
+                                self._print_follow_chunk(f.read())
+                                position = f.tell()
+                    # Output alone cannot end the job; only ask the backend
+                    # when anything else changed or the watch timed out.
+                    if not changes or any(
+                        not Path(change).name.startswith(output_file.name)
+                        for change in changes
+                    ):
+                        current = self.backend.job_info(
+                            [info['id']], FilterArgs())
+                        if not current or (
+                            current[0]['status'] not in ACTIVE_STATUSES
+                        ):
+                            return 0
+                    if watcher.active:
+                        changes = watcher.wait()
+                    else:
+                        time.sleep(interval)
         except KeyboardInterrupt:
             return 0
 
     def main(self, args):
         if not args.follow:
             return super().main(args)
+        if args.lines is not None:
+            print('Cannot follow a line range.')
+            return 1
         info = self.backend.full_info(self.ids, self.filters)
         if not info:
             print('No jobs found.')
@@ -380,7 +443,7 @@ class OutputsAction(ReadActionBase):
         return self._follow_file(info[0], args.tail, interval)
 
 
-@register_action('interact', 'attach to a running job', aliases=['i'])
+@register_action('interact')
 class InteractAction(FilterActionBase):
     def main(self, args):
         info = self.backend.job_info(self.ids, self.filters)
@@ -397,7 +460,7 @@ class InteractAction(FilterActionBase):
         return 0
 
 
-@register_action('wait', 'wait for jobs to finish', aliases=['w'])
+@register_action('wait')
 class WaitAction(ReadActionBase):
     wait_options = {
         ('-p', '--progress'): {
@@ -411,17 +474,22 @@ class WaitAction(ReadActionBase):
         self.options.update(self.wait_options)
 
     def main(self, args, tqdm_disable=False):
-        f = FilterArgs(running=True, queued=True, merging=True)
+        f = FilterArgs(
+            running=True, queued=True, suspended=True, merging=True)
         info = self.backend.job_info(self.ids, f)
         pbar = tqdm(total=len(info), desc='wait') if args.progress else None
-        while True:
-            remaining = self.backend.job_info(self.ids, f)
-            if pbar:
-                pbar.n = len(info) - len(remaining)
-                pbar.refresh()
-            time.sleep(1)
-            if not remaining:
-                break
+        with Watcher(watch_paths(self.backend, info)) as watcher:
+            while True:
+                remaining = self.backend.job_info(self.ids, f)
+                if pbar:
+                    pbar.n = len(info) - len(remaining)
+                    pbar.refresh()
+                if not remaining:
+                    break
+                if watcher.active:
+                    watcher.wait()
+                else:
+                    time.sleep(1)
         if pbar:
             pbar.close()
             print('')
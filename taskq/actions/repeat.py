@@ -4,7 +4,7 @@ import shlex
 from dataclasses import dataclass, field
 
 from .. import TOOL_NAME
-from ..common import tqdm
+from ..backends import BatchRef, add_jobs, resolve_batch_refs
 from ..utils import escape_command_display
 from .base import CLIError
 
@@ -63,6 +63,7 @@ def dry_command_argv(command):
 
 def dry_add_command(
     command, gpus, slots, depends_on=None, ref=None, merge_branch=None,
+    runtime=None, priority=None, preemptible=False,
 ):
     argv = [TOOL_NAME, 'add']
     if ref:
@@ -72,6 +73,12 @@ def dry_add_command(
     if include_gpus(gpus):
         argv += ['-G', str(gpus)]
     argv += ['-N', str(slots)]
+    if runtime is not None:
+        argv += ['-T', f'{float(runtime):g}']
+    if priority is not None:
+        argv += ['-P', str(priority)]
+    if preemptible:
+        argv += ['--preemptible']
     if depends_on:
         argv += ['-D', ','.join(str(i) for i in depends_on)]
     argv += dry_command_argv(command)
@@ -136,7 +143,8 @@ def add_repeated(
 ):
     id_groups = []
     previous_by_command = {}
-    for request in tqdm(requests, desc=desc):
+    batch = []
+    for request in requests:
         ids = []
         for _ in range(repeat):
             depends_on = list(request.depends_on or [])
@@ -148,14 +156,18 @@ def add_repeated(
                     dry_run(request, depends_on)
                 job_id = '<id>'
             else:
-                job_id = backend.add(
-                    request.command,
-                    request.gpus,
-                    request.slots,
+                job_id = BatchRef(len(batch))
+                batch.append(dict(
+                    request.kwargs,
+                    command=request.command,
+                    gpus=request.gpus,
+                    slots=request.slots,
                     depends_on=depends_on,
-                    **request.kwargs,
-                )
+                ))
             ids.append(job_id)
             previous_by_command[request.command] = job_id
         id_groups.append(ids)
-    return id_groups
+    if not batch:
+        return id_groups
+    added = add_jobs(backend, batch, desc=desc)
+    return [resolve_batch_refs(ids, added) for ids in id_groups]
@@ -29,7 +29,7 @@ class WriteActionBase(FilterActionBase, DryActionBase):
         return args
 
 
-@register_action('kill', 'kill jobs', aliases=['k'])
+@register_action('kill')
 class KillAction(WriteActionBase):
     def kill(self, info, commit):
         for i in tqdm(info, desc='kill'):
@@ -38,7 +38,8 @@ class KillAction(WriteActionBase):
     def main(self, args):
         info = self.backend.job_info(self.ids, self.filters)
         info = [
-            i for i in info if i['status'] in {'running', 'merging'}
+            i for i in info
+            if i['status'] in {'running', 'suspended', 'merging'}
         ]
         if not info:
             print('No job to kill.')
@@ -48,7 +49,7 @@ class KillAction(WriteActionBase):
         print('Killed:', killed_ids)
 
 
-@register_action('remove', 'remove jobs', aliases=['rm'])
+@register_action('remove')
 class RemoveAction(WriteActionBase):
     def remove(self, info, commit):
         queued = [i for i in info if i['status'] == 'queued']
@@ -66,7 +67,7 @@ class RemoveAction(WriteActionBase):
         print('Removed:', removed_ids)
 
 
-@register_action('rerun', 'rerun jobs', aliases=['rr'])
+@register_action('rerun')
 class RerunAction(WriteActionBase):
     def __init__(self, name, parser_kwargs):
         super().__init__(name, parser_kwargs)
@@ -110,6 +111,14 @@ class RerunAction(WriteActionBase):
                     'git_root': i.get('git_root'),
                     'source_cwd': i.get('source_cwd') or i.get('cwd'),
                 })
+            for key, kwarg, feature in (
+                ('runtime_estimate', 'runtime', 'runtime_estimate'),
+                ('priority', 'priority', 'priority'),
+                ('preemptible', 'preemptible', 'preemption'),
+            ):
+                if i.get(key) is not None and getattr(
+                        self.backend, f'supports_{feature}', False):
+                    kwargs[kwarg] = i[key]
             merge_branch = merge_replay_options(i)
             if merge_branch is not None:
                 if commit:
@@ -132,6 +141,9 @@ class RerunAction(WriteActionBase):
                     request.kwargs.get('git_commit') or
                     request.kwargs.get('git_ref'),
                     merge_replay_options(request.kwargs),
+                    request.kwargs.get('runtime'),
+                    request.kwargs.get('priority'),
+                    request.kwargs.get('preemptible', False),
                 )
             ),
             desc='rerun',
@@ -150,7 +162,7 @@ class RerunAction(WriteActionBase):
         print('Reran:', reran_ids)
 
 
-@register_action('requeue', 'requeue jobs', aliases=['rq'])
+@register_action('requeue')
 class RequeueAction(RerunAction, RemoveAction):
     def main(self, args):
         info = self.backend.full_info(self.ids, self.filters)
@@ -1,5 +1,10 @@
-from . import dummy, tmux, ts
 from .base import BACKENDS, BackendError, BackendNotFoundError
+from .base import BatchRef, add_jobs, output_line, resolve_batch_refs
+from .base import watch_paths
 
 
-__all__ = ['BACKENDS', 'BackendError', 'BackendNotFoundError']
+__all__ = [
+    'BACKENDS', 'BackendError', 'BackendNotFoundError',
+    'BatchRef', 'add_jobs', 'output_line', 'resolve_batch_refs',
+    'watch_paths',
+]
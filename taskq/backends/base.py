@@ -2,12 +2,73 @@ import os
 import subprocess
 from shutil import which
 from abc import abstractmethod
+from dataclasses import dataclass
 from typing import Mapping, Type
 
+from ..common import LazyRegistry, tqdm
+from .gpus import gpu_inventory
+
+
+@dataclass(frozen=True)
+class BatchRef:
+    """Dependency on the job added by an earlier request of the same batch."""
+    index: int
+
+
+def resolve_batch_refs(depends_on, ids):
+    return [
+        ids[job_id.index] if isinstance(job_id, BatchRef) else job_id
+        for job_id in depends_on or []
+    ]
+
+
+def _add_sequentially(add, requests, desc=None):
+    ids = []
+    for request in tqdm(requests, desc=desc):
+        request = dict(request)
+        request['depends_on'] = resolve_batch_refs(
+            request.get('depends_on'), ids)
+        ids.append(add(**request))
+    return ids
+
+
+def add_jobs(backend, requests, desc=None):
+    """Add ``requests`` in one batch if ``backend`` supports it."""
+    add_many = getattr(backend, 'add_many', None)
+    if callable(add_many):
+        return add_many(requests, desc=desc)
+    return _add_sequentially(backend.add, requests, desc=desc)
+
+
+def _last_line(output, marker):
+    for line in reversed((output or '').splitlines()):
+        if marker in line:
+            return line
+    return None
+
+
+def output_line(backend, info, marker):
+    """Return the last output line of a job containing ``marker``."""
+    find = getattr(backend, 'output_line', None)
+    if callable(find):
+        return find(info, marker)
+    return _last_line(backend.output(info, 0), marker)
+
+
+def watch_paths(backend, infos):
+    """Return directories whose changes may change the state of ``infos``."""
+    paths = getattr(backend, 'watch_paths', None)
+    if not callable(paths):
+        return []
+    return [path for info in infos for path in paths(info)]
+
 
 class BackendBase:
     supports_git_ref = False
     supports_git_merge = False
+    supports_runtime_estimate = False
+    supports_priority = False
+    supports_preemption = False
 
     def __init__(self, name, config):
         super().__init__()
@@ -24,11 +85,7 @@ class BackendBase:
     @staticmethod
     def _resolve_slots(slots):
         if slots == 'auto':
-            try:
-                nv = subprocess.check_output(['nvidia-smi', '-L'])
-                return len(nv.splitlines())
-            except (FileNotFoundError, subprocess.CalledProcessError):
-                return 1
+            return gpu_inventory().count() or 1
         return int(slots)
 
     def exec(self, *args, commit=True, shell=False, check=True):
@@ -80,6 +137,31 @@ class BackendBase:
     def output(self, info, tail, shell=False):
         raise NotImplementedError
 
+    def output_line(self, info, marker):
+        """Return the last output line containing ``marker``, or ``None``.
+
+        Backends override this when they can find it without reading the
+        whole output.
+        """
+        return _last_line(self.output(info, 0), marker)
+
+    def output_lines(self, info, first, stop):
+        """Return output lines ``first`` up to ``stop``, 0-based.
+
+        Backends override this when they can read a range of lines without
+        reading the whole output.
+        """
+        lines = (self.output(info, 0) or '').splitlines(keepends=True)
+        return ''.join(lines[max(0, first):max(0, stop)])
+
+    def watch_paths(self, info):
+        """Return directories holding the output and state of a job.
+
+        Waiting commands sleep until a file in them changes; without any,
+        they poll.
+        """
+        return []
+
     def mark_workflow_failed(self, info, reason=None, phase='workflow'):
         """Override a successful managed job with a workflow-level failure."""
         raise NotImplementedError
@@ -91,6 +173,15 @@ class BackendBase:
     ):
         raise NotImplementedError
 
+    def add_many(self, requests, desc=None):
+        """Add jobs in order and return their ids.
+
+        Each request holds :meth:`add` keyword arguments, and its
+        ``depends_on`` may name earlier requests as :class:`BatchRef`.
+        Backends override this when a batch can share per-job overhead.
+        """
+        return _add_sequentially(self.add, requests, desc=desc)
+
     @abstractmethod
     def kill(self, info, commit=True):
         raise NotImplementedError
@@ -100,7 +191,11 @@ class BackendBase:
         raise NotImplementedError
 
 
-BACKENDS: Mapping[str, Type[BackendBase]] = {}
+BACKENDS: Mapping[str, Type[BackendBase]] = LazyRegistry({
+    'tmux': 'taskq.backends.tmux',
+    'ts': 'taskq.backends.ts',
+    'dummy': 'taskq.backends.dummy',
+})
 
 
 def register_backend(name):
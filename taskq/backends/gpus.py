@@ -0,0 +1,167 @@
+"""Cached inventory of the NVIDIA GPUs of this host.
+
+``nvidia-smi`` can take hundreds of milliseconds on a busy node, so one probe
+is shared through a small JSON record under the cache directory.  The tmux
+broker refreshes it whenever it places GPU jobs, and the CLI reads it to
+resolve ``slots = "auto"`` and to check that a GPU job can ever run, probing
+itself only once the record is older than ``INVENTORY_TTL``.  Records are
+kept per host name because the cache directory may be shared between hosts.
+
+Setting ``TASKQ_FAKE_GPUS`` to a number replaces ``nvidia-smi`` with a
+stand-in that reports that many idle GPUs, for trying GPU scheduling on
+machines without any.  Its records are kept apart from the real ones.
+"""
+
+import functools
+import json
+import os
+import re
+import socket
+import subprocess
+import time
+from pathlib import Path
+
+from ..common import user_cache_dir
+
+
+INVENTORY_TTL = 60
+FAKE_GPUS_ENV = 'TASKQ_FAKE_GPUS'
+FAKE_GPU_MEMORY = 81920
+
+
+def inventory_path(cache_root=None, fake=False):
+    cache_root = user_cache_dir() if cache_root is None else Path(cache_root)
+    host = re.sub(r'[^A-Za-z0-9_.-]+', '-', socket.gethostname()) or 'localhost'
+    return cache_root / 'gpus' / (f'{host}.fake.json' if fake else f'{host}.json')
+
+
+def fake_gpu_count():
+    value = os.environ.get(FAKE_GPUS_ENV)
+    if value in (None, ''):
+        return None
+    try:
+        count = int(value)
+    except ValueError:
+        count = -1
+    if count < 0:
+        # Imported here as the backend base module imports this one.
+        from .base import BackendError
+        raise BackendError(
+            f'{FAKE_GPUS_ENV} must be a non-negative number of GPUs, '
+            f'got {value!r}')
+    return count
+
+
+def probe_nvidia_smi():
+    """Return ``[[index, memory_free, memory_total], ...]`` from nvidia-smi.
+
+    Returns ``None`` when nvidia-smi is missing or reports no GPUs.
+    """
+    try:
+        result = subprocess.run(
+            [
+                'nvidia-smi',
+                '--query-gpu=index,memory.free,memory.total',
+                '--format=csv,noheader,nounits',
+            ],
+            capture_output=True, check=True, text=True,
+        )
+    except (FileNotFoundError, subprocess.CalledProcessError):
+        return None
+    gpus = []
+    for line in result.stdout.splitlines():
+        parts = [part.strip() for part in line.split(',')]
+        if len(parts) != 3:
+            continue
+        try:
+            gpus.append([int(parts[0]), float(parts[1]), float(parts[2])])
+        except ValueError:
+            continue
+    return gpus or None
+
+
+def fake_gpus(count):
+    return [
+        [index, float(FAKE_GPU_MEMORY), float(FAKE_GPU_MEMORY)]
+        for index in range(count)
+    ] or None
+
+
+class GPUInventory:
+    """GPUs of this host, probed at most once per ``ttl`` seconds.
+
+    ``path`` is the shared record, or ``None`` to keep the cache in memory;
+    ``provider`` returns the GPUs like ``probe_nvidia_smi``.
+    """
+
+    def __init__(self, path=None, ttl=INVENTORY_TTL, provider=None):
+        self.path = None if path is None else Path(path)
+        self.ttl = ttl
+        self.provider = provider or probe_nvidia_smi
+        self.record = None
+
+    def _read(self):
+        if self.path is None:
+            return self.record
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return record if isinstance(record, dict) else None
+
+    def _write(self, record):
+        self.record = record
+        if self.path is None:
+            return
+        temporary = self.path.with_name(
+            '.{}.{}.tmp'.format(self.path.name, os.getpid()))
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(temporary, 'w', encoding='utf-8') as f:
+                json.dump(record, f)
+            os.replace(temporary, self.path)
+        except OSError:
+            # The cache is an optimization; a read-only cache only costs probes.
+            temporary.unlink(missing_ok=True)
+
+    def refresh(self):
+        """Probe now and publish the result."""
+        gpus = self.provider()
+        self._write({'time': time.time(), 'gpus': gpus})
+        return gpus
+
+    def gpus(self, max_age=None):
+        """Return the GPUs, or ``None`` if there are none.
+
+        The record is reused while it is at most ``max_age`` seconds old,
+        which defaults to the inventory ``ttl``.
+        """
+        max_age = self.ttl if max_age is None else max_age
+        record = self._read()
+        if record is not None:
+            try:
+                age = time.time() - float(record['time'])
+            except (KeyError, TypeError, ValueError):
+                age = None
+            if age is not None and 0 <= age <= max_age:
+                return record.get('gpus')
+        return self.refresh()
+
+    def count(self):
+        return len(self.gpus() or [])
+
+
+def gpu_inventory(path=None, fake_count=None):
+    """Return the inventory shared by all backends and queues of this host.
+
+    ``fake_count`` selects the stand-in provider; without ``path`` it
+    defaults to ``TASKQ_FAKE_GPUS``.
+    """
+    if path is None:
+        if fake_count is None:
+            fake_count = fake_gpu_count()
+        path = inventory_path(fake=fake_count is not None)
+    if fake_count is None:
+        return GPUInventory(path)
+    return GPUInventory(path, provider=functools.partial(fake_gpus, fake_count))
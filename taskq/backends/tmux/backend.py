@@ -1,10 +1,13 @@
 import datetime
 import fcntl
+import getpass
+import importlib.util
 import json
 import os
 import re
 import shlex
 import shutil
+import signal
 import subprocess
 import sys
 import time
@@ -12,16 +15,29 @@ import uuid
 from pathlib import Path
 
 from ... import TOOL_NAME
-from ...common import STATUSES, dict_simplify, file_tail_lines
+from ...common import STATUSES, dict_simplify, tqdm
 from ...common import project_config_dir, user_cache_dir, user_config_dir
+from ...utils import parse_duration, parse_size
 from .. import git_ref as git_ref_utils
-from ..base import BackendBase, BackendError, register_backend
-from . import lifecycle
+from ..base import BackendBase, BackendError, BatchRef, register_backend
+from ..base import resolve_batch_refs
+from ..gpus import fake_gpu_count, gpu_inventory
+from . import control, lifecycle
+from .broker import NO_SERVER_ERRORS, SNAPSHOT_FORMAT, parse_snapshot
+from .broker import signal_process_group, wake_broker, wakeup_path
+from .journal import append_journal, journal_path
+from .lineindex import find_last_line
+from .outputs import COMPRESSIONS, read_output, read_output_lines
+from .outputs import rotated_segments
+from .preemption import PREEMPT_MODES, parse_signal
+from .scheduling import BACKFILL_MODES, policy_class
+from .store import close_store, job_store
 
 
 def render_wrapper(
     job_id, argv, session, output_file, start_file, env_exports,
     command_result_file=None, merge=False, submission_id=None,
+    wakeup_file=None, journal_file=None, output_capture='pane',
 ):
     template = Path(__file__).with_name('wrapper.sh').read_text(encoding='utf-8')
     if command_result_file is None:
@@ -32,7 +48,10 @@ def render_wrapper(
         output_file=shlex.quote(str(output_file)),
         start_file=shlex.quote(str(start_file)),
         command_result_file=shlex.quote(str(command_result_file)),
+        wakeup_file=shlex.quote(str(wakeup_file or '')),
+        journal_file=shlex.quote(str(journal_file or '')),
         merge_enabled='1' if merge else '0',
+        capture_to_file='1' if output_capture == 'file' else '0',
         submission_id=shlex.quote(str(submission_id or '')),
         env_exports=env_exports,
         job_id=job_id,
@@ -40,11 +59,17 @@ def render_wrapper(
     )
 
 
+OUTPUT_CAPTURE_MODES = ('pane', 'file')
+
+
 @register_backend('tmux')
 class TmuxBackend(BackendBase):
-    BROKER_VERSION = '9'
+    BROKER_VERSION = '24'
     supports_git_ref = True
     supports_git_merge = True
+    supports_runtime_estimate = True
+    supports_priority = True
+    supports_preemption = True
 
     def __init__(self, name, config):
         super().__init__(name, config)
@@ -67,9 +92,89 @@ class TmuxBackend(BackendBase):
         self.controllers_dir = self.state_dir / 'controllers'
         self.counter_file = self.state_dir / 'next_id'
         self.broker_config_file = self.state_dir / 'broker.json'
+        self.broker_token_file = self.state_dir / 'broker.token'
+        self.wakeup_file = wakeup_path(self.state_dir)
+        self.journal_file = journal_path(self.state_dir)
         self.tmux_default_config_file = Path(__file__).with_name('default.conf')
         self.prefix = self._sanitize_name(f'taskq-{state_name}-{queue}')
         self.broker_session = f'{self.prefix}-broker'
+        self.control_path = cache_root / f'{self.prefix}.ctl'
+        self.fake_gpus = fake_gpu_count()
+        self.gpu_inventory = gpu_inventory(fake_count=self.fake_gpus)
+        self.output_capture = self.config.get('output_capture', 'pane')
+        if self.output_capture not in OUTPUT_CAPTURE_MODES:
+            raise BackendError(
+                'output_capture must be one of: '
+                + ', '.join(OUTPUT_CAPTURE_MODES))
+        if self.config.get('backfill', 'easy') not in BACKFILL_MODES:
+            raise BackendError(
+                'backfill must be one of: ' + ', '.join(BACKFILL_MODES))
+        try:
+            policy_class(self.config.get('scheduler', 'fifo'))
+        except ValueError as e:
+            raise BackendError(f'scheduler: {e}') from e
+        self.fair_share = self._fair_share_config()
+        if self.config.get('preempt', 'requeue') not in PREEMPT_MODES:
+            raise BackendError(
+                'preempt must be one of: ' + ', '.join(PREEMPT_MODES))
+        try:
+            parse_signal(self.config.get('preempt_signal', 'TERM'))
+            parse_duration(self.config.get('preempt_grace', '30s'))
+        except ValueError as e:
+            raise BackendError(f'preemption: {e}') from e
+        self.global_slots = self.config.get('global_slots')
+        if self.global_slots is not None and not (
+                isinstance(self.global_slots, int) and self.global_slots > 0):
+            raise BackendError('global_slots must be a positive integer')
+        try:
+            parse_size(self.config.get('output_max_bytes', 0))
+        except ValueError as e:
+            raise BackendError(f'output_max_bytes: {e}') from e
+        for key in ('output_keep', 'job_history_limit'):
+            value = self.config.get(key)
+            if value is not None and (
+                    not isinstance(value, int) or isinstance(value, bool)
+                    or value < 0):
+                raise BackendError(f'{key} must be a non-negative integer')
+        compression = self.config.get('output_compression') or 'none'
+        if compression not in COMPRESSIONS:
+            raise BackendError(
+                'output_compression must be one of: '
+                + ', '.join(COMPRESSIONS))
+        if compression == 'zstd' and importlib.util.find_spec(
+                'zstandard') is None:
+            raise BackendError(
+                'output_compression = "zstd" requires the zstandard package')
+
+    def _fair_share_config(self):
+        try:
+            share = float(self.config.get('share', 1))
+        except (TypeError, ValueError):
+            share = 0
+        if share <= 0:
+            raise BackendError('share must be a positive number')
+        user_shares = self.config.get('user_shares') or {}
+        if not isinstance(user_shares, dict):
+            raise BackendError('user_shares must be a table of user = share')
+        try:
+            user_shares = {
+                str(user): float(value) for user, value in user_shares.items()}
+            half_life = parse_duration(
+                self.config.get('fair_share_half_life', '1d'))
+        except (TypeError, ValueError) as e:
+            raise BackendError(f'fair share: {e}') from e
+        return {
+            'share': share,
+            'user_shares': user_shares,
+            'fair_share_half_life': half_life,
+        }
+
+    @staticmethod
+    def _submitting_user():
+        try:
+            return getpass.getuser()
+        except (KeyError, OSError):
+            return None
 
     @staticmethod
     def _sanitize_name(name):
@@ -89,22 +194,8 @@ class TmuxBackend(BackendBase):
             'Install NVIDIA GPU tooling or submit the job with -G 0.'
         )
 
-    @staticmethod
-    def _nvidia_gpus_available():
-        try:
-            result = subprocess.run(
-                [
-                    'nvidia-smi',
-                    '--query-gpu=index',
-                    '--format=csv,noheader,nounits',
-                ],
-                capture_output=True,
-                check=True,
-                text=True,
-            )
-        except (FileNotFoundError, subprocess.CalledProcessError):
-            return False
-        return any(line.strip() for line in result.stdout.splitlines())
+    def _nvidia_gpus_available(self):
+        return self.gpu_inventory.gpus() is not None
 
     @staticmethod
     def _parse_time(value):
@@ -141,9 +232,9 @@ class TmuxBackend(BackendBase):
 
     @staticmethod
     def _tail_file(path, tail):
-        if not path or not os.path.exists(path):
+        if not path:
             return ''
-        return file_tail_lines(path, tail)
+        return read_output(path, tail)
 
     def _tmux_config_files(self):
         files = [self.tmux_default_config_file]
@@ -171,13 +262,19 @@ class TmuxBackend(BackendBase):
         self.jobs_dir.mkdir(parents=True, exist_ok=True)
 
     def _write_broker_config(self):
+        config = {'slots': self.config.get('slots', 1), **self.fair_share}
+        if self.global_slots is not None:
+            config['global_slots'] = self.global_slots
+        try:
+            with open(self.broker_config_file, 'r', encoding='utf-8') as f:
+                if json.load(f) == config:
+                    return
+        except (OSError, ValueError):
+            pass
         self.state_dir.mkdir(parents=True, exist_ok=True)
-        lifecycle.atomic_json(
-            self.broker_config_file,
-            {'slots': self.config.get('slots', 1)},
-        )
+        lifecycle.atomic_json(self.broker_config_file, config)
 
-    def _next_id(self):
+    def _next_ids(self, count):
         self._ensure_state()
         lock_file = self.state_dir / 'next_id.lock'
         with open(lock_file, 'w', encoding='utf-8') as lock:
@@ -186,8 +283,9 @@ class TmuxBackend(BackendBase):
                 job_id = int(self.counter_file.read_text().strip())
             except (FileNotFoundError, ValueError):
                 job_id = 1
-            self.counter_file.write_text(str(job_id + 1), encoding='utf-8')
-        return job_id
+            self.counter_file.write_text(
+                str(job_id + count), encoding='utf-8')
+        return list(range(job_id, job_id + count))
 
     def _job_dir(self, job_id):
         return self.jobs_dir / str(job_id)
@@ -208,7 +306,7 @@ class TmuxBackend(BackendBase):
         with open(self._meta_file(job_id), 'r', encoding='utf-8') as f:
             return json.load(f)
 
-    def _write_meta(self, meta):
+    def _write_meta_file(self, meta):
         self._ensure_state()
         job_dir = self._job_dir(meta['id'])
         job_dir.mkdir(parents=True, exist_ok=True)
@@ -219,6 +317,11 @@ class TmuxBackend(BackendBase):
             f.write('\n')
         os.replace(tmp, path)
 
+    def _write_meta(self, meta):
+        self._write_meta_file(meta)
+        self._job_store().put(meta)
+        append_journal(self.state_dir, meta['id'])
+
     def _write_env(self, job_id, env):
         self._ensure_state()
         job_dir = self._job_dir(job_id)
@@ -294,18 +397,11 @@ class TmuxBackend(BackendBase):
                 f'{meta.get("id")}; job was left unchanged')
         return result
 
+    def _job_store(self):
+        return job_store(self.state_dir)
+
     def _all_meta(self):
-        if not self.jobs_dir.exists():
-            return []
-        metas = []
-        for path in self.jobs_dir.glob('*/meta.json'):
-            try:
-                with open(path, 'r', encoding='utf-8') as f:
-                    metas.append(json.load(f))
-            except (json.JSONDecodeError, OSError):
-                continue
-        metas.sort(key=lambda meta: int(meta['id']))
-        return metas
+        return [meta for _, meta in self._job_store().load()]
 
     def _all_controllers(self):
         controllers = []
@@ -414,9 +510,33 @@ class TmuxBackend(BackendBase):
         except subprocess.CalledProcessError:
             return ''
 
+    def _session_snapshot(self):
+        """Map live sessions to pane pids with a single ``list-panes`` call."""
+        try:
+            return parse_snapshot(
+                self._tmux('list-panes', '-a', '-F', SNAPSHOT_FORMAT))
+        except subprocess.CalledProcessError as e:
+            stderr = e.stderr or b''
+            if isinstance(stderr, bytes):
+                stderr = stderr.decode('utf-8', errors='replace')
+            if any(error in stderr for error in NO_SERVER_ERRORS):
+                return {}
+            return None
+        except OSError:
+            return None
+
+    def _running_snapshot(self, metas):
+        # A snapshot only pays off when some selected job needs probing.
+        if not any(meta.get('status') == 'running' for meta in metas):
+            return None
+        return self._session_snapshot()
+
     def _capture_pane(self, session, tail):
         if not self._session_exists(session):
             return ''
+        return self._capture_live_pane(session, tail)
+
+    def _capture_live_pane(self, session, tail):
         args = ['capture-pane', '-p', '-t', session]
         if tail and tail > 0:
             args += ['-S', f'-{tail}']
@@ -451,6 +571,20 @@ class TmuxBackend(BackendBase):
         if visible_gpus:
             command += ['--visible-gpus', str(visible_gpus)]
         command += ['--socket-path', self.socket_path]
+        command += ['--control-path', str(self.control_path)]
+        command += ['--gpu-inventory', str(self.gpu_inventory.path)]
+        for key in (
+            'job_history_limit', 'output_max_bytes', 'output_keep',
+            'output_compression', 'backfill', 'scheduler', 'preempt',
+            'preempt_signal', 'preempt_grace',
+        ):
+            value = self.config.get(key)
+            if value is not None and key == 'output_max_bytes':
+                value = parse_size(value)
+            if value is not None:
+                command += ['--' + key.replace('_', '-'), str(value)]
+        if self.fake_gpus is not None:
+            command += ['--fake-gpus', str(self.fake_gpus)]
         return shlex.join(command)
 
     def _source_tmux_config(self):
@@ -469,6 +603,82 @@ class TmuxBackend(BackendBase):
             check=False,
         )
 
+    def _broker_fingerprint(self, broker_command):
+        config_files = []
+        for path in self._tmux_config_files():
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            config_files.append([str(path), stat.st_mtime_ns, stat.st_size])
+        return {'command': broker_command, 'config_files': config_files}
+
+    def _broker_pid_alive(self, pid):
+        if not isinstance(pid, int) or pid <= 0:
+            return False
+        if os.path.isdir('/proc/self'):
+            # Guards against the pid having been reused by another process,
+            # including the broker of another queue or socket.
+            try:
+                with open(f'/proc/{pid}/cmdline', 'rb') as f:
+                    argv = [os.fsdecode(arg) for arg in f.read().split(b'\0')]
+            except OSError:
+                return False
+            return self._is_own_broker(argv)
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return True
+
+    def _is_own_broker(self, argv):
+        """Whether ``argv`` runs this queue's broker, also under ``sh -c``."""
+        candidates = [argv]
+        for arg in argv:
+            try:
+                candidates.append(shlex.split(arg))
+            except ValueError:
+                continue
+        expected = ['--state-dir', str(self.state_dir)]
+        return any(
+            'taskq.backends.tmux.broker' in words and any(
+                words[i:i + 2] == expected for i in range(len(words) - 1))
+            for words in candidates
+        )
+
+    def _broker_token_valid(self, fingerprint):
+        """Whether the broker recorded by the last full check still runs.
+
+        The token holds the broker's pane pid, the broker version and a
+        fingerprint of its command line and tmux config files, so a current
+        broker is recognized without running tmux at all.
+        """
+        try:
+            with open(self.broker_token_file, 'r', encoding='utf-8') as f:
+                token = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if not isinstance(token, dict):
+            return False
+        if token.get('version') != self.BROKER_VERSION:
+            return False
+        if token.get('fingerprint') != fingerprint:
+            return False
+        return self._broker_pid_alive(token.get('pid'))
+
+    def _write_broker_token(self, fingerprint):
+        pid = self._pane_pid(self.broker_session)
+        if pid is None:
+            self.broker_token_file.unlink(missing_ok=True)
+            return
+        lifecycle.atomic_json(self.broker_token_file, {
+            'pid': pid,
+            'version': self.BROKER_VERSION,
+            'fingerprint': fingerprint,
+        })
+
     def _ensure_broker(self, commit=True):
         broker_command = self._broker_command()
         if not commit:
@@ -480,9 +690,13 @@ class TmuxBackend(BackendBase):
             return
         self._ensure_state()
         self._write_broker_config()
+        fingerprint = self._broker_fingerprint(broker_command)
+        if self._broker_token_valid(fingerprint):
+            return
         if self._session_exists(self.broker_session):
             self._source_tmux_config()
             if self._broker_version() == self.BROKER_VERSION:
+                self._write_broker_token(fingerprint)
                 return
             self._tmux('kill-session', '-t', self.broker_session, check=False)
         self._tmux(
@@ -494,26 +708,41 @@ class TmuxBackend(BackendBase):
             '@taskq_broker_version', self.BROKER_VERSION,
             check=False,
         )
+        self._write_broker_token(fingerprint)
 
     def _wait_for_session(self, job_id):
-        while True:
-            meta = self._read_meta(job_id)
-            session = meta.get('session')
-            if session and self._session_exists(session):
-                return session
-            if meta.get('status') not in ['queued', 'running']:
-                return None
-            time.sleep(float(self.config.get('broker_interval', 1)))
-
-    def _refresh_meta(self, meta):
+        interval = float(self.config.get('broker_interval', 1))
+        events = control.subscribe(
+            self.control_path, [int(job_id)], timeout=max(interval, 1))
+        try:
+            while True:
+                meta = self._read_meta(job_id)
+                session = meta.get('session')
+                if session and self._session_exists(session):
+                    return session
+                if meta.get('status') not in ['queued', 'running']:
+                    return None
+                if events is None:
+                    time.sleep(interval)
+                elif next(events, False) is False:
+                    events = None
+        finally:
+            if events is not None:
+                events.close()
+
+    def _refresh_meta(self, meta, sessions=None):
         if meta.get('status') == 'merging':
             if lifecycle.refresh_merge(meta, self._now()):
                 self._write_meta(meta)
             return meta
-        if meta.get('status') != 'running':
+        if meta.get('status') not in ('running', 'suspended'):
             return meta
         session = meta.get('session')
-        if session and self._session_exists(session):
+        if sessions is not None:
+            alive = session in sessions
+        else:
+            alive = bool(session) and self._session_exists(session)
+        if alive:
             command_result = lifecycle.command_result(meta)
             if command_result is not None:
                 lifecycle.finish_command(
@@ -526,9 +755,10 @@ class TmuxBackend(BackendBase):
                 self._write_meta(meta)
                 self._tmux('kill-session', '-t', session, check=False)
                 return meta
-            pane_text = self._capture_pane(session, 200)
-            exitcode = self._finished_exitcode(
-                meta, pane_text)
+            exitcode = None
+            if not lifecycle.reports_command_result(meta):
+                pane_text = self._capture_live_pane(session, 200)
+                exitcode = self._finished_exitcode(meta, pane_text)
             if exitcode is not None:
                 meta.update({
                     'status': 'success' if exitcode == 0 else 'failed',
@@ -538,7 +768,10 @@ class TmuxBackend(BackendBase):
                 self._write_meta(meta)
                 self._tmux('kill-session', '-t', session, check=False)
                 return meta
-            pid = self._pane_pid(session)
+            if sessions is not None:
+                pid = sessions.get(session)
+            else:
+                pid = self._pane_pid(session)
             if pid:
                 meta['pid'] = pid
             return meta
@@ -546,7 +779,7 @@ class TmuxBackend(BackendBase):
             meta = self._read_meta(meta['id'])
         except FileNotFoundError:
             return meta
-        if meta.get('status') != 'running':
+        if meta.get('status') not in ('running', 'suspended'):
             if meta.get('status') == 'merging':
                 if lifecycle.refresh_merge(meta, self._now()):
                     self._write_meta(meta)
@@ -562,7 +795,9 @@ class TmuxBackend(BackendBase):
                 lifecycle.refresh_merge(meta, self._now())
             self._write_meta(meta)
             return meta
-        exitcode = self._finished_exitcode(meta)
+        exitcode = None
+        if not lifecycle.reports_command_result(meta):
+            exitcode = self._finished_exitcode(meta)
         if exitcode is not None:
             meta.update({
                 'status': 'success' if exitcode == 0 else 'failed',
@@ -581,39 +816,31 @@ class TmuxBackend(BackendBase):
 
     @staticmethod
     def _finished_exitcode(meta, pane_text=None):
-        # Merge commands hand off exclusively through the atomic command
-        # result sidecar.  Their stdout is untrusted and may contain text that
+        # Legacy completion of jobs without command-result.json.  Merge
+        # commands hand off exclusively through the atomic command result
+        # sidecar.  Their stdout is untrusted and may contain text that
         # resembles the legacy wrapper marker.
         if isinstance(meta.get('merge'), dict):
             return None
         output_file = meta.get('output_file')
         marker = (
             f'[taskq] job {meta["id"]} finished with exit code ')
-        chunks = []
-        if output_file:
-            try:
-                with open(output_file, 'rb') as f:
-                    f.seek(0, os.SEEK_END)
-                    size = f.tell()
-                    f.seek(max(0, size - 65536))
-                    chunks.append(f.read().decode('utf-8', errors='replace'))
-            except OSError:
-                pass
-        if pane_text:
-            chunks.append(pane_text)
-        for data in chunks:
-            for line in reversed(data.splitlines()):
-                if marker not in line:
-                    continue
-                value = line.split(marker, 1)[1].split(maxsplit=1)[0]
-                try:
-                    return int(value)
-                except ValueError:
-                    return None
-        return None
+        line = find_last_line(output_file, marker) if output_file else None
+        if line is None and pane_text:
+            line = next((
+                line for line in reversed(pane_text.splitlines())
+                if marker in line
+            ), None)
+        if line is None:
+            return None
+        value = line.split(marker, 1)[1].split(maxsplit=1)[0]
+        try:
+            return int(value)
+        except ValueError:
+            return None
 
-    def _to_job_info(self, meta):
-        meta = self._refresh_meta(meta)
+    @staticmethod
+    def _to_job_info(meta):
         return {
             'id': int(meta['id']),
             'status': meta.get('status', 'failed'),
@@ -621,7 +848,6 @@ class TmuxBackend(BackendBase):
         }
 
     def _full_from_meta(self, meta):
-        meta = self._refresh_meta(meta)
         start_time = self._parse_time(meta.get('start_time'))
         end_time = self._parse_time(meta.get('end_time'))
         if not start_time:
@@ -642,6 +868,11 @@ class TmuxBackend(BackendBase):
             'gpus_required': int(meta.get('gpus_required') or 0),
             'gpu_ids': meta.get('gpu_ids', ''),
             'depends_on': meta.get('depends_on', []),
+            'runtime_estimate': meta.get('runtime_estimate'),
+            'priority': meta.get('priority'),
+            'preemptible': meta.get('preemptible'),
+            'preemptions': meta.get('preemptions'),
+            'user': meta.get('user'),
             'enqueue_time': self._parse_time(meta.get('enqueue_time')),
             'start_time': start_time,
             'end_time': end_time,
@@ -670,14 +901,48 @@ class TmuxBackend(BackendBase):
     def rerun_env(self, info):
         return self._read_env_file(info.get('env_file'))
 
+    @staticmethod
+    def _filter_statuses(filters):
+        if filters is None or filters.all:
+            return None
+        return [status for status in STATUSES if getattr(filters, status)]
+
+    def _select_meta(self, ids=None, filters=None):
+        """Load only the jobs that ``ids`` and ``filters`` can match.
+
+        Nonterminal jobs are still returned for any status filter because a
+        refresh may move them into one of the requested statuses.
+        """
+        return [
+            meta for _, meta in self._job_store().load(
+                ids=ids, statuses=self._filter_statuses(filters))
+        ]
+
+    def _broker_request(self, op, **params):
+        return control.request(self.control_path, op, **params)
+
+    def _current_meta(self, op, ids=None, filters=None):
+        """Return refreshed metadata of the jobs ``ids`` and ``filters`` select.
+
+        A live broker answers ``op`` from the job table it refreshes on every
+        tick; otherwise the job files are read and running jobs probed here.
+        """
+        response = self._broker_request(
+            op, ids=None if ids is None else sorted(ids),
+            statuses=self._filter_statuses(filters))
+        if response is not None:
+            return response['jobs']
+        metas = self._select_meta(ids, filters)
+        sessions = self._running_snapshot(metas)
+        return [self._refresh_meta(meta, sessions) for meta in metas]
+
     def _filter_info(self, info, ids=None, filters=None):
         if ids is not None:
+            ids = set(ids)
             info = [i for i in info if i['id'] in ids]
-        if filters is not None and not filters.all:
-            for status in STATUSES:
-                if getattr(filters, status):
-                    continue
-                info = [i for i in info if i['status'] != status]
+        statuses = self._filter_statuses(filters)
+        if statuses is not None:
+            info = [i for i in info if i['status'] in statuses]
         return info
 
     def backend_getset(self, key, value=None):
@@ -698,6 +963,7 @@ class TmuxBackend(BackendBase):
                 self._write_broker_config()
                 if self._broker_version() != self.BROKER_VERSION:
                     self._ensure_broker()
+                self._wake_broker()
         return self.config.get('slots')
 
     def backend_command(self, command, commit=True):
@@ -770,6 +1036,7 @@ class TmuxBackend(BackendBase):
             git_ref_utils.remove_worktree(meta)
         git_ref_utils.remove_nested_worktrees(self.state_dir / 'explore')
         git_ref_utils.remove_nested_worktrees(self.state_dir / 'merge')
+        close_store(self.state_dir)
         shutil.rmtree(self.state_dir, ignore_errors=True)
         self.state_dir.mkdir(parents=True, exist_ok=True)
         lock_file = self.state_dir / 'next_id.lock'
@@ -778,13 +1045,15 @@ class TmuxBackend(BackendBase):
             self.counter_file.write_text('1', encoding='utf-8')
 
     def job_info(self, ids=None, filters=None):
-        info = [self._to_job_info(meta) for meta in self._all_meta()]
+        metas = self._current_meta('list', ids, filters)
+        info = [self._to_job_info(meta) for meta in metas]
         return self._filter_info(info, ids, filters)
 
     def full_info(
         self, ids=None, filters=None, extra_func=None, tqdm_disable=False
     ):
-        info = [self._full_from_meta(meta) for meta in self._all_meta()]
+        metas = self._current_meta('info', ids, filters)
+        info = [self._full_from_meta(meta) for meta in metas]
         info = self._filter_info(info, ids, filters)
         for item in info:
             if extra_func:
@@ -812,6 +1081,23 @@ class TmuxBackend(BackendBase):
             out = self._tail_file(meta.get('output_file'), tail)
         return out
 
+    def output_lines(self, info, first, stop):
+        path = self._read_meta(info['id']).get('output_file')
+        if not path:
+            return super().output_lines(info, first, stop)
+        return read_output_lines(path, first, stop)
+
+    def watch_paths(self, info):
+        # meta.json, command-result.json and output.log all live here.
+        return [self._job_dir(info['id'])]
+
+    def output_line(self, info, marker):
+        path = self._read_meta(info['id']).get('output_file')
+        if not path or rotated_segments(path):
+            # Rotated segments are not indexed; read them all.
+            return super().output_line(info, marker)
+        return find_last_line(path, marker)
+
     def mark_workflow_failed(self, info, reason=None, phase='workflow'):
         """Mark a managed campaign agent job as a workflow-level failure."""
         meta = self._refresh_meta(self._read_meta(info['id']))
@@ -871,7 +1157,56 @@ class TmuxBackend(BackendBase):
         self, command, gpus=None, slots=None, depends_on=None, env=None,
         git_ref=None, git_commit=None, git_root=None, source_cwd=None,
         cwd=None, metadata=None, internal=False, workspace_owner=None,
-        merge=None,
+        merge=None, runtime=None, priority=None, preemptible=False,
+    ):
+        return self.add_many([{
+            'command': command, 'gpus': gpus, 'slots': slots,
+            'depends_on': depends_on, 'env': env, 'git_ref': git_ref,
+            'git_commit': git_commit, 'git_root': git_root,
+            'source_cwd': source_cwd, 'cwd': cwd, 'metadata': metadata,
+            'internal': internal, 'workspace_owner': workspace_owner,
+            'merge': merge, 'runtime': runtime, 'priority': priority,
+            'preemptible': preemptible,
+        }])[0]
+
+    def add_many(self, requests, desc=None):
+        """Add jobs with one ID reservation, GPU probe and broker check.
+
+        Every request is validated before any job is created, and if creating
+        one job fails, the jobs already created for the batch are removed
+        before the broker ever learns about them.
+        """
+        specs = [self._add_spec(**request) for request in requests]
+        if not specs:
+            return []
+        job_ids = self._next_ids(len(specs))
+        gpus_available = None
+        if any(spec['gpus'] > 0 for spec in specs):
+            gpus_available = self._nvidia_gpus_available()
+        metas = []
+        try:
+            for job_id, spec in zip(job_ids, tqdm(specs, desc=desc)):
+                spec['depends_on'] = [
+                    int(dependency) for dependency in
+                    resolve_batch_refs(spec['depends_on'], job_ids)
+                ]
+                metas.append(self._create_job(job_id, spec, gpus_available))
+        except BaseException:
+            for meta in metas:
+                self._discard_job(meta)
+            raise
+        self._job_store().put_many(metas)
+        append_journal(self.state_dir, *job_ids)
+        self._ensure_broker()
+        if self._broker_request('add', ids=job_ids) is None:
+            self._wake_broker()
+        return [str(job_id) for job_id in job_ids]
+
+    def _add_spec(
+        self, command, gpus=None, slots=None, depends_on=None, env=None,
+        git_ref=None, git_commit=None, git_root=None, source_cwd=None,
+        cwd=None, metadata=None, internal=False, workspace_owner=None,
+        merge=None, runtime=None, priority=None, preemptible=False,
     ):
         alloc_config = self.config.get('alloc', {})
         gpus = gpus if gpus is not None else alloc_config.get('gpus', 0)
@@ -900,8 +1235,40 @@ class TmuxBackend(BackendBase):
             if not cwd.is_dir():
                 raise BackendError(f'job cwd does not exist: {cwd}')
             cwd = str(cwd)
-        depends_on = [int(job_id) for job_id in depends_on or []]
-        job_id = self._next_id()
+        depends_on = [
+            job_id if isinstance(job_id, BatchRef) else int(job_id)
+            for job_id in depends_on or []
+        ]
+        if runtime is not None:
+            runtime = float(runtime)
+            if runtime < 0:
+                raise BackendError('runtime cannot be negative')
+        if priority is not None:
+            priority = int(priority)
+        if preemptible and merge is not None:
+            raise BackendError('preemptible jobs cannot be merged')
+        return {
+            'command': command, 'gpus': gpus, 'slots': slots,
+            'depends_on': depends_on, 'env': env, 'git_ref': git_ref,
+            'git_commit': git_commit, 'git_root': git_root,
+            'source_cwd': source_cwd, 'cwd': cwd, 'metadata': metadata,
+            'internal': internal, 'workspace_owner': workspace_owner,
+            'merge': merge, 'runtime': runtime, 'priority': priority,
+            'preemptible': bool(preemptible),
+        }
+
+    def _create_job(self, job_id, spec, gpus_available):
+        """Write the files of one job; the caller indexes and announces it."""
+        command = spec['command']
+        gpus = spec['gpus']
+        slots = spec['slots']
+        depends_on = spec['depends_on']
+        env = spec['env']
+        cwd = spec['cwd']
+        metadata = spec['metadata']
+        internal = spec['internal']
+        workspace_owner = spec['workspace_owner']
+        merge = spec['merge']
         submission_id = uuid.uuid4().hex
         session = self._session_name(job_id)
         job_dir = self._job_dir(job_id)
@@ -915,10 +1282,10 @@ class TmuxBackend(BackendBase):
             try:
                 git_meta, cwd = self._prepare_git_checkout(
                     job_dir,
-                    git_ref=git_ref,
-                    git_commit=git_commit,
-                    git_root=git_root,
-                    source_cwd=source_cwd,
+                    git_ref=spec['git_ref'],
+                    git_commit=spec['git_commit'],
+                    git_root=spec['git_root'],
+                    source_cwd=spec['source_cwd'],
                 )
             except BackendError:
                 shutil.rmtree(job_dir, ignore_errors=True)
@@ -965,6 +1332,7 @@ class TmuxBackend(BackendBase):
             'start_time': None,
             'end_time': None,
             'output_file': str(output_file),
+            'output_capture': self.output_capture,
             'env_file': str(env_file),
             'wrapper': str(wrapper),
             'start_file': str(start_file),
@@ -975,7 +1343,14 @@ class TmuxBackend(BackendBase):
             'metadata': metadata,
             'internal': bool(internal),
             'command_result_file': sidecars['command_result_file'],
+            'user': self._submitting_user(),
         }
+        if spec['runtime'] is not None:
+            meta['runtime_estimate'] = spec['runtime']
+        if spec['priority'] is not None:
+            meta['priority'] = spec['priority']
+        if spec['preemptible']:
+            meta['preemptible'] = True
         meta.update({k: v for k, v in git_meta.items() if v is not None})
         if merge is not None:
             merge_spec = dict(merge)
@@ -1001,8 +1376,8 @@ class TmuxBackend(BackendBase):
                 'merge_result_file': sidecars['merge_result_file'],
             })
         self._write_env(job_id, job_env)
-        self._write_meta(meta)
-        if int(gpus or 0) > 0 and not self._nvidia_gpus_available():
+        self._write_meta_file(meta)
+        if int(gpus or 0) > 0 and not gpus_available:
             message = self._gpu_unavailable_message(gpus)
             output_file.parent.mkdir(parents=True, exist_ok=True)
             with open(output_file, 'a', encoding='utf-8') as f:
@@ -1013,10 +1388,10 @@ class TmuxBackend(BackendBase):
             })
             if isinstance(meta.get('merge'), dict):
                 meta['merge']['registration_state'] = 'not_registered'
-            self._write_meta(meta)
+            self._write_meta_file(meta)
             git_ref_utils.remove_worktree(meta)
             print(message, file=sys.stderr)
-            return str(job_id)
+            return meta
         env_exports = self._encode_env(job_env)
         wrapper.write_text(
             render_wrapper(
@@ -1029,6 +1404,9 @@ class TmuxBackend(BackendBase):
                 command_result_file=sidecars['command_result_file'],
                 merge=merge is not None,
                 submission_id=submission_id,
+                wakeup_file=self.wakeup_file,
+                journal_file=self.journal_file,
+                output_capture=self.output_capture,
             ),
             encoding='utf-8',
         )
@@ -1043,8 +1421,17 @@ class TmuxBackend(BackendBase):
                 git_ref_utils.remove_worktree(meta)
                 shutil.rmtree(job_dir, ignore_errors=True)
                 raise
-        self._ensure_broker()
-        return str(job_id)
+        return meta
+
+    def _discard_job(self, meta):
+        if isinstance(meta.get('merge'), dict):
+            self._cancel_merge(meta, remove=True)
+        git_ref_utils.remove_worktree(meta)
+        shutil.rmtree(self._job_dir(meta['id']), ignore_errors=True)
+        self._job_store().delete(meta['id'])
+
+    def _wake_broker(self):
+        wake_broker(self.state_dir)
 
     def kill(self, info, commit=True):
         meta = self._read_meta(info['id'])
@@ -1052,9 +1439,29 @@ class TmuxBackend(BackendBase):
         if not commit:
             print(f'{self._command} {" ".join(self._socket_args())} kill-session -t {session}')
             return
-        merge_request = self._cancel_merge(meta, required=True)
+        if not isinstance(meta.get('merge'), dict):
+            response = self._broker_request('kill', ids=[int(info['id'])])
+            if response is not None and response['killed']:
+                return
+        try:
+            self._kill_meta(meta)
+        finally:
+            self._wake_broker()
+
+    def _kill_session(self, meta):
+        session = meta.get('session')
         if session and self._session_exists(session):
+            if meta.get('status') == 'suspended':
+                # Stopped processes only act on the hangup once continued,
+                # and the pane pid can no longer be looked up once it is gone.
+                pid = meta.get('pid') or self._pane_pid(session)
+                if pid:
+                    signal_process_group(pid, signal.SIGCONT)
             self._tmux('kill-session', '-t', session, check=False)
+
+    def _kill_meta(self, meta):
+        merge_request = self._cancel_merge(meta, required=True)
+        self._kill_session(meta)
         if isinstance(meta.get('merge'), dict):
             lifecycle.refresh_merge(meta, self._now())
         request_status = (
@@ -1093,7 +1500,9 @@ class TmuxBackend(BackendBase):
             print(f'rm -r {self._job_dir(info["id"])}')
             return
         self._cancel_merge(meta, remove=True, required=True)
-        if session and self._session_exists(session):
-            self._tmux('kill-session', '-t', session, check=False)
+        self._kill_session(meta)
         git_ref_utils.remove_worktree(meta)
         shutil.rmtree(self._job_dir(info['id']), ignore_errors=True)
+        self._job_store().delete(info['id'])
+        append_journal(self.state_dir, info['id'], event='remove')
+        self._wake_broker()
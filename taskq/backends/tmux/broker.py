@@ -1,14 +1,33 @@
 import argparse
 import datetime
+import functools
 import json
 import os
-import random
+import select
 import shlex
+import signal
+import stat
 import subprocess
 import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 from . import lifecycle
+from ...utils import parse_duration
+from ..gpus import GPUInventory, fake_gpus, probe_nvidia_smi
+from .control import open_control
+from .dependencies import DependencyGraph
+from .fairshare import HALF_LIFE, FairShare, fairshare_path
+from .journal import JobTable
+from .ledger import ResourceLedger, ledger_path
+from .lineindex import find_last_line, update_index
+from .outputs import COMPRESSIONS, OUTPUT_KEEP, archive_output
+from .outputs import rotate_output
+from .preemption import PREEMPT_MODES, candidates, choose_victims
+from .preemption import grace_expired, parse_signal, preempted_exit
+from .scheduling import BACKFILL_MODES, RuntimeHistory, elapsed
+from .scheduling import policy_class, priority, reserve
+from .store import index_meta, job_store
 
 
 def now():
@@ -53,6 +72,54 @@ def session_exists(args, session):
     return result.returncode == 0
 
 
+SNAPSHOT_FORMAT = '#{session_name} #{pane_pid}'
+NO_SERVER_ERRORS = ('no server running', 'error connecting to')
+
+
+def parse_snapshot(text):
+    sessions = {}
+    for line in text.splitlines():
+        name, _, pid = line.rpartition(' ')
+        if not name:
+            continue
+        try:
+            pid = int(pid)
+        except ValueError:
+            pid = None
+        sessions.setdefault(name, pid)
+    return sessions
+
+
+def session_snapshot(args):
+    """Map every live session to its first pane pid with one tmux call.
+
+    Returns ``None`` when tmux fails for a reason other than having no
+    server, so callers fall back to probing sessions one by one.
+    """
+    try:
+        result = subprocess.run(
+            tmux_cmd(args, 'list-panes', '-a', '-F', SNAPSHOT_FORMAT),
+            capture_output=True,
+            text=True,
+        )
+    except OSError:
+        return None
+    if result.returncode != 0:
+        if any(error in result.stderr for error in NO_SERVER_ERRORS):
+            return {}
+        return None
+    return parse_snapshot(result.stdout)
+
+
+def probe_session(args, session, sessions=None):
+    """Return ``(alive, pane_pid)`` from a snapshot or individual probes."""
+    if sessions is not None:
+        return session in sessions, sessions.get(session)
+    if not session_exists(args, session):
+        return False, None
+    return True, pane_pid(args, session)
+
+
 def controller_paths(args):
     root = Path(args.state_dir) / 'controllers'
     return sorted(root.glob('*.json')) if root.exists() else []
@@ -62,7 +129,7 @@ def write_controller(meta, path):
     lifecycle.atomic_json(path, meta)
 
 
-def guard_controllers(args):
+def guard_controllers(args, sessions=None):
     current_time = time.time()
     for path in controller_paths(args):
         try:
@@ -90,7 +157,7 @@ def guard_controllers(args):
         except (TypeError, ValueError):
             continue
         stale = current_time - max(heartbeat_time, last_restart) > timeout
-        running = session_exists(args, session)
+        running, _ = probe_session(args, session, sessions)
         if running and not stale:
             if heartbeat_time > last_restart and meta.get('restart_count'):
                 meta['restart_count'] = 0
@@ -150,37 +217,32 @@ def visible_gpu_ids(args):
     return parse_gpu_ids(visible)
 
 
+def gpu_inventory(args):
+    inventory = getattr(args, '_gpu_inventory', None)
+    if inventory is None:
+        fake_count = getattr(args, 'fake_gpus', None)
+        inventory = GPUInventory(
+            getattr(args, 'gpu_inventory', None),
+            provider=(
+                probe_nvidia_smi if fake_count is None
+                else functools.partial(fake_gpus, fake_count)),
+        )
+        args._gpu_inventory = inventory
+    return inventory
+
+
 def query_free_gpus(args):
-    cmd = [
-        'nvidia-smi',
-        '--query-gpu=index,memory.free,memory.total',
-        '--format=csv,noheader,nounits',
-    ]
-    try:
-        result = subprocess.run(
-            cmd, capture_output=True, check=True, text=True)
-    except (FileNotFoundError, subprocess.CalledProcessError):
+    # Reuse a probe from this tick or one the CLI just published.
+    gpus = gpu_inventory(args).gpus(max_age=args.interval)
+    if gpus is None:
         return None
     visible = set(visible_gpu_ids(args))
     free = []
-    seen = 0
-    for line in result.stdout.splitlines():
-        parts = [part.strip() for part in line.split(',')]
-        if len(parts) != 3:
-            continue
-        try:
-            gpu_id = int(parts[0])
-            memory_free = float(parts[1])
-            memory_total = float(parts[2])
-        except ValueError:
-            continue
-        seen += 1
+    for gpu_id, memory_free, memory_total in gpus:
         if visible and gpu_id not in visible:
             continue
         if memory_total and memory_free > args.gpu_free_perc / 100 * memory_total:
             free.append(gpu_id)
-    if seen == 0:
-        return None
     if not visible:
         return free
     return [gpu_id for gpu_id in visible_gpu_ids(args) if gpu_id in free]
@@ -198,26 +260,130 @@ def broker_config_path(args):
     return Path(args.state_dir) / 'broker.json'
 
 
-def runtime_slots(args):
+# Without active jobs or controllers nothing but a nudge can create work, so
+# the fallback poll is stretched to this many seconds.
+IDLE_INTERVAL = 60
+
+
+def wakeup_path(state_dir):
+    return Path(state_dir) / 'broker.wake'
+
+
+def open_wakeup(args):
+    """Create and open the broker's wakeup FIFO.
+
+    The FIFO is opened read-write so it never reports EOF while the broker
+    waits, and so nudges never block even if no client currently holds it.
+    """
+    path = wakeup_path(args.state_dir)
+    try:
+        try:
+            if not stat.S_ISFIFO(os.stat(path).st_mode):
+                path.unlink()
+                os.mkfifo(path)
+        except FileNotFoundError:
+            os.mkfifo(path)
+    except FileExistsError:
+        pass
+    except OSError:
+        return None
+    try:
+        return os.open(path, os.O_RDWR | os.O_NONBLOCK)
+    except OSError:
+        return None
+
+
+def wait_for_wakeup(fd, timeout, control=None):
+    """Block until a nudge arrives or ``timeout`` seconds pass.
+
+    Control socket requests that arrive meanwhile are served; those that
+    change jobs end the wait like a nudge.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        readers = [] if fd is None else [fd]
+        writers = []
+        if control is not None:
+            readers += control.readers()
+            writers += control.writers()
+        remaining = max(0, deadline - time.monotonic())
+        if not readers:
+            time.sleep(remaining)
+            return False
+        ready, writable, _ = select.select(readers, writers, [], remaining)
+        woken = False
+        if fd is not None and fd in ready:
+            woken = True
+            while True:
+                try:
+                    if not os.read(fd, 4096):
+                        break
+                except BlockingIOError:
+                    break
+        if control is not None and control.handle(ready, writable):
+            woken = True
+        if woken:
+            return True
+        if not ready and not writable:
+            return False
+
+
+def wake_broker(state_dir):
+    """Nudge a live broker; a no-op when no broker holds the FIFO open."""
+    try:
+        fd = os.open(wakeup_path(state_dir), os.O_WRONLY | os.O_NONBLOCK)
+    except OSError:
+        return False
+    try:
+        os.write(fd, b'.')
+    except OSError:
+        return False
+    finally:
+        os.close(fd)
+    return True
+
+
+def runtime_config(args):
+    """Return the settings the backend writes to ``broker.json``.
+
+    The file is only read again once it changed.
+    """
     path = broker_config_path(args)
     try:
         stat = path.stat()
     except OSError:
-        args._runtime_slots_cache = (None, args.slots)
-        return args.slots
+        args._runtime_config_cache = (None, {})
+        return {}
 
     signature = (stat.st_mtime_ns, stat.st_size)
-    cache = getattr(args, '_runtime_slots_cache', None)
+    cache = getattr(args, '_runtime_config_cache', None)
     if cache and cache[0] == signature:
         return cache[1]
 
     try:
         data = read_meta(path)
-        slots = int(data.get('slots', args.slots))
-    except (json.JSONDecodeError, OSError, TypeError, ValueError):
-        slots = args.slots
-    args._runtime_slots_cache = (signature, slots)
-    return slots
+    except (json.JSONDecodeError, OSError):
+        data = {}
+    if not isinstance(data, dict):
+        data = {}
+    args._runtime_config_cache = (signature, data)
+    return data
+
+
+def runtime_slots(args):
+    try:
+        return int(runtime_config(args).get('slots', args.slots))
+    except (TypeError, ValueError):
+        return args.slots
+
+
+def global_slots(args):
+    """Return the slot limit shared by all queues of the socket, if any."""
+    value = runtime_config(args).get('global_slots')
+    try:
+        return None if value is None else int(value)
+    except (TypeError, ValueError):
+        return None
 
 
 def read_meta(path):
@@ -231,30 +397,190 @@ def write_meta(meta, path):
         json.dump(meta, f, indent=2, sort_keys=True)
         f.write('\n')
     os.replace(tmp, path)
+    index_meta(path, meta)
 
 
 def all_meta(args):
-    root = jobs_dir(args)
-    if not root.exists():
-        return []
-    metas = []
-    for path in sorted(root.glob('*/meta.json')):
+    return job_store(args.state_dir).load()
+
+
+def pane_history_limit(args, meta):
+    """Scrollback of a job pane; file-captured jobs never print to theirs."""
+    if meta.get('output_capture') == 'file':
+        return 0
+    limit = getattr(args, 'job_history_limit', None)
+    return args.history_limit if limit is None else limit
+
+
+def output_worker(args):
+    """Return the thread that rotates and compresses logs for this broker."""
+    worker = getattr(args, '_output_worker', None)
+    if worker is None:
+        worker = args._output_worker = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='taskq-output')
+        args._output_pending = set()
+    return worker
+
+
+def submit_output_task(args, job_id, function, *task_args):
+    worker = output_worker(args)
+    key = (job_id, function.__name__)
+    if key in args._output_pending:
+        return
+    args._output_pending.add(key)
+    future = worker.submit(function, *task_args)
+    future.add_done_callback(lambda _: args._output_pending.discard(key))
+
+
+def maintain_outputs(args, metas, finished):
+    """Index and rotate logs of running jobs and archive finished ones.
+
+    The work runs on a background thread so large logs never delay a tick.
+    """
+    max_bytes = getattr(args, 'output_max_bytes', 0) or 0
+    keep = getattr(args, 'output_keep', OUTPUT_KEEP)
+    compression = getattr(args, 'output_compression', 'none') or 'none'
+    previous = getattr(args, '_output_sizes', {})
+    sizes = args._output_sizes = {}
+    for _, meta in metas:
+        output_file = meta.get('output_file')
+        if meta.get('status') != 'running' or not output_file:
+            continue
+        job_id = int(meta['id'])
         try:
-            metas.append((path, read_meta(path)))
-        except (json.JSONDecodeError, OSError):
+            size = sizes[job_id] = os.stat(output_file).st_size
+        except OSError:
             continue
-    return metas
+        if max_bytes > 0 and size > max_bytes:
+            submit_output_task(
+                args, job_id, rotate_output, output_file, keep, compression)
+        elif size != previous.get(job_id):
+            submit_output_task(args, job_id, update_index, output_file)
+    if compression == 'none':
+        return
+    for meta in finished:
+        if meta.get('output_file'):
+            submit_output_task(
+                args, int(meta['id']), archive_output, meta['output_file'],
+                compression)
+
+
+def job_table(args):
+    """Return the in-memory table of active jobs kept by this broker."""
+    table = getattr(args, '_job_table', None)
+    if table is None:
+        table = args._job_table = JobTable(args.state_dir)
+    return table
+
+
+def dependency_graph(args):
+    """Return the dependency graph kept across ticks of this broker."""
+    graph = getattr(args, '_dependency_graph', None)
+    if graph is None:
+        graph = args._dependency_graph = DependencyGraph()
+    return graph
+
+
+def runtime_history(args):
+    """Return the run times of finished jobs, loaded once per broker."""
+    history = getattr(args, '_runtime_history', None)
+    if history is None:
+        history = args._runtime_history = RuntimeHistory()
+        history.observe(
+            meta for _, meta in job_store(args.state_dir).finished(
+                statuses=['success']))
+    return history
+
+
+def scheduling_policy(args):
+    """Return the policy ordering ready jobs, created once per broker."""
+    policy = getattr(args, '_scheduling_policy', None)
+    if policy is None:
+        cls = policy_class(getattr(args, 'scheduler', None) or 'fifo')
+        policy = args._scheduling_policy = cls(runtime_history(args))
+    return policy
+
+
+def queue_name(args):
+    return Path(args.state_dir).name
+
 
+def resource_ledger(args):
+    """Return this queue's view of the socket's resource ledger."""
+    ledger = getattr(args, '_resource_ledger', None)
+    if ledger is None:
+        ledger = args._resource_ledger = ResourceLedger(
+            ledger_path(args.state_dir), queue_name(args))
+    return ledger
 
-def refresh_running(args, path, meta):
+
+def fair_share(args):
+    """Return the socket's fair-share accounting, created once per broker."""
+    arbiter = getattr(args, '_fair_share', None)
+    if arbiter is None:
+        arbiter = args._fair_share = FairShare(fairshare_path(args.state_dir))
+    try:
+        arbiter.half_life = float(
+            runtime_config(args).get('fair_share_half_life', HALF_LIFE))
+    except (TypeError, ValueError):
+        arbiter.half_life = HALF_LIFE
+    return arbiter
+
+
+def report_usage(args, policy, running):
+    """Charge this queue's running jobs to the socket's fair share.
+
+    Returns the GPUs and socket-wide slots to leave free for queues using
+    less than this one.  Policies taking part in fair share are also handed
+    the decayed usage of every user.
+    """
+    config = runtime_config(args)
+    arbiter = fair_share(args)
+    queue = queue_name(args)
+    try:
+        arbiter.update(queue, config.get('share', 1.0), [
+            (meta.get('user'), slots_required(meta),
+             len(parse_gpu_ids(meta.get('gpu_ids'))))
+            for meta in running
+        ], getattr(args, '_gpu_demand', 0), getattr(args, '_slot_demand', 0))
+    except OSError:
+        return 0, 0
+    if policy.fair_share:
+        policy.user_usage = arbiter.user_usage(config.get('user_shares'))
+    return arbiter.reserved_gpus(queue), arbiter.reserved_slots(queue)
+
+
+def running_estimates(args, running):
+    """Return ``(remaining seconds, slots, gpu ids)`` of running jobs."""
+    history = runtime_history(args)
+    current = datetime.datetime.now()
+    estimates = []
+    for meta in running:
+        estimate = history.estimate(meta)
+        spent = elapsed(meta, current)
+        remaining = 0.0
+        if estimate is not None and spent is not None:
+            remaining = max(0.0, estimate - spent)
+        estimates.append((
+            remaining, slots_required(meta),
+            parse_gpu_ids(meta.get('gpu_ids'))))
+    return estimates
+
+
+def refresh_running(args, path, meta, sessions=None):
     if meta.get('status') == 'merging':
         if lifecycle.refresh_merge(meta, now()):
             write_meta(meta, path)
         return meta
-    if meta.get('status') != 'running':
+    if meta.get('status') not in ('running', 'suspended'):
+        return meta
+    if meta.get('preempt_time') and refresh_preempted(
+            args, path, meta, sessions):
         return meta
     session = meta.get('session')
-    if session and session_exists(args, session):
+    alive, pid = (
+        probe_session(args, session, sessions) if session else (False, None))
+    if alive:
         command_result = lifecycle.command_result(meta)
         if command_result is not None:
             lifecycle.finish_command(
@@ -267,7 +593,9 @@ def refresh_running(args, path, meta):
             write_meta(meta, path)
             tmux(args, 'kill-session', '-t', session, check=False)
             return meta
-        exitcode = finished_exitcode(meta)
+        exitcode = None
+        if not lifecycle.reports_command_result(meta):
+            exitcode = finished_exitcode(meta)
         if exitcode is not None:
             meta.update({
                 'status': 'success' if exitcode == 0 else 'failed',
@@ -277,7 +605,6 @@ def refresh_running(args, path, meta):
             write_meta(meta, path)
             tmux(args, 'kill-session', '-t', session, check=False)
             return meta
-        pid = pane_pid(args, session)
         if pid and meta.get('pid') != pid:
             meta['pid'] = pid
             write_meta(meta, path)
@@ -286,7 +613,7 @@ def refresh_running(args, path, meta):
         meta = read_meta(path)
     except OSError:
         return meta
-    if meta.get('status') != 'running':
+    if meta.get('status') not in ('running', 'suspended'):
         if meta.get('status') == 'merging':
             if lifecycle.refresh_merge(meta, now()):
                 write_meta(meta, path)
@@ -302,7 +629,9 @@ def refresh_running(args, path, meta):
             lifecycle.refresh_merge(meta, now())
         write_meta(meta, path)
         return meta
-    exitcode = finished_exitcode(meta)
+    exitcode = None
+    if not lifecycle.reports_command_result(meta):
+        exitcode = finished_exitcode(meta)
     if exitcode is not None:
         meta.update({
             'status': 'success' if exitcode == 0 else 'failed',
@@ -320,53 +649,48 @@ def refresh_running(args, path, meta):
     return meta
 
 
+def refresh_preempted(args, path, meta, sessions=None):
+    """Requeue a preempted job once it exited or its grace period passed.
+
+    Returns False, for the caller to record the result as usual, if the job
+    exited other than through the preemption signal meanwhile.
+    """
+    result = lifecycle.command_result(meta)
+    signum = getattr(args, 'preempt_signal', signal.SIGTERM)
+    if result is not None and not preempted_exit(result['exitcode'], signum):
+        meta.pop('preempt_time', None)
+        return False
+    session = meta.get('session')
+    alive, _ = (
+        probe_session(args, session, sessions) if session else (False, None))
+    grace = getattr(args, 'preempt_grace', 30)
+    if alive and result is None and not grace_expired(
+            meta, grace, datetime.datetime.now()):
+        return True
+    if alive:
+        tmux(args, 'kill-session', '-t', session, check=False)
+    requeue_job(meta, path)
+    return True
+
+
 def finished_exitcode(meta):
-    # Merge commands hand off exclusively through command-result.json.  Do
-    # not let command output spoof the legacy wrapper completion marker.
+    # Legacy completion of jobs without command-result.json.  Merge commands
+    # hand off exclusively through command-result.json.  Do not let command
+    # output spoof the legacy wrapper completion marker.
     if isinstance(meta.get('merge'), dict):
         return None
     output_file = meta.get('output_file')
     if not output_file:
         return None
     marker = f'[taskq] job {meta["id"]} finished with exit code '
+    line = find_last_line(output_file, marker, readonly=False)
+    if line is None:
+        return None
+    value = line.split(marker, 1)[1].split(maxsplit=1)[0]
     try:
-        with open(output_file, 'rb') as f:
-            f.seek(0, os.SEEK_END)
-            size = f.tell()
-            f.seek(max(0, size - 65536))
-            data = f.read().decode('utf-8', errors='replace')
-    except OSError:
+        return int(value)
+    except ValueError:
         return None
-    for line in reversed(data.splitlines()):
-        if marker not in line:
-            continue
-        value = line.split(marker, 1)[1].split(maxsplit=1)[0]
-        try:
-            return int(value)
-        except ValueError:
-            return None
-    return None
-
-
-def dependency_state(meta, metas_by_id):
-    for dependency in meta.get('depends_on') or []:
-        try:
-            dependency = int(dependency)
-        except (TypeError, ValueError):
-            return 'failed', f'invalid dependency {dependency!r}'
-        if dependency == int(meta['id']):
-            return 'failed', f'job cannot depend on itself ({dependency})'
-        dependency_meta = metas_by_id.get(dependency)
-        if dependency_meta is None:
-            return 'failed', f'dependency {dependency} does not exist'
-        status = dependency_meta.get('status')
-        if status == 'success':
-            continue
-        if status in {'failed', 'killed', 'interrupted'}:
-            return 'failed', (
-                f'dependency {dependency} ended with status {status}')
-        return 'pending', None
-    return 'ready', None
 
 
 def mark_dependency_failed(meta, path, reason):
@@ -410,28 +734,31 @@ def start_job(args, path, meta, gpu_ids=None):
     else:
         taskq_gpu_ids = '-1'
     run_command = 'exec "$TASKQ_WRAPPER"'
-    try:
-        tmux(
-            args,
-            'new-session', '-d', '-s', session, '-n', f'job-{job_id}',
-            '-e', f'TASKQ_GPU_IDS={taskq_gpu_ids}',
-            '-e', f'TASKQ_WRAPPER={wrapper}',
-            '-c', meta.get('cwd') or os.getcwd(), run_command,
+    new_session = (
+        'new-session', '-d', '-s', session, '-n', f'job-{job_id}',
+        '-e', f'TASKQ_GPU_IDS={taskq_gpu_ids}',
+        '-e', f'TASKQ_WRAPPER={wrapper}',
+        '-c', meta.get('cwd') or os.getcwd(), run_command,
+    )
+    history_limit = pane_history_limit(args, meta)
+    if history_limit != args.history_limit:
+        # tmux sizes a pane's history when the pane is created, so the
+        # global limit is switched around the new session in one command.
+        new_session = (
+            'set-option', '-g', 'history-limit', str(history_limit), ';',
+            *new_session, ';',
+            'set-option', '-g', 'history-limit', str(args.history_limit),
         )
+    try:
+        tmux(args, *new_session)
     except subprocess.CalledProcessError as e:
         mark_start_failed(meta, path, e)
         return
-    tmux(
-        args,
-        'set-option', '-t', session, 'history-limit',
-        str(args.history_limit),
-        check=False,
-    )
-    if output_file:
+    if output_file and meta.get('output_capture', 'pane') == 'pane':
         tmux(
             args,
             'pipe-pane', '-o', '-t', f'{session}:0.0',
-            f'cat >> {shlex.quote(output_file)}',
+            f'exec cat >> {shlex.quote(output_file)}',
             check=False,
         )
     if start_file:
@@ -467,8 +794,125 @@ def mark_start_failed(meta, path, error):
     write_meta(meta, path)
 
 
-def mark_gpu_unavailable(meta, path):
+def kill_job(args, path, meta):
+    session = meta.get('session')
+    if meta.get('status') in ('running', 'suspended') and session:
+        if meta.get('status') == 'suspended':
+            # Stopped processes only act on the hangup once continued, and
+            # the pane pid can no longer be looked up once it is gone.
+            signal_job(args, meta, signal.SIGCONT)
+        tmux(args, 'kill-session', '-t', session, check=False)
+    meta.update({
+        'status': 'killed',
+        'exitcode': -1,
+        'end_time': now(),
+    })
+    write_meta(meta, path)
+
+
+def signal_process_group(pid, signum):
+    """Send ``signum`` to the process group a job's pane process leads."""
+    try:
+        os.killpg(int(pid), signum)
+    except (ProcessLookupError, PermissionError, TypeError, ValueError):
+        return False
+    return True
+
+
+def signal_job(args, meta, signum):
+    pid = meta.get('pid') or pane_pid(args, meta.get('session'))
+    return bool(pid) and signal_process_group(pid, signum)
+
+
+def note_output(meta, message):
     output_file = meta.get('output_file')
+    if output_file:
+        Path(output_file).parent.mkdir(parents=True, exist_ok=True)
+        with open(output_file, 'a', encoding='utf-8') as f:
+            f.write(message + '\n')
+
+
+def suspend_job(args, path, meta):
+    if not signal_job(args, meta, signal.SIGSTOP):
+        return
+    meta.update({
+        'status': 'suspended',
+        'preemptions': int(meta.get('preemptions') or 0) + 1,
+    })
+    write_meta(meta, path)
+    note_output(meta, f'[taskq] job {meta["id"]} suspended at {now()}')
+
+
+def resume_job(args, path, meta):
+    # A job that cannot be continued is found interrupted on the next tick.
+    if not signal_job(args, meta, signal.SIGCONT):
+        return
+    meta['status'] = 'running'
+    write_meta(meta, path)
+    note_output(meta, f'[taskq] job {meta["id"]} resumed at {now()}')
+
+
+def preempt_job(args, path, meta):
+    """Ask a job to exit so it can be requeued, see :func:`refresh_preempted`."""
+    meta['preempt_time'] = now()
+    write_meta(meta, path)
+    note_output(meta, f'[taskq] job {meta["id"]} preempted at {now()}')
+    signum = getattr(args, 'preempt_signal', signal.SIGTERM)
+    if not signal_job(args, meta, signum) and meta.get('session'):
+        tmux(args, 'kill-session', '-t', meta['session'], check=False)
+
+
+def requeue_job(meta, path):
+    """Queue a preempted job again under the same id."""
+    result_file = meta.get('command_result_file')
+    if result_file:
+        Path(result_file).unlink(missing_ok=True)
+    meta.pop('preempt_time', None)
+    meta.update({
+        'status': 'queued',
+        'exitcode': None,
+        'start_time': None,
+        'end_time': None,
+        'pid': None,
+        'gpu_ids': '',
+        'preemptions': int(meta.get('preemptions') or 0) + 1,
+    })
+    write_meta(meta, path)
+    note_output(meta, f'[taskq] job {meta["id"]} requeued at {now()}')
+
+
+def preempt_for(args, meta, active, running, free_slots, free_gpus):
+    """Preempt running jobs of lower priority so that ``meta`` fits.
+
+    ``free_slots`` and ``free_gpus`` are what is free for it now.  Returns
+    whether it waits for jobs preempted now or before.
+    """
+    mode = getattr(args, 'preempt', 'requeue')
+    shapes = [
+        (job, slots_required(job), len(parse_gpu_ids(job.get('gpu_ids'))))
+        for job in running
+    ]
+    pending = False
+    for job, job_slots, job_gpus in shapes:
+        if job.get('preempt_time'):
+            pending = True
+            free_slots += job_slots
+            free_gpus += job_gpus
+    victims = choose_victims(
+        slots_required(meta), int(meta.get('gpus_required') or 0),
+        free_slots, free_gpus, candidates(shapes, priority(meta)), mode)
+    if not victims:
+        return victims is not None and pending
+    for victim in victims:
+        path, _ = active[int(victim['id'])]
+        if mode == 'suspend':
+            suspend_job(args, path, victim)
+        else:
+            preempt_job(args, path, victim)
+    return True
+
+
+def mark_gpu_unavailable(meta, path):
     gpus_required = int(meta.get('gpus_required') or 0)
     message = (
         '[taskq] GPU allocation requested '
@@ -476,10 +920,7 @@ def mark_gpu_unavailable(meta, path):
         'or reported no NVIDIA GPUs. '
         'Install NVIDIA GPU tooling or submit the job with -G 0.'
     )
-    if output_file:
-        Path(output_file).parent.mkdir(parents=True, exist_ok=True)
-        with open(output_file, 'a', encoding='utf-8') as f:
-            f.write(message + '\n')
+    note_output(meta, message)
     meta.update({
         'status': 'failed',
         'exitcode': None,
@@ -489,63 +930,234 @@ def mark_gpu_unavailable(meta, path):
 
 
 def tick(args):
-    guard_controllers(args)
+    sessions = session_snapshot(args)
+    guard_controllers(args, sessions)
+    table = job_table(args)
     metas = []
-    for path, meta in all_meta(args):
-        metas.append((path, refresh_running(args, path, meta)))
-    metas_by_id = {int(meta['id']): meta for _, meta in metas}
-
-    running_slots = sum(
-        slots_required(meta)
-        for _, meta in metas
-        if meta.get('status') == 'running'
+    for path, meta in table.sync():
+        metas.append((path, refresh_running(args, path, meta, sessions)))
+    active = {int(meta['id']): (path, meta) for path, meta in metas}
+    graph = dependency_graph(args)
+    failed = graph.update(
+        {job_id: meta for job_id, (_, meta) in active.items()},
+        job_store(args.state_dir).statuses,
     )
+    for job_id, reason in sorted(failed.items()):
+        path, meta = active[job_id]
+        mark_dependency_failed(meta, path, reason)
+
+    running = [meta for _, meta in metas if meta.get('status') == 'running']
+    suspended = [
+        (path, meta) for path, meta in metas
+        if meta.get('status') == 'suspended']
+    running_slots = sum(slots_required(meta) for meta in running)
     used_gpu_ids = set()
-    for _, meta in metas:
-        if meta.get('status') == 'running':
-            used_gpu_ids.update(parse_gpu_ids(meta.get('gpu_ids')))
-    free_gpu_ids = query_free_gpus(args)
-    if free_gpu_ids is not None:
-        random.shuffle(free_gpu_ids)
+    # Suspended jobs free their slots but keep their GPU memory.
+    for meta in running + [meta for _, meta in suspended]:
+        used_gpu_ids.update(parse_gpu_ids(meta.get('gpu_ids')))
+    ledger = resource_ledger(args)
+    ledger.sync({
+        int(meta['id']): (
+            slots_required(meta) if meta.get('status') == 'running' else 0,
+            parse_gpu_ids(meta.get('gpu_ids')))
+        for meta in running + [meta for _, meta in suspended]
+    })
+    free_gpu_ids = None
+    probed_gpus = False
     slots = runtime_slots(args)
-    queued = sorted(
-        (
-            (path, meta)
-            for path, meta in metas
-            if meta.get('status') == 'queued'
-        ),
-        key=lambda item: int(item[1].get('id') or 0),
-    )
-    for path, meta in queued:
-        state, reason = dependency_state(meta, metas_by_id)
-        if state == 'pending':
-            continue
-        if state == 'failed':
-            meta = mark_dependency_failed(meta, path, reason)
-            metas_by_id[int(meta['id'])] = meta
-            continue
+    socket_slots = global_slots(args)
+    backfill = getattr(args, 'backfill', 'easy')
+    history = runtime_history(args)
+    reservation = None
+    policy = scheduling_policy(args)
+    # Every queue is charged, so queues on any policy share the socket.
+    reserved_gpus, reserved_slots = report_usage(args, policy, running)
+    if socket_slots is not None:
+        socket_slots = max(0, socket_slots - reserved_slots)
+    gpu_demand = slot_demand = 0
+    ready = policy.order(
+        [active[job_id] for job_id in graph.ready] + suspended,
+        datetime.datetime.now())
+    # Jobs that preempted others go first, before those take resources back.
+    urgent = getattr(args, '_urgent_jobs', set()) & graph.ready
+    args._urgent_jobs = urgent
+    ready.sort(key=lambda job: int(job[1]['id']) not in urgent)
+    blocked = None
+    for path, meta in ready:
+        job_id = int(meta['id'])
         required = slots_required(meta)
+        gpus_required = int(meta.get('gpus_required') or 0)
+        is_suspended = meta.get('status') == 'suspended'
+        if is_suspended:
+            gpus_required = 0
         can_start = running_slots + required <= slots
         can_oversubscribe = running_slots == 0 and required > slots
-        if not can_start and not can_oversubscribe:
+        held = ledger.slots + running_slots
+        if socket_slots is not None and held and (
+                held + required > socket_slots):
+            if (can_start or can_oversubscribe) and not slot_demand and (
+                    not is_suspended):
+                slot_demand = required
+            can_start = can_oversubscribe = False
+        if gpus_required and not probed_gpus and (
+                can_start or can_oversubscribe or backfill == 'easy'):
+            free_gpu_ids = query_free_gpus(args)
+            probed_gpus = True
+        if gpus_required and probed_gpus and free_gpu_ids is None:
+            mark_gpu_unavailable(meta, path)
             continue
-        gpus_required = int(meta.get('gpus_required') or 0)
-        gpu_ids = []
-        if gpus_required:
-            if free_gpu_ids is None:
-                mark_gpu_unavailable(meta, path)
+        available = [
+            gpu_id
+            for gpu_id in free_gpu_ids or []
+            if gpu_id not in used_gpu_ids and gpu_id not in ledger.gpus
+        ]
+        usable = len(available) - (reserved_gpus if gpus_required else 0)
+        fits = (can_start or can_oversubscribe) and usable >= gpus_required
+        if (can_start or can_oversubscribe) and not fits and not gpu_demand:
+            gpu_demand = gpus_required
+        if fits and reservation is not None:
+            fits = reservation.admit(
+                history.estimate(meta), required, gpus_required)
+        if not fits:
+            if is_suspended:
+                # Suspended jobs resume once they fit; holding anything back
+                # for them would keep ready jobs waiting on preempted ones.
                 continue
-            available = [
-                gpu_id
-                for gpu_id in free_gpu_ids
-                if gpu_id not in used_gpu_ids
-            ]
-            if len(available) < gpus_required:
-                continue
-            gpu_ids = available[:gpus_required]
+            if blocked is None:
+                blocked = meta
+            if backfill == 'none':
+                break
+            if backfill == 'easy' and reservation is None:
+                free_slots = slots - running_slots
+                if socket_slots is not None:
+                    free_slots = min(free_slots, socket_slots - held)
+                reservation = reserve(
+                    required, gpus_required, slots, free_slots,
+                    available, running_estimates(args, running))
+            continue
+        if is_suspended:
+            if ledger.claim(
+                    job_id, required, parse_gpu_ids(meta.get('gpu_ids')),
+                    socket_slots):
+                resume_job(args, path, meta)
+            if meta.get('status') == 'running':
+                running_slots += required
+                running.append(meta)
+            continue
+        gpu_ids = available[:gpus_required]
+        if not ledger.claim(job_id, required, gpu_ids, socket_slots):
+            # Another queue took a GPU or slot since the last sync.
+            continue
+        graph.discard(job_id)
         start_job(args, path, meta, gpu_ids)
         running_slots += required
         used_gpu_ids.update(gpu_ids)
+        if meta.get('status') == 'running':
+            running.append(meta)
+        else:
+            ledger.release(job_id)
+    args._gpu_demand = gpu_demand
+    args._slot_demand = slot_demand
+    if blocked is not None and slots_required(blocked) <= slots and any(
+            meta.get('preemptible') for meta in running):
+        if blocked.get('gpus_required') and not probed_gpus:
+            free_gpu_ids = query_free_gpus(args)
+        free_slots = slots - running_slots
+        if socket_slots is not None:
+            free_slots = min(
+                free_slots, socket_slots - ledger.slots - running_slots)
+        free_gpus = len([
+            gpu_id for gpu_id in free_gpu_ids or []
+            if gpu_id not in used_gpu_ids and gpu_id not in ledger.gpus
+        ])
+        if preempt_for(
+                args, blocked, active, running, free_slots, free_gpus):
+            urgent.add(int(blocked['id']))
+    table.update(metas)
+    finished = table.drain_finished()
+    history.observe(finished)
+    maintain_outputs(args, metas, finished)
+    return bool(controller_paths(args)) or any(
+        meta.get('status') not in lifecycle.TERMINAL_STATUSES
+        for _, meta in metas
+    )
+
+
+def control_list(args, request):
+    jobs = job_table(args).select(request.get('ids'), request.get('statuses'))
+    return {
+        'ok': True,
+        'jobs': [
+            {
+                key: meta[key]
+                for key in ('id', 'status', 'exitcode') if key in meta
+            }
+            for meta in jobs
+        ],
+    }, False
+
+
+def control_info(args, request):
+    jobs = job_table(args).select(request.get('ids'), request.get('statuses'))
+    return {'ok': True, 'jobs': jobs}, False
+
+
+def control_add(args, request):
+    # The client already wrote and journaled the jobs; schedule them now.
+    job_table(args).replay()
+    return {'ok': True}, True
+
+
+def control_kill(args, request):
+    """Kill active jobs that need no merge bookkeeping.
+
+    Everything else is reported as skipped and left to the client.
+    """
+    table = job_table(args)
+    table.replay()
+    killed = []
+    skipped = []
+    for job_id in request['ids']:
+        path, meta = table.jobs.get(int(job_id), (None, None))
+        if meta is None or isinstance(meta.get('merge'), dict):
+            skipped.append(job_id)
+            continue
+        kill_job(args, path, meta)
+        table.update([(path, meta)])
+        killed.append(job_id)
+    return {'ok': True, 'killed': killed, 'skipped': skipped}, bool(killed)
+
+
+def control_handlers(args):
+    handlers = {
+        'list': control_list,
+        'info': control_info,
+        'add': control_add,
+        'kill': control_kill,
+    }
+    return {
+        op: functools.partial(handler, args)
+        for op, handler in handlers.items()
+    }
+
+
+def publish_changes(args, control, previous):
+    """Send status changes since ``previous`` to control subscribers."""
+    current = {
+        job_id: meta.get('status')
+        for job_id, (_, meta) in job_table(args).jobs.items()
+    }
+    if control is None or not control.subscribers:
+        return current
+    statuses = dict(current)
+    statuses.update(job_store(args.state_dir).statuses(
+        job_id for job_id in previous if job_id not in current))
+    control.publish([
+        {'id': job_id, 'status': statuses.get(job_id)}
+        for job_id in sorted(set(previous) | set(current))
+        if previous.get(job_id) != statuses.get(job_id)
+    ])
+    return current
 
 
 def main(argv=None):
@@ -561,11 +1173,38 @@ def main(argv=None):
     parser.add_argument('--interval', type=float, default=1)
     parser.add_argument('--gpu-free-perc', type=int, default=90)
     parser.add_argument('--visible-gpus', default=None)
+    parser.add_argument('--control-path', default=None)
+    parser.add_argument('--gpu-inventory', default=None)
+    parser.add_argument('--fake-gpus', type=int, default=None)
+    parser.add_argument('--job-history-limit', type=int, default=None)
+    parser.add_argument('--output-max-bytes', type=int, default=0)
+    parser.add_argument('--output-keep', type=int, default=OUTPUT_KEEP)
+    parser.add_argument(
+        '--output-compression', choices=sorted(COMPRESSIONS), default='none')
+    parser.add_argument('--backfill', choices=BACKFILL_MODES, default='easy')
+    parser.add_argument('--scheduler', default='fifo')
+    parser.add_argument('--preempt', choices=PREEMPT_MODES, default='requeue')
+    parser.add_argument(
+        '--preempt-signal', type=parse_signal, default=signal.SIGTERM)
+    parser.add_argument('--preempt-grace', type=parse_duration, default=30)
     args = parser.parse_args(argv)
     jobs_dir(args).mkdir(parents=True, exist_ok=True)
-    while True:
-        tick(args)
-        time.sleep(args.interval)
+    wakeup = open_wakeup(args)
+    control = open_control(args.control_path, control_handlers(args))
+    statuses = {}
+    try:
+        while True:
+            busy = tick(args)
+            statuses = publish_changes(args, control, statuses)
+            interval = (
+                args.interval if busy else max(args.interval, IDLE_INTERVAL))
+            wait_for_wakeup(wakeup, interval, control)
+    finally:
+        if control is not None:
+            control.close()
+        worker = getattr(args, '_output_worker', None)
+        if worker is not None:
+            worker.shutdown(wait=True)
 
 
 if __name__ == '__main__':
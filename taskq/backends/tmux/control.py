@@ -0,0 +1,314 @@
+"""Local control socket of a tmux broker.
+
+The broker listens on a UNIX-domain socket next to the tmux socket and answers
+newline-delimited JSON requests from its in-memory job table, so CLI reads do
+not have to scan job files and probe tmux themselves.  The client helpers
+return ``None`` whenever no broker answers, and callers then fall back to
+direct file access.
+"""
+
+import json
+import os
+import socket
+import time
+from pathlib import Path
+
+
+REQUEST_TIMEOUT = 5
+# Requests are small; anything larger is not from a taskq client.
+MAX_REQUEST = 1 << 20
+# Clients connected but still sending their request.
+MAX_CLIENTS = 64
+# Events queued for a subscriber that stopped reading; it is dropped beyond.
+MAX_BACKLOG = 1 << 20
+
+
+def _encode(value):
+    return (json.dumps(value, separators=(',', ':')) + '\n').encode('utf-8')
+
+
+def _recv_line(sock, buffer=b'', limit=None):
+    """Return ``(line, rest)`` read from ``sock``; ``line`` is None on EOF."""
+    while b'\n' not in buffer:
+        if limit is not None and len(buffer) > limit:
+            return None, b''
+        chunk = sock.recv(65536)
+        if not chunk:
+            return None, b''
+        buffer += chunk
+    line, rest = buffer.split(b'\n', 1)
+    return line, rest
+
+
+def _decode(line):
+    try:
+        value = json.loads(line)
+    except (TypeError, ValueError):
+        return None
+    return value if isinstance(value, dict) else None
+
+
+def _connect(path, payload, timeout):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.settimeout(timeout)
+        sock.connect(str(path))
+        sock.sendall(_encode(payload))
+        line, rest = _recv_line(sock)
+    except OSError:
+        sock.close()
+        return None, None, b''
+    response = _decode(line)
+    if response is None or not response.get('ok'):
+        sock.close()
+        return None, None, b''
+    return sock, response, rest
+
+
+def request(path, op, **params):
+    """Send one request to the broker at ``path``.
+
+    Returns the decoded response, or ``None`` when no broker is listening or
+    the broker could not serve the request.
+    """
+    if not path:
+        return None
+    sock, response, _ = _connect(path, dict(params, op=op), REQUEST_TIMEOUT)
+    if sock is not None:
+        sock.close()
+    return response
+
+
+def subscribe(path, ids=None, timeout=None):
+    """Subscribe to job status changes.
+
+    Returns an iterator of ``{'id': ..., 'status': ...}`` events that yields
+    ``None`` whenever ``timeout`` seconds pass quietly and stops when the
+    broker goes away, or ``None`` if no broker accepted the subscription.
+    """
+    if not path:
+        return None
+    sock, _, rest = _connect(
+        path, {'op': 'subscribe', 'ids': ids}, REQUEST_TIMEOUT)
+    if sock is None:
+        return None
+    sock.settimeout(timeout)
+    return _events(sock, rest)
+
+
+def _events(sock, buffer):
+    with sock:
+        while True:
+            try:
+                line, buffer = _recv_line(sock, buffer)
+            except socket.timeout:
+                yield None
+                continue
+            except OSError:
+                return
+            event = _decode(line)
+            if event is None:
+                return
+            yield event
+
+
+class ControlServer:
+    """Listening side of the control socket, driven by the broker loop.
+
+    ``handlers`` maps request names to callables taking the decoded request
+    and returning ``(response, wake)``; ``wake`` asks the broker to tick
+    right away.  Subscriptions are handled here and fed by ``publish``.
+    Client sockets are non-blocking and multiplexed in the broker's select,
+    so a client that stalls never holds up scheduling: unfinished requests
+    and unread responses are dropped after ``REQUEST_TIMEOUT`` seconds, and
+    subscribers that stop reading once ``MAX_BACKLOG`` bytes queue up.
+    """
+
+    def __init__(self, path, handlers):
+        self.path = Path(path)
+        self.handlers = handlers
+        self.subscribers = {}
+        # Connections still sending their request: [buffer, deadline].
+        self.requests = {}
+        # Bytes not yet taken by each client.
+        self.outbox = {}
+        # Connections to close once their response is out, with a deadline.
+        self.closing = {}
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.path.unlink(missing_ok=True)
+            self.sock.bind(str(self.path))
+            os.chmod(self.path, 0o600)
+            self.sock.listen(16)
+            self.sock.setblocking(False)
+            self.inode = os.stat(self.path).st_ino
+        except OSError:
+            self.sock.close()
+            raise
+
+    def readers(self):
+        return [self.sock, *self.requests, *self.subscribers]
+
+    def writers(self):
+        return list(self.outbox)
+
+    def handle(self, ready, writable=()):
+        """Serve the sockets select reported; return whether to tick."""
+        wake = False
+        for conn in writable:
+            if conn in self.outbox:
+                self._flush(conn)
+        for sock in ready:
+            if sock is self.sock:
+                self._accept()
+            elif sock in self.requests:
+                wake = self._receive(sock) or wake
+            elif sock in self.subscribers:
+                self._receive_subscriber(sock)
+        self._expire()
+        return wake
+
+    def _accept(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            if len(self.requests) >= MAX_CLIENTS:
+                conn.close()
+                continue
+            conn.setblocking(False)
+            self.requests[conn] = [b'', time.monotonic() + REQUEST_TIMEOUT]
+
+    def _receive(self, conn):
+        entry = self.requests[conn]
+        try:
+            chunk = conn.recv(65536)
+        except BlockingIOError:
+            return False
+        except OSError:
+            chunk = b''
+        if not chunk:
+            self._drop(conn)
+            return False
+        entry[0] += chunk
+        if b'\n' not in entry[0]:
+            if len(entry[0]) > MAX_REQUEST:
+                self._drop(conn)
+            return False
+        del self.requests[conn]
+        request = _decode(entry[0].split(b'\n', 1)[0])
+        if request is None:
+            conn.close()
+            return False
+        return self._serve(conn, request)
+
+    def _serve(self, conn, request):
+        op = request.get('op')
+        wake = False
+        if op == 'subscribe':
+            ids = request.get('ids')
+            try:
+                ids = None if ids is None else {int(job_id) for job_id in ids}
+            except (TypeError, ValueError) as e:
+                data = _encode({'ok': False, 'error': str(e)})
+            else:
+                self.subscribers[conn] = ids
+                self._send(conn, _encode({'ok': True}))
+                return False
+        elif op not in self.handlers:
+            data = _encode({'ok': False, 'error': f'unknown request {op!r}'})
+        else:
+            try:
+                response, wake = self.handlers[op](request)
+                data = _encode(response)
+            except Exception as e:
+                # A failed request, e.g. on an unreadable job index, must
+                # never take the broker down with it.
+                wake = False
+                data = _encode(
+                    {'ok': False, 'error': str(e) or type(e).__name__})
+        self.closing[conn] = time.monotonic() + REQUEST_TIMEOUT
+        self._send(conn, data)
+        return wake
+
+    def _receive_subscriber(self, conn):
+        try:
+            chunk = conn.recv(65536)
+        except BlockingIOError:
+            return
+        except OSError:
+            chunk = b''
+        # Subscribers never send after subscribing; this is EOF.
+        if not chunk:
+            self._drop(conn)
+
+    def _send(self, conn, data):
+        pending = self.outbox.get(conn, b'') + data
+        if len(pending) > MAX_BACKLOG:
+            self._drop(conn)
+            return
+        self.outbox[conn] = pending
+        self._flush(conn)
+
+    def _flush(self, conn):
+        data = self.outbox[conn]
+        try:
+            sent = conn.send(data)
+        except BlockingIOError:
+            return
+        except OSError:
+            self._drop(conn)
+            return
+        if sent < len(data):
+            self.outbox[conn] = data[sent:]
+            return
+        del self.outbox[conn]
+        if conn in self.closing:
+            self._drop(conn)
+
+    def _expire(self):
+        now = time.monotonic()
+        stale = [
+            conn for conn, (_, deadline) in self.requests.items()
+            if now >= deadline
+        ] + [conn for conn, deadline in self.closing.items() if now >= deadline]
+        for conn in stale:
+            self._drop(conn)
+
+    def _drop(self, conn):
+        self.requests.pop(conn, None)
+        self.subscribers.pop(conn, None)
+        self.outbox.pop(conn, None)
+        self.closing.pop(conn, None)
+        conn.close()
+
+    def publish(self, events):
+        """Queue status ``events`` for the subscribers interested in them."""
+        for conn, ids in list(self.subscribers.items()):
+            wanted = [
+                event for event in events if ids is None or event['id'] in ids]
+            if wanted:
+                self._send(conn, b''.join(_encode(event) for event in wanted))
+
+    def close(self):
+        for conn in {*self.requests, *self.subscribers, *self.closing}:
+            self._drop(conn)
+        self.sock.close()
+        try:
+            # A newer broker may have taken over the path already.
+            if os.stat(self.path).st_ino == self.inode:
+                self.path.unlink()
+        except OSError:
+            pass
+
+
+def open_control(path, handlers):
+    """Start listening on ``path``; ``None`` if the socket cannot be bound."""
+    if not path:
+        return None
+    try:
+        return ControlServer(path, handlers)
+    except OSError:
+        return None
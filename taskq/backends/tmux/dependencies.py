@@ -0,0 +1,157 @@
+"""Incremental dependency graph of the jobs queued on a tmux broker.
+
+The broker keeps one graph for its lifetime.  Each queued job records the
+dependencies that have not succeeded yet, and each such dependency records its
+waiting dependents, so a tick only evaluates jobs that were just queued and
+dependencies that just left the active set.  A failed dependency cascades to
+all transitive dependents in a single pass.
+"""
+
+from .lifecycle import TERMINAL_STATUSES
+
+
+FAILED_DEPENDENCY_STATUSES = {'failed', 'killed', 'interrupted'}
+
+
+def _failure_reason(dependency, status):
+    if status is None:
+        return f'dependency {dependency} does not exist'
+    if status in FAILED_DEPENDENCY_STATUSES:
+        return f'dependency {dependency} ended with status {status}'
+    return None
+
+
+class DependencyGraph:
+    """Queued jobs, their unresolved dependencies and the reverse edges."""
+
+    def __init__(self):
+        # job id -> dependency ids that have not succeeded yet
+        self.waiting = {}
+        # dependency id -> ids of queued jobs waiting on it
+        self.dependents = {}
+        # queued job ids whose dependencies have all succeeded
+        self.ready = set()
+
+    def __contains__(self, job_id):
+        return job_id in self.ready or job_id in self.waiting
+
+    def discard(self, job_id):
+        """Forget a job that is no longer queued.
+
+        Edges from jobs waiting on ``job_id`` are kept; they are resolved once
+        ``job_id`` itself finishes.
+        """
+        self.ready.discard(job_id)
+        for dependency in self.waiting.pop(job_id, ()):
+            dependents = self.dependents.get(dependency)
+            if dependents is not None:
+                dependents.discard(job_id)
+                if not dependents:
+                    del self.dependents[dependency]
+
+    def update(self, active, lookup):
+        """Synchronize the graph with the active jobs of one broker tick.
+
+        ``active`` maps job ids to the refreshed metadata of every
+        nonterminal job, and ``lookup(ids)`` returns ``{id: status}`` for jobs
+        outside of it.  Returns ``{job_id: reason}`` for queued jobs that can
+        never start; they are already removed from the graph.
+        """
+        queued = {
+            job_id for job_id, meta in active.items()
+            if meta.get('status') == 'queued'
+        }
+        for job_id in [
+            job_id for job_id in (*self.ready, *self.waiting)
+            if job_id not in queued
+        ]:
+            self.discard(job_id)
+
+        statuses = {
+            job_id: meta.get('status') for job_id, meta in active.items()}
+        finished = [
+            dependency for dependency in self.dependents
+            if dependency not in statuses
+            or statuses[dependency] in TERMINAL_STATUSES
+        ]
+        added = sorted(job_id for job_id in queued if job_id not in self)
+        unknown = {
+            dependency for dependency in finished if dependency not in statuses
+        }
+        for job_id in added:
+            for dependency in active[job_id].get('depends_on') or []:
+                try:
+                    dependency = int(dependency)
+                except (TypeError, ValueError):
+                    continue
+                if dependency not in statuses:
+                    unknown.add(dependency)
+        if unknown:
+            statuses.update(lookup(unknown))
+
+        failed = {}
+        for dependency in sorted(finished):
+            self._resolve(dependency, statuses.get(dependency), failed)
+        for job_id in added:
+            self._add(job_id, active[job_id], statuses, failed)
+        return failed
+
+    def _add(self, job_id, meta, statuses, failed):
+        unresolved = set()
+        for dependency in meta.get('depends_on') or []:
+            try:
+                dependency = int(dependency)
+            except (TypeError, ValueError):
+                return self._fail(
+                    job_id, f'invalid dependency {dependency!r}', failed)
+            if dependency == job_id:
+                return self._fail(
+                    job_id, f'job cannot depend on itself ({dependency})',
+                    failed)
+            status = 'failed' if dependency in failed else statuses.get(
+                dependency)
+            if status == 'success':
+                continue
+            reason = _failure_reason(dependency, status)
+            if reason is not None:
+                return self._fail(job_id, reason, failed)
+            unresolved.add(dependency)
+        if not unresolved:
+            self.ready.add(job_id)
+            return
+        self.waiting[job_id] = unresolved
+        for dependency in unresolved:
+            self.dependents.setdefault(dependency, set()).add(job_id)
+
+    def _fail(self, job_id, reason, failed):
+        failed[job_id] = reason
+        self.discard(job_id)
+        self._resolve(job_id, 'failed', failed)
+
+    def _resolve(self, dependency, status, failed):
+        """Release or fail the dependents of a job that left the queue."""
+        pending = [(dependency, status)]
+        while pending:
+            dependency, status = pending.pop()
+            dependents = self.dependents.pop(dependency, set())
+            if status not in TERMINAL_STATUSES and status is not None:
+                # Still active under another status; keep waiting on it.
+                if dependents:
+                    self.dependents[dependency] = dependents
+                continue
+            reason = _failure_reason(dependency, status)
+            for job_id in sorted(dependents):
+                if reason is None:
+                    unresolved = self.waiting.get(job_id)
+                    if unresolved is None:
+                        continue
+                    unresolved.discard(dependency)
+                    if not unresolved:
+                        del self.waiting[job_id]
+                        self.ready.add(job_id)
+                    continue
+                if job_id in failed:
+                    continue
+                failed[job_id] = reason
+                self.discard(job_id)
+                pending.append((job_id, 'failed'))
@@ -0,0 +1,150 @@
+"""Socket-wide fair-share accounting for the brokers of a tmux socket.
+
+Every queue on a socket has its own broker and its own slots, but the queues
+share the host's GPUs and, with ``global_slots``, a socket-wide slot limit.
+The broker of every queue, whatever its scheduling policy, records once per
+tick the slot-seconds and GPU-seconds its running jobs used since the last
+tick, charged both to its queue and to the users who submitted the jobs,
+together with the GPUs and socket-wide slots its first ready job is still
+waiting for.  The records live in
+``fairshare.json`` in the socket's cache directory and are updated under an
+exclusive lock, so the file acts as the arbiter between brokers.  Usage
+decays exponentially with a configurable half-life, so only recent usage
+counts.
+
+Usage is compared by dominant share: the larger of an entry's fraction of
+all slot usage and of all GPU usage, divided by its configured share.  A
+queue whose usage is above that of another queue waiting for GPUs or
+socket-wide slots leaves enough of them free for it, and the ``fair``
+scheduling policy orders a queue's jobs by the usage of their users.  Nothing is held back when no other queue
+is waiting, so idle capacity is always used.
+"""
+
+import time
+from pathlib import Path
+
+from .lifecycle import locked_json
+
+
+FAIRSHARE_NAME = 'fairshare.json'
+HALF_LIFE = 86400.0
+# Demand of a broker that stopped reporting no longer holds GPUs back.
+DEMAND_TTL = 30.0
+# A broker that was suspended or slow is charged at most this many seconds.
+MAX_CHARGE = 120.0
+UNKNOWN_USER = 'unknown'
+# Entries whose decayed usage fell below this are dropped.
+FORGET_USAGE = 1e-3
+
+
+def fairshare_path(state_dir):
+    """Return the file shared by every queue of the socket of ``state_dir``."""
+    return Path(state_dir).parent / FAIRSHARE_NAME
+
+
+def _decay(entry, now, half_life):
+    age = max(0.0, now - entry.get('updated', now))
+    factor = 0.5 ** (age / half_life) if half_life > 0 else 0.0
+    entry['slots'] = entry.get('slots', 0.0) * factor
+    entry['gpus'] = entry.get('gpus', 0.0) * factor
+    entry['updated'] = now
+    return entry
+
+
+def _charge(entries, name, slots, gpus, seconds, now, half_life):
+    entry = _decay(entries.setdefault(name, {}), now, half_life)
+    entry['slots'] += slots * seconds
+    entry['gpus'] += gpus * seconds
+
+
+def dominant_usage(entries, shares=None, default_share=1.0):
+    """Return each entry's dominant usage divided by its share."""
+    totals = {
+        resource: sum(entry.get(resource, 0.0) for entry in entries.values())
+        for resource in ('slots', 'gpus')
+    }
+    usage = {}
+    for name, entry in entries.items():
+        dominant = max(
+            entry.get(resource, 0.0) / total if total > 0 else 0.0
+            for resource, total in totals.items())
+        share = (shares or {}).get(name, default_share)
+        try:
+            share = float(share)
+        except (TypeError, ValueError):
+            share = default_share
+        usage[name] = dominant / share if share > 0 else float('inf')
+    return usage
+
+
+class FairShare:
+    """Decayed usage and GPU demand of every queue and user on a socket."""
+
+    def __init__(self, path, half_life=HALF_LIFE):
+        self.path = Path(path)
+        self.half_life = half_life
+        self.state = {'queues': {}, 'users': {}}
+
+    def update(self, queue, share, running, gpu_demand, slot_demand=0,
+               now=None):
+        """Charge ``running`` jobs of ``queue`` and record its demand.
+
+        ``running`` holds ``(user, slots, gpus)`` of each running job, and
+        ``gpu_demand`` and ``slot_demand`` are the GPUs and socket-wide slots
+        the queue's first ready job is waiting for.  Returns the socket-wide
+        state, decayed to ``now``.
+        """
+        now = time.time() if now is None else now
+        with locked_json(self.path, 'queues', 'users') as state:
+            queues, users = state['queues'], state['users']
+            entry = queues.get(queue) or {}
+            charged = entry.get('charged')
+            seconds = 0.0 if charged is None else min(
+                MAX_CHARGE, max(0.0, now - charged))
+            for entries in (queues, users):
+                for name, value in list(entries.items()):
+                    _decay(value, now, self.half_life)
+                    idle = now - value.get('charged', 0.0) > DEMAND_TTL
+                    if idle and value['slots'] + value['gpus'] < FORGET_USAGE:
+                        del entries[name]
+            for user, slots, gpus in running:
+                _charge(queues, queue, slots, gpus, seconds, now, self.half_life)
+                _charge(
+                    users, user or UNKNOWN_USER, slots, gpus, seconds, now,
+                    self.half_life)
+            queues.setdefault(queue, {'slots': 0.0, 'gpus': 0.0}).update({
+                'charged': now,
+                'share': share,
+                'gpu_demand': gpu_demand,
+                'slot_demand': slot_demand,
+            })
+        self.state = state
+        return state
+
+    def queue_usage(self):
+        queues = self.state['queues']
+        return dominant_usage(
+            queues, {name: entry.get('share', 1.0)
+                     for name, entry in queues.items()})
+
+    def user_usage(self, user_shares=None):
+        return dominant_usage(self.state['users'], user_shares)
+
+    def _reserved(self, queue, demand, now):
+        now = time.time() if now is None else now
+        usage = self.queue_usage()
+        own = usage.get(queue, 0.0)
+        return sum(
+            int(entry.get(demand) or 0)
+            for name, entry in self.state['queues'].items()
+            if name != queue and usage.get(name, 0.0) < own
+            and now - entry.get('charged', 0.0) <= DEMAND_TTL
+        )
+
+    def reserved_gpus(self, queue, now=None):
+        """Return the GPUs that queues using less than ``queue`` wait for."""
+        return self._reserved(queue, 'gpu_demand', now)
+
+    def reserved_slots(self, queue, now=None):
+        """Return the socket-wide slots queues using less than it wait for."""
+        return self._reserved(queue, 'slot_demand', now)
@@ -0,0 +1,192 @@
+"""Write-ahead journal and in-memory job table of a long-running tmux broker.
+
+``jobs/<id>/meta.json`` stays the durable record.  Every writer outside the
+broker appends a ``{"id": ..., "event": ...}`` line to ``journal.jsonl`` after
+changing a job, so the broker can keep its active jobs in memory and only
+re-read the jobs named in new journal lines.  A checkpoint truncates the
+journal and reloads the active jobs from the job index, which also recovers
+from any change that was never journaled, such as a wrapper record lost to a
+concurrent truncation.  The broker checkpoints on startup, so a restarted
+broker (including one replaced after a ``BROKER_VERSION`` bump) resumes from
+the same state.
+"""
+
+import fcntl
+import json
+import os
+import time
+from pathlib import Path
+
+from .lifecycle import TERMINAL_STATUSES
+from .store import job_store
+
+
+JOURNAL_NAME = 'journal.jsonl'
+CHECKPOINT_BYTES = 1 << 20
+CHECKPOINT_INTERVAL = 300
+
+
+def journal_path(state_dir):
+    return Path(state_dir) / JOURNAL_NAME
+
+
+def append_journal(state_dir, *job_ids, event='write'):
+    """Record that the jobs ``job_ids`` changed on disk."""
+    lines = ''.join(
+        json.dumps({'id': int(job_id), 'event': event}) + '\n'
+        for job_id in job_ids
+    )
+    try:
+        fd = os.open(
+            journal_path(state_dir),
+            os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    except OSError:
+        return False
+    try:
+        # Checkpoints truncate the journal under the same lock, so a record
+        # is never appended between the broker's last read and the truncation.
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        os.write(fd, lines.encode('utf-8'))
+    except OSError:
+        return False
+    finally:
+        os.close(fd)
+    return True
+
+
+def _journal_ids(data):
+    ids = set()
+    for line in data.splitlines():
+        try:
+            ids.add(int(json.loads(line)['id']))
+        except (KeyError, TypeError, ValueError):
+            continue
+    return ids
+
+
+class JobTable:
+    """Active jobs of one queue, kept current by replaying the journal."""
+
+    def __init__(self, state_dir):
+        self.state_dir = Path(state_dir)
+        self.path = journal_path(state_dir)
+        self.store = job_store(state_dir)
+        self.jobs = {}
+        # job id -> last known metadata of jobs that left the active set
+        self.finished = {}
+        self.offset = 0
+        self.checkpointed_at = None
+
+    def active(self):
+        """Return ``(path, meta)`` pairs of active jobs ordered by id."""
+        return [self.jobs[job_id] for job_id in sorted(self.jobs)]
+
+    def select(self, ids=None, statuses=None):
+        """Return metadata of the jobs matching ``ids`` and ``statuses``.
+
+        Active jobs come from memory and finished ones from the job index,
+        so no job file is read unless the journal names it.
+        """
+        self.replay()
+        wanted = None if ids is None else {int(job_id) for job_id in ids}
+        selected = {}
+        for job_id, (_, meta) in self.jobs.items():
+            if wanted is not None and job_id not in wanted:
+                continue
+            if statuses is not None and meta.get('status') not in statuses:
+                continue
+            selected[job_id] = meta
+        for _, meta in self.store.finished(ids=ids, statuses=statuses):
+            selected.setdefault(int(meta['id']), meta)
+        return [selected[job_id] for job_id in sorted(selected)]
+
+    def update(self, metas):
+        """Adopt metadata the broker itself just refreshed or wrote."""
+        for path, meta in metas:
+            job_id = int(meta['id'])
+            if meta.get('status') in TERMINAL_STATUSES:
+                if self.jobs.pop(job_id, None) is not None:
+                    self.finished[job_id] = meta
+            else:
+                self.jobs[job_id] = (path, meta)
+
+    def drain_finished(self):
+        """Return and forget the jobs that finished since the last call."""
+        finished, self.finished = self.finished, {}
+        return [finished[job_id] for job_id in sorted(finished)]
+
+    def _forget(self, job_ids):
+        for job_id in job_ids:
+            entry = self.jobs.pop(job_id, None)
+            if entry is not None:
+                self.finished[job_id] = entry[1]
+
+    def _reload(self, job_ids):
+        current = {
+            int(meta['id']): (path, meta)
+            for path, meta in self.store.load(ids=sorted(job_ids))
+        }
+        self._forget([job_id for job_id in job_ids if job_id not in current])
+        self.update(current.values())
+
+    def _read(self, f):
+        f.seek(self.offset)
+        data = f.read()
+        # A trailing partial line is still being appended; leave it for later.
+        end = data.rfind(b'\n') + 1
+        self.offset += end
+        return _journal_ids(data[:end].decode('utf-8', errors='replace'))
+
+    def replay(self):
+        """Apply journal lines appended since the last call."""
+        try:
+            with open(self.path, 'rb') as f:
+                if os.fstat(f.fileno()).st_size < self.offset:
+                    # Truncated behind our back; nothing can be trusted.
+                    return self.checkpoint()
+                job_ids = self._read(f)
+        except FileNotFoundError:
+            if self.offset:
+                return self.checkpoint()
+            return
+        if job_ids:
+            self._reload(job_ids)
+
+    def checkpoint(self):
+        """Fold the journal into the job index and start a new one."""
+        self.state_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.path, 'ab+') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                self._read(f)
+                # Everything journaled so far is already in meta.json and the
+                # job index, which the full reload below reads back.
+                f.truncate(0)
+                self.offset = 0
+                jobs = {
+                    int(meta['id']): (path, meta)
+                    for path, meta in self.store.active()
+                }
+                self._forget([
+                    job_id for job_id in self.jobs if job_id not in jobs])
+                self.jobs = jobs
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+        self.checkpointed_at = time.monotonic()
+
+    def sync(self):
+        """Bring the table up to date, checkpointing when one is due."""
+        due = (
+            self.checkpointed_at is None
+            or time.monotonic() - self.checkpointed_at >= CHECKPOINT_INTERVAL
+        )
+        if not due:
+            try:
+                due = self.path.stat().st_size >= CHECKPOINT_BYTES
+            except FileNotFoundError:
+                pass
+        if due:
+            self.checkpoint()
+        else:
+            self.replay()
+        return self.active()
@@ -0,0 +1,116 @@
+"""Socket-wide ledger of the GPUs and slots held by running jobs.
+
+Every queue on a socket has its own broker, and a GPU only looks busy to
+nvidia-smi once its job allocated memory, so two brokers used to be able to
+start jobs on the same free GPU within the same second.  Brokers now record
+the GPUs and slots of their running jobs in ``resources.json`` in the
+socket's cache directory, and claim what a job needs there, under an
+exclusive lock, before starting it.  A GPU is therefore never handed to two
+queues, and ``global_slots`` limits the slots used by all queues together.
+
+A queue whose broker stopped refreshing its entries for ``LEDGER_TTL``
+seconds no longer holds anything; the GPUs of its jobs that still run then
+look busy through their memory use.
+"""
+
+import time
+from pathlib import Path
+
+from .lifecycle import locked_json
+
+
+LEDGER_NAME = 'resources.json'
+# Idle brokers tick once a minute, so this spans several missed ticks.
+LEDGER_TTL = 300.0
+# An unchanged entry is still rewritten this often to show it is current.
+REFRESH_INTERVAL = LEDGER_TTL / 3
+
+
+def ledger_path(state_dir):
+    """Return the file shared by every queue of the socket of ``state_dir``."""
+    return Path(state_dir).parent / LEDGER_NAME
+
+
+def _allocation(slots, gpu_ids):
+    return {'slots': int(slots), 'gpus': sorted(int(g) for g in gpu_ids)}
+
+
+class ResourceLedger:
+    """What the other queues of a socket hold, and claims for one queue.
+
+    ``gpus`` and ``slots`` are the GPUs and slots held by other queues as of
+    the last :meth:`sync` or :meth:`claim`.
+    """
+
+    def __init__(self, path, queue):
+        self.path = Path(path)
+        self.queue = queue
+        self.gpus = set()
+        self.slots = 0
+
+    def _observe(self, queues, now):
+        self.gpus = set()
+        self.slots = 0
+        for name, entry in list(queues.items()):
+            if not isinstance(entry, dict) or not isinstance(
+                    entry.get('jobs'), dict):
+                del queues[name]
+                continue
+            if now - entry.get('updated', 0.0) > LEDGER_TTL:
+                del queues[name]
+                continue
+            if name == self.queue:
+                continue
+            for job in entry['jobs'].values():
+                self.slots += int(job.get('slots') or 0)
+                self.gpus.update(job.get('gpus') or ())
+
+    def sync(self, running, now=None):
+        """Record this queue's running jobs and read the other queues'.
+
+        ``running`` maps job ids to ``(slots, gpu_ids)``.
+        """
+        now = time.time() if now is None else now
+        jobs = {
+            str(job_id): _allocation(slots, gpu_ids)
+            for job_id, (slots, gpu_ids) in running.items()
+        }
+        with locked_json(self.path, 'queues') as state:
+            queues = state['queues']
+            self._observe(queues, now)
+            entry = queues.get(self.queue)
+            if (entry is None or entry['jobs'] != jobs
+                    or now - entry.get('updated', 0.0) > REFRESH_INTERVAL):
+                queues[self.queue] = {'jobs': jobs, 'updated': now}
+
+    def claim(self, job_id, slots, gpu_ids, global_slots=None, now=None):
+        """Claim ``slots`` and ``gpu_ids`` for a job about to start.
+
+        Returns False, and claims nothing, if another queue took one of the
+        GPUs meanwhile or the job would exceed ``global_slots``.  A job
+        larger than ``global_slots`` may still start when no slots are held.
+        """
+        now = time.time() if now is None else now
+        with locked_json(self.path, 'queues') as state:
+            queues = state['queues']
+            self._observe(queues, now)
+            entry = queues.get(self.queue) or {'jobs': {}}
+            held = self.slots + sum(
+                int(job.get('slots') or 0)
+                for key, job in entry['jobs'].items() if key != str(job_id))
+            if self.gpus.intersection(gpu_ids):
+                return False
+            if global_slots is not None and held and (
+                    held + slots > global_slots):
+                return False
+            entry['jobs'][str(job_id)] = _allocation(slots, gpu_ids)
+            entry['updated'] = now
+            queues[self.queue] = entry
+        return True
+
+    def release(self, job_id):
+        """Give back what was claimed for a job that did not start."""
+        with locked_json(self.path, 'queues') as state:
+            entry = state['queues'].get(self.queue)
+            if isinstance(entry, dict) and isinstance(entry.get('jobs'), dict):
+                entry['jobs'].pop(str(job_id), None)
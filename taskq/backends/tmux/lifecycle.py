@@ -1,5 +1,8 @@
 """Pure metadata transitions for tmux command and merge sidecars."""
 
+import contextlib
+import copy
+import fcntl
 import json
 import os
 import uuid
@@ -24,6 +27,35 @@ def atomic_json(path, value):
         temporary.unlink(missing_ok=True)
 
 
+@contextlib.contextmanager
+def locked_json(path, *sections):
+    """Read, modify and write back the JSON object at ``path`` under a lock.
+
+    The object is yielded with a dict under each of ``sections`` and is
+    written back when the block exits without error, if it changed.
+    Writers of the same file are serialized by ``<path>.lock``.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    lock_path = path.with_name(path.name + '.lock')
+    with open(lock_path, 'a', encoding='utf-8') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            state = None
+        if not isinstance(state, dict):
+            state = {}
+        for section in sections:
+            if not isinstance(state.get(section), dict):
+                state[section] = {}
+        original = copy.deepcopy(state)
+        yield state
+        if state != original:
+            atomic_json(path, state)
+
+
 def read_sidecar(path):
     if not path:
         return None
@@ -35,6 +67,15 @@ def read_sidecar(path):
     return value if isinstance(value, dict) else None
 
 
+def reports_command_result(meta):
+    """Whether the wrapper of a job writes ``command-result.json``.
+
+    Only jobs queued by versions before the sidecar lack it; their
+    completion is recovered from the wrapper's marker in the output.
+    """
+    return bool(meta.get('command_result_file'))
+
+
 def command_result(meta):
     result = read_sidecar(meta.get('command_result_file'))
     if not result:
@@ -0,0 +1,297 @@
+"""Line-offset index of tmux job output logs.
+
+Finding the last lines of a log, a range of its lines or the last line that
+contains a marker otherwise means scanning the log, and ``finished_exitcode``
+did that on every refresh of a running job.  The index is a sidecar
+``output.log.idx`` next to the log: a header followed by one 8-byte record per
+line holding the offset just past the line break, shifted left by one, with
+the low bit set when the line contains ``[taskq] ``, the prefix of the
+wrapper's own messages.  The header keeps the number of log bytes indexed and
+the last such line, so the completion marker is found without reading the
+log at all.
+
+The tmux broker extends the index in the background as jobs write.  Queries
+only read it, under a shared lock, and index whatever was appended since in
+memory, so the work is proportional to new output plus the lines returned and
+readers neither block each other nor need write access to the job directory.  Line breaks
+follow universal newlines like ``read_tail_lines``.  A log shorter than its
+index was truncated, which rebuilds the index, or makes queries scan the whole
+log until the broker did; rotation also removes it.
+"""
+
+import fcntl
+import os
+import re
+import struct
+import tempfile
+from pathlib import Path
+
+
+INDEX_SUFFIX = '.idx'
+TAG = b'[taskq] '
+HEADER = struct.Struct('<4sHHQQ')
+ENTRY = struct.Struct('<Q')
+MAGIC = b'TQLX'
+VERSION = 1
+BLOCK_SIZE = 1 << 20
+# A lone '\r' at the end of a block may still be followed by '\n'.
+_BREAKS = re.compile(rb'\r\n|\r(?=[^\n])|\n')
+
+
+def index_path(path):
+    path = Path(path)
+    return path.with_name(path.name + INDEX_SUFFIX)
+
+
+def _normalize(data):
+    data = data.replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+    return data.decode('utf-8', errors='replace')
+
+
+class LineIndex:
+    """Indexed view of the log ``path``, current as of entering it.
+
+    Use it as a context manager; the index file is locked while it is open.
+    With ``readonly``, the sidecar is only read and what it does not cover is
+    indexed in memory, which means the whole log when it is missing or stale.
+    Otherwise the sidecar is brought up to date, or the index is built in a
+    temporary file for this one use when the sidecar cannot be written.
+    """
+
+    def __init__(self, path, readonly=False):
+        self.path = Path(path)
+        self.index_path = index_path(path)
+        self.readonly = readonly
+        self.log = None
+        self.index = None
+        # Records kept in the index file; later ones are in ``memory``.
+        self.stored = 0
+        self.memory = bytearray()
+        self.size = 0
+        self.indexed = 0
+        self.last_tagged = 0
+        self.count = 0
+        self.trailing_cr = False
+
+    def __enter__(self):
+        self.log = open(self.path, 'rb')
+        try:
+            if self.readonly:
+                try:
+                    self.index = open(self.index_path, 'rb')
+                except OSError:
+                    pass
+                else:
+                    fcntl.flock(self.index, fcntl.LOCK_SH)
+            else:
+                try:
+                    fd = os.open(
+                        self.index_path, os.O_RDWR | os.O_CREAT, 0o644)
+                    self.index = os.fdopen(fd, 'r+b')
+                except OSError:
+                    self.index = tempfile.TemporaryFile()
+                fcntl.flock(self.index, fcntl.LOCK_EX)
+            self._update()
+        except BaseException:
+            self.close()
+            raise
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        for f in (self.index, self.log):
+            if f is not None:
+                f.close()
+        self.index = self.log = None
+
+    def __len__(self):
+        """Number of lines, counting an unterminated last line."""
+        return self.breaks + (self._line_start(self.breaks) < self.size)
+
+    @property
+    def breaks(self):
+        return self.count + self.trailing_cr
+
+    def _write_header(self):
+        self.index.seek(0)
+        self.index.write(HEADER.pack(
+            MAGIC, VERSION, 0, self.indexed, self.last_tagged))
+
+    def _load_header(self):
+        data = b''
+        if self.index is not None:
+            self.index.seek(0)
+            data = self.index.read(HEADER.size)
+        if len(data) == HEADER.size:
+            magic, version, _, indexed, last_tagged = HEADER.unpack(data)
+            records = os.fstat(self.index.fileno()).st_size - HEADER.size
+            if (
+                (magic, version) == (MAGIC, VERSION)
+                and indexed <= self.size
+                and self._follows_break(indexed)
+            ):
+                self.count = self.stored = records // ENTRY.size
+                # A writer interrupted before its header leaves records past
+                # the indexed end.
+                last = self._entry(self.count - 1) >> 1 if self.count else 0
+                if last == indexed:
+                    self.indexed = indexed
+                    self.last_tagged = last_tagged
+                    return
+        # Missing, foreign, torn or ahead of a truncated log: start over.
+        self.indexed = self.last_tagged = self.count = self.stored = 0
+        if not self.readonly:
+            self.index.truncate(0)
+            self._write_header()
+
+    def _follows_break(self, offset):
+        # Indexing stops right after a line break; anything else there means
+        # the log was replaced since.
+        return offset == 0 or self._read(offset - 1, offset) in (b'\n', b'\r')
+
+    def _update(self):
+        self.size = os.fstat(self.log.fileno()).st_size
+        self._load_header()
+        self.log.seek(self.indexed)
+        start = self.indexed
+        pending = b''
+        remaining = self.size - start
+        if not self.readonly:
+            self.index.seek(HEADER.size + self.count * ENTRY.size)
+        while remaining > 0:
+            block = self.log.read(min(BLOCK_SIZE, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            data = pending + block if pending else block
+            records = bytearray()
+            line_start = 0
+            tag = data.find(TAG)
+            for match in _BREAKS.finditer(data):
+                end = match.end()
+                if 0 <= tag < line_start:
+                    tag = data.find(TAG, line_start)
+                tagged = 0 <= tag < end
+                records += ENTRY.pack((start + end) << 1 | tagged)
+                self.count += 1
+                if tagged:
+                    self.last_tagged = self.count
+                line_start = end
+            if self.readonly:
+                self.memory += records
+            else:
+                self.index.write(records)
+            pending = data[line_start:]
+            start += line_start
+        self.indexed = start
+        if not self.readonly:
+            self.stored = self.count
+            self._write_header()
+            self.index.flush()
+        self.trailing_cr = pending.endswith(b'\r')
+
+    def _entry(self, line):
+        if line >= self.stored:
+            return ENTRY.unpack_from(
+                self.memory, (line - self.stored) * ENTRY.size)[0]
+        self.index.seek(HEADER.size + line * ENTRY.size)
+        return ENTRY.unpack(self.index.read(ENTRY.size))[0]
+
+    def _line_end(self, line):
+        """Offset just past the break of ``line``, 0-based."""
+        if line < self.count:
+            return self._entry(line) >> 1
+        return self.size
+
+    def _line_start(self, line):
+        return 0 if line <= 0 else self._line_end(line - 1)
+
+    def _read(self, start, end):
+        self.log.seek(start)
+        return self.log.read(max(0, end - start))
+
+    def tail(self, lines):
+        """Return the last ``lines`` lines like ``read_tail_lines``."""
+        start = 0
+        if 0 < lines <= self.breaks:
+            start = self._line_start(self.breaks - lines + 1)
+        return _normalize(self._read(start, self.size))
+
+    def lines(self, first, stop):
+        """Return lines ``first`` up to ``stop``, 0-based, with their breaks."""
+        first = max(0, first)
+        stop = min(stop, len(self))
+        if first >= stop:
+            return ''
+        return _normalize(self._read(
+            self._line_start(first), self._line_end(stop - 1)))
+
+    def _line(self, line):
+        text = _normalize(self._read(
+            self._line_start(line), self._line_end(line)))
+        return text[:-1] if text.endswith('\n') else text
+
+    def find_last(self, marker):
+        """Return the last line containing ``marker``, without its break."""
+        encoded = marker.encode('utf-8')
+        line = len(self) - 1
+        if line >= self.count:
+            # The unterminated last line is not in the index.
+            text = self._line(line)
+            if marker in text:
+                return text
+            line = self.count - 1
+        if TAG in encoded:
+            # Only tagged lines can contain the marker; the last one is
+            # kept in the header and earlier ones are flagged.
+            line = min(line, self.last_tagged - 1)
+            while line >= 0:
+                if self._entry(line) & 1:
+                    text = self._line(line)
+                    if marker in text:
+                        return text
+                line -= 1
+            return None
+        while line >= 0:
+            text = self._line(line)
+            if marker in text:
+                return text
+            line -= 1
+        return None
+
+
+def indexed_bytes(path):
+    """Return how much of the log ``path`` its index covers, if indexed."""
+    try:
+        with open(index_path(path), 'rb') as f:
+            magic, version, _, indexed, _ = HEADER.unpack(f.read(HEADER.size))
+    except (OSError, struct.error):
+        return None
+    return indexed if (magic, version) == (MAGIC, VERSION) else None
+
+
+def update_index(path):
+    """Index what was appended to the log ``path`` since the last update."""
+    try:
+        with LineIndex(path):
+            return True
+    except OSError:
+        return False
+
+
+def find_last_line(path, marker, readonly=True):
+    """Return the last line of the log ``path`` containing ``marker``.
+
+    Only the broker, which keeps the index current, passes ``readonly=False``.
+    """
+    try:
+        with LineIndex(path, readonly) as index:
+            return index.find_last(marker)
+    except OSError:
+        return None
+
+
+def remove_index(path):
+    index_path(path).unlink(missing_ok=True)
@@ -0,0 +1,207 @@
+"""Rotation and compressed archival of tmux job output logs.
+
+A job writes to ``output.log``.  When a queue caps the log size, the broker
+moves the log into numbered segments next to it, ``output.log.1`` being the
+newest, optionally compressed as ``output.log.<n>.gz`` or ``.zst``; the live
+log is truncated in place because its writers keep it open for appending.
+Once a job is finished, the rest of its log becomes one more segment.
+Readers concatenate the segments oldest first, followed by ``output.log``.
+"""
+
+import collections
+import gzip
+import io
+import os
+import re
+import shutil
+from pathlib import Path
+
+from ...common import TAIL_BLOCK_SIZE, read_tail_lines, tail_lines
+from .lineindex import LineIndex, indexed_bytes, remove_index
+
+
+COMPRESSIONS = {'none': '', 'gzip': '.gz', 'zstd': '.zst'}
+OUTPUT_KEEP = 5
+# A job that outpaces the copy is truncated after this many passes anyway.
+CATCH_UP_ROUNDS = 10
+
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError as e:
+        raise RuntimeError(
+            'zstd output compression requires the zstandard package') from e
+    return zstandard
+
+
+def _open_segment(path, mode):
+    path = str(path)
+    if path.endswith('.gz'):
+        return gzip.open(path, mode)
+    if path.endswith('.zst'):
+        return _zstandard().open(path, mode)
+    return open(path, mode)
+
+
+def rotated_segments(path):
+    """Return ``[(number, segment)]`` of the rotated segments of ``path``."""
+    path = Path(path)
+    pattern = re.compile(re.escape(path.name) + r'\.(\d+)(\.gz|\.zst)?$')
+    segments = []
+    try:
+        candidates = list(path.parent.iterdir())
+    except OSError:
+        return []
+    for candidate in candidates:
+        match = pattern.match(candidate.name)
+        if match:
+            segments.append((int(match.group(1)), candidate))
+    return sorted(segments)
+
+
+def segments(path):
+    """Return the existing parts of the log ``path``, oldest first."""
+    path = Path(path)
+    parts = [segment for _, segment in reversed(rotated_segments(path))]
+    if path.exists():
+        parts.append(path)
+    return parts
+
+
+def _segment_tail(segment, lines):
+    """Return ``(text, complete)`` for the last ``lines`` lines of a segment.
+
+    ``complete`` is false when the segment holds fewer lines, so the caller
+    has to continue with the previous segment.
+    """
+    with _open_segment(segment, 'rb') as f:
+        if str(segment).endswith(('.gz', '.zst')):
+            # Compressed data cannot be read backwards; stream it instead,
+            # keeping no more than the lines asked for.
+            text = io.TextIOWrapper(f, encoding='utf-8', errors='replace')
+            data = tail_lines(
+                ''.join(collections.deque(text, maxlen=lines + 1)), lines + 1)
+        else:
+            data = read_tail_lines(f, lines + 1)
+    if data.count('\n') >= lines:
+        return tail_lines(data, lines), True
+    return data, False
+
+
+def _live_tail(path, lines):
+    """``_segment_tail`` of the live log, served from its line index.
+
+    Building a missing or far behind index would read the whole log, so
+    those logs are read backwards instead.
+    """
+    indexed = indexed_bytes(path)
+    if indexed is None or path.stat().st_size - indexed > TAIL_BLOCK_SIZE:
+        return _segment_tail(path, lines)
+    with LineIndex(path, readonly=True) as index:
+        return index.tail(lines), index.breaks >= lines
+
+
+def read_output(path, tail=0):
+    """Return the log ``path`` with its segments, or its last ``tail`` lines."""
+    parts = segments(path)
+    if tail <= 0:
+        chunks = []
+        for segment in parts:
+            with _open_segment(segment, 'rb') as f:
+                chunks.append(f.read())
+        data = b''.join(chunks)
+        text = io.TextIOWrapper(
+            io.BytesIO(data), encoding='utf-8', errors='replace')
+        return text.read()
+    text = ''
+    for segment in reversed(parts):
+        # Lines may continue across segments, so count the newlines still
+        # missing rather than the lines.
+        if segment == Path(path):
+            data, complete = _live_tail(segment, tail)
+        else:
+            data, complete = _segment_tail(segment, tail)
+        text = data + text
+        if complete:
+            break
+        tail -= data.count('\n')
+    return text
+
+
+def read_output_lines(path, first, stop):
+    """Return lines ``first`` up to ``stop``, 0-based, of the log ``path``.
+
+    A log that was never rotated is served from its line index; otherwise
+    the segments are read as one log.
+    """
+    path = Path(path)
+    if path.exists() and not rotated_segments(path):
+        with LineIndex(path, readonly=True) as index:
+            return index.lines(first, stop)
+    lines = read_output(path).splitlines(keepends=True)
+    return ''.join(lines[max(0, first):max(0, stop)])
+
+
+def _move_into(path, target):
+    """Copy the live log into ``target`` and truncate it in place."""
+    # Keep the suffix, which selects the compression.
+    temporary = target.with_name('.{}.{}'.format(os.getpid(), target.name))
+    try:
+        with open(path, 'rb') as source, _open_segment(temporary, 'wb') as out:
+            # The job keeps appending while the log is copied, so copy what
+            # it added meanwhile until the log stops growing.  Only output
+            # written between the last size check and the truncate is lost;
+            # writers append with O_APPEND, so anything later lands at the
+            # start of the truncated log.
+            for _ in range(CATCH_UP_ROUNDS):
+                shutil.copyfileobj(source, out)
+                if os.fstat(source.fileno()).st_size <= source.tell():
+                    break
+            os.truncate(path, 0)
+        os.replace(temporary, target)
+    finally:
+        temporary.unlink(missing_ok=True)
+
+
+def rotate_output(path, keep=None, compression='none'):
+    """Move the log ``path`` into a new newest segment ``output.log.1``.
+
+    Older segments are renumbered; those beyond ``keep`` are deleted, and with
+    ``keep=0`` the log is simply truncated.  Returns whether anything moved.
+    """
+    path = Path(path)
+    try:
+        if path.stat().st_size == 0:
+            return False
+    except OSError:
+        return False
+    for number, segment in reversed(rotated_segments(path)):
+        if keep is not None and number >= keep:
+            segment.unlink(missing_ok=True)
+            continue
+        suffix = segment.name[len(f'{path.name}.{number}'):]
+        os.replace(segment, segment.with_name(
+            f'{path.name}.{number + 1}{suffix}'))
+    if keep == 0:
+        os.truncate(path, 0)
+    else:
+        _move_into(path, path.with_name(
+            f'{path.name}.1{COMPRESSIONS[compression]}'))
+    remove_index(path)
+    return True
+
+
+def archive_output(path, compression):
+    """Compress the whole log of a finished job into its segments."""
+    if compression == 'none':
+        return False
+    path = Path(path)
+    if not rotate_output(path, None, compression):
+        return False
+    try:
+        if path.stat().st_size == 0:
+            path.unlink()
+    except OSError:
+        pass
+    return True
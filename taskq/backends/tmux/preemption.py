@@ -0,0 +1,99 @@
+"""Preemption of running jobs in favour of more urgent ones.
+
+Jobs added with ``tq add --preemptible`` may give way to a ready job of
+higher ``tq add --priority`` that does not fit.  The broker picks running
+preemptible jobs of lower priority than it, lowest priority and most
+recently started first, until the urgent job would fit, and then, depending
+on the queue's ``preempt`` setting, either
+
+* ``suspend``s them with SIGSTOP.  Their slots are free while they are
+  stopped, but their GPUs keep their memory and stay allocated to them, so
+  this only makes room for jobs short of slots.  They continue with SIGCONT
+  once they fit again, in the queue's scheduling order; or
+* ``requeue``s them.  They receive ``preempt_signal`` so they can write a
+  checkpoint and exit, are killed once ``preempt_grace`` passed, and are
+  queued again under the same id, to start over or resume from their
+  checkpoint when resources allow.  Only jobs that end through the signal,
+  i.e. with status 128 plus its number, or are killed once the grace period
+  passed are requeued; a job that exits in any other way meanwhile
+  succeeded or failed on its own, and is recorded as such.
+
+The urgent job is then tried before any other ready job, so the jobs it
+displaced cannot take their resources back first.
+"""
+
+import datetime
+import signal
+
+from .scheduling import priority
+
+
+PREEMPT_MODES = ('requeue', 'suspend')
+# The signals the job wrapper lets through to the command, see wrapper.sh.
+PREEMPT_SIGNALS = ('TERM', 'USR1', 'USR2')
+
+
+def parse_signal(name):
+    """Return the preemption signal called ``name``, e.g. ``USR1``."""
+    value = str(name).strip().upper()
+    value = value[3:] if value.startswith('SIG') else value
+    if value not in PREEMPT_SIGNALS:
+        raise ValueError(
+            f'preempt_signal must be one of: {", ".join(PREEMPT_SIGNALS)}')
+    return signal.Signals['SIG' + value]
+
+
+def preempted_exit(exitcode, signum):
+    """Whether a command exiting with ``exitcode`` ended through ``signum``.
+
+    The wrapper records the shell's status, 128 plus the signal number, for
+    a command killed by a signal; jobs that save a checkpoint first should
+    exit with that status too.
+    """
+    return exitcode == 128 + int(signum)
+
+
+def grace_expired(meta, grace, now):
+    """Whether ``grace`` seconds passed since job ``meta`` was preempted."""
+    try:
+        since = datetime.datetime.fromisoformat(meta['preempt_time'])
+    except (KeyError, TypeError, ValueError):
+        return True
+    return (now - since).total_seconds() >= grace
+
+
+def candidates(running, urgency):
+    """Running jobs that a job of priority ``urgency`` may preempt.
+
+    ``running`` holds ``(meta, slots, gpus)`` of each running job.  Jobs
+    already being preempted are left out.
+    """
+    jobs = sorted(
+        (
+            job for job in running
+            if job[0].get('preemptible') and not job[0].get('preempt_time')
+            and priority(job[0]) < urgency
+        ),
+        key=lambda job: job[0].get('start_time') or '', reverse=True)
+    return sorted(jobs, key=lambda job: priority(job[0]))
+
+
+def choose_victims(slots, gpus, free_slots, free_gpus, jobs, mode):
+    """Return the jobs to preempt so one needing ``slots`` and ``gpus`` fits.
+
+    ``free_slots`` and ``free_gpus`` count what is free now or already being
+    released, and ``jobs`` are :func:`candidates` in the order to preempt
+    them.  Suspended jobs keep their GPUs.  Returns ``None`` if preempting
+    every candidate would not be enough.
+    """
+    victims = []
+    for meta, job_slots, job_gpus in jobs:
+        if free_slots >= slots and free_gpus >= gpus:
+            break
+        victims.append(meta)
+        free_slots += job_slots
+        if mode == 'requeue':
+            free_gpus += job_gpus
+    if free_slots >= slots and free_gpus >= gpus:
+        return victims
+    return None
@@ -0,0 +1,254 @@
+"""Scheduling policies, run time estimates and backfill for the tmux broker.
+
+A queue's scheduling policy orders its ready jobs: ``fifo`` by id,
+``priority`` by ``tq add --priority`` and then id, ``sjf`` shortest
+expected job first, and ``fair`` by the recent usage of the submitting
+users, see :mod:`.fairshare`.  Other policies are plugged in as
+``module:Class``.
+The broker starts jobs in that order.  Once one of them does not fit, it
+becomes the head of the line and receives a reservation: the earliest time
+the slots and GPUs it needs are expected to be free, judged from when
+running jobs should end.  Later jobs may still start before it, but only if
+they are expected to finish by then or only use what the head job leaves
+over at that time, so the head job is never delayed by them.
+
+Run times are the ones declared with ``tq add --time``, or else the longest
+of the last few successful runs of the same command, or failing that of
+similar commands that only differ in numbers.  A running job whose
+end cannot be estimated, or that overran its estimate, is treated as if it
+could end at any moment, which keeps reservations from ever being too late.
+"""
+
+import datetime
+import importlib
+import re
+from collections import deque
+from dataclasses import dataclass
+
+from .fairshare import UNKNOWN_USER
+
+
+BACKFILL_MODES = ('easy', 'greedy', 'none')
+# Successful runs remembered per command for estimates.
+RUNTIME_SAMPLES = 5
+# How ``sjf`` ranks jobs whose run time cannot be estimated.
+UNKNOWN_RUNTIME = 3600
+_NUMBERS = re.compile(r'\d+(?:\.\d+)?')
+
+
+def _timestamp(value):
+    try:
+        return datetime.datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def elapsed(meta, now):
+    """Seconds from the start of job ``meta`` until ``now``, if started."""
+    start = _timestamp(meta.get('start_time'))
+    return None if start is None else (now - start).total_seconds()
+
+
+def command_shape(command):
+    """Return ``command`` with numbers masked, e.g. seeds and epochs."""
+    return _NUMBERS.sub('#', command)
+
+
+def run_time(meta):
+    start = _timestamp(meta.get('start_time'))
+    end = _timestamp(meta.get('end_time'))
+    if start is None or end is None or end < start:
+        return None
+    return (end - start).total_seconds()
+
+
+class RuntimeHistory:
+    """Recent run times of successful jobs, by command and command shape."""
+
+    def __init__(self, samples=RUNTIME_SAMPLES):
+        self.samples = samples
+        self.runs = {}
+        self.shapes = {}
+
+    def _record(self, runs, key, seconds):
+        samples = runs.get(key)
+        if samples is None:
+            samples = runs[key] = deque(maxlen=self.samples)
+        samples.append(seconds)
+
+    def observe(self, metas):
+        for meta in metas:
+            if meta.get('status') != 'success':
+                continue
+            seconds = run_time(meta)
+            command = meta.get('command')
+            if seconds is None or command is None:
+                continue
+            self._record(self.runs, command, seconds)
+            self._record(self.shapes, command_shape(command), seconds)
+
+    def estimate(self, meta):
+        """Return the expected run time of ``meta`` in seconds, if known."""
+        declared = meta.get('runtime_estimate')
+        if declared is not None:
+            try:
+                return float(declared)
+            except (TypeError, ValueError):
+                pass
+        command = meta.get('command')
+        if command is None:
+            return None
+        runs = self.runs.get(command) or self.shapes.get(command_shape(command))
+        return max(runs) if runs else None
+
+
+POLICIES = {}
+
+
+def register_policy(name):
+    def decorator(cls):
+        cls.name = name
+        POLICIES[name] = cls
+        return cls
+    return decorator
+
+
+def policy_class(name):
+    """Return the policy registered as ``name``, or ``module:Class``."""
+    if name in POLICIES:
+        return POLICIES[name]
+    module, _, attr = str(name).partition(':')
+    if not module or not attr:
+        raise ValueError(
+            f'unknown scheduling policy {name!r}; use one of '
+            + ', '.join(POLICIES) + ' or module:Class')
+    try:
+        cls = getattr(importlib.import_module(module), attr)
+    except (ImportError, AttributeError) as e:
+        raise ValueError(f'cannot load scheduling policy {name!r}: {e}') from e
+    if not (isinstance(cls, type) and issubclass(cls, SchedulingPolicy)):
+        raise ValueError(
+            f'scheduling policy {name!r} is not a SchedulingPolicy')
+    return cls
+
+
+class SchedulingPolicy:
+    """Order in which the broker considers a queue's ready jobs.
+
+    Subclasses implement :meth:`key`; jobs with smaller keys are tried
+    first.  ``history`` estimates run times, see :class:`RuntimeHistory`.
+    Policies with ``fair_share`` set take part in the socket's fair-share
+    accounting, see :mod:`.fairshare`, and are given the recent usage of
+    every user as ``user_usage`` before each ordering.
+    """
+    name = None
+    fair_share = False
+
+    def __init__(self, history):
+        self.history = history
+
+    def key(self, meta, now):
+        raise NotImplementedError
+
+    def order(self, jobs, now):
+        """Sort ``(path, meta)`` pairs of ready jobs."""
+        return sorted(jobs, key=lambda job: self.key(job[1], now))
+
+
+@register_policy('fifo')
+class FIFOPolicy(SchedulingPolicy):
+    def key(self, meta, now):
+        return int(meta['id'])
+
+
+def priority(meta):
+    try:
+        return int(meta.get('priority') or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+@register_policy('priority')
+class PriorityPolicy(SchedulingPolicy):
+    """Higher ``tq add --priority`` first, then in submission order."""
+
+    def key(self, meta, now):
+        return -priority(meta), int(meta['id'])
+
+
+@register_policy('sjf')
+class ShortestJobFirstPolicy(SchedulingPolicy):
+    """Shortest expected job first, aged by waiting time.
+
+    Jobs are ranked by their expected run time less the time they have
+    waited, so among jobs queued together the shortest goes first, while a
+    long job moves up as it waits and is never starved by newer short ones.
+    """
+
+    def key(self, meta, now):
+        expected = self.history.estimate(meta)
+        if expected is None:
+            expected = UNKNOWN_RUNTIME
+        enqueued = _timestamp(meta.get('enqueue_time'))
+        waited = 0.0 if enqueued is None else max(
+            0.0, (now - enqueued).total_seconds())
+        return expected - waited, int(meta['id'])
+
+
+@register_policy('fair')
+class FairSharePolicy(SchedulingPolicy):
+    """Jobs of users with the least recent usage first, then by id."""
+    fair_share = True
+
+    def __init__(self, history):
+        super().__init__(history)
+        self.user_usage = {}
+
+    def key(self, meta, now):
+        user = meta.get('user') or UNKNOWN_USER
+        return self.user_usage.get(user, 0.0), int(meta['id'])
+
+
+@dataclass
+class Reservation:
+    """Resources held back for the head-of-line job.
+
+    ``wait`` is the number of seconds until the head job is expected to
+    start; ``slots`` and ``gpus`` are what it leaves over at that time.
+    """
+    wait: float
+    slots: int
+    gpus: int
+
+    def admit(self, estimate, slots, gpus):
+        """Whether a job may start now without delaying the head job."""
+        if estimate is not None and estimate <= self.wait:
+            return True
+        if slots <= self.slots and gpus <= self.gpus:
+            self.slots -= slots
+            self.gpus -= gpus
+            return True
+        return False
+
+
+def reserve(slots, gpus, capacity, free_slots, free_gpu_ids, running):
+    """Plan when a job needing ``slots`` and ``gpus`` can start.
+
+    ``capacity`` is the queue's slot count and ``free_gpu_ids`` the GPUs
+    free right now.  ``running`` holds ``(remaining, slots, gpu_ids)`` of
+    each running job, where ``remaining`` is the number of seconds it is
+    still expected to run.  A job larger than ``capacity`` runs alone, so it
+    waits for every running job.
+    """
+    slots = min(slots, capacity)
+    free_gpus = set(free_gpu_ids)
+    wait = 0.0
+    for remaining, job_slots, gpu_ids in sorted(
+            running, key=lambda job: job[0]):
+        if free_slots >= slots and len(free_gpus) >= gpus:
+            break
+        wait = max(wait, remaining)
+        free_slots += job_slots
+        free_gpus.update(gpu_ids)
+    return Reservation(
+        wait, max(0, free_slots - slots), max(0, len(free_gpus) - gpus))
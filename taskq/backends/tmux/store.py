@@ -0,0 +1,371 @@
+"""SQLite index over the per-job ``meta.json`` records of a tmux queue.
+
+Every ``jobs/<id>/meta.json`` remains the durable record.  The index caches
+terminal jobs so listings and broker ticks do not have to open and parse every
+historical job file; nonterminal rows are always re-read from disk because the
+wrapper, the merge controller and external tools may advance them.  A missing
+or outdated index is rebuilt transparently from the job directories.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from .lifecycle import TERMINAL_STATUSES
+
+
+SCHEMA_VERSION = 1
+INDEX_NAME = 'jobs.sqlite3'
+# Directory mtimes are only trusted once they are clearly older than the scan
+# that observed them; entries created within the same timestamp granularity
+# would otherwise be missed.
+RACY_NS = 1_000_000_000
+# Larger selectors are filtered in Python to stay below SQLite's host
+# parameter limit.
+MAX_SQL_IDS = 500
+
+_SCHEMA = r"""
+CREATE TABLE jobs (
+    id INTEGER PRIMARY KEY,
+    status TEXT NOT NULL,
+    meta TEXT NOT NULL
+);
+
+CREATE INDEX jobs_status_idx ON jobs(status, id);
+
+CREATE TABLE sync (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+_STORES = {}
+_STORES_LOCK = threading.Lock()
+
+
+def _dump(meta):
+    return json.dumps(meta, sort_keys=True, separators=(',', ':'))
+
+
+def _read(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+class JobStore:
+    """Status- and id-indexed view of ``state_dir/jobs``."""
+
+    def __init__(self, state_dir):
+        self.state_dir = Path(state_dir)
+        self.jobs_dir = self.state_dir / 'jobs'
+        self.path = self.state_dir / INDEX_NAME
+        self._lock = threading.RLock()
+        self._db = None
+
+    def _connect(self):
+        if self._db is not None:
+            return self._db
+        self.state_dir.mkdir(parents=True, exist_ok=True)
+        try:
+            self._db = self._open()
+        except sqlite3.DatabaseError:
+            # The index is derived data; a corrupt or foreign file is
+            # discarded and rebuilt from the job directories.
+            self.path.unlink(missing_ok=True)
+            self._db = self._open()
+        return self._db
+
+    def _open(self):
+        db = sqlite3.connect(
+            str(self.path), timeout=30, isolation_level=None,
+            check_same_thread=False,
+        )
+        try:
+            db.execute('PRAGMA busy_timeout = 30000')
+            db.execute('PRAGMA journal_mode = WAL')
+            db.execute('PRAGMA synchronous = NORMAL')
+            version = db.execute('PRAGMA user_version').fetchone()[0]
+            if version != SCHEMA_VERSION:
+                db.executescript(
+                    'DROP TABLE IF EXISTS jobs; DROP TABLE IF EXISTS sync;')
+                db.executescript(_SCHEMA)
+                db.execute('PRAGMA user_version = {}'.format(SCHEMA_VERSION))
+        except sqlite3.DatabaseError:
+            db.close()
+            raise
+        return db
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def meta_path(self, job_id):
+        return self.jobs_dir / str(job_id) / 'meta.json'
+
+    def put(self, meta):
+        """Record a ``meta.json`` payload that was just written to disk."""
+        self.put_many([meta])
+
+    def put_many(self, metas):
+        rows = [
+            (int(meta['id']), str(meta.get('status')), _dump(meta))
+            for meta in metas
+        ]
+        try:
+            with self._lock:
+                db = self._connect()
+                db.execute('BEGIN IMMEDIATE')
+                try:
+                    db.executemany(
+                        'INSERT OR REPLACE INTO jobs (id, status, meta) '
+                        'VALUES (?, ?, ?)', rows)
+                except Exception:
+                    db.rollback()
+                    raise
+                else:
+                    db.commit()
+        except (sqlite3.Error, OSError):
+            # Nonterminal rows are re-read from disk anyway, so a failed
+            # index write only delays a terminal row until the next rebuild.
+            pass
+
+    def delete(self, job_id):
+        try:
+            with self._lock:
+                self._connect().execute(
+                    'DELETE FROM jobs WHERE id = ?', (int(job_id),))
+        except (sqlite3.Error, OSError):
+            pass
+
+    def _sync_value(self, db, key):
+        row = db.execute(
+            'SELECT value FROM sync WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def _sync_directory(self, db):
+        """Index job directories created or removed behind the store's back."""
+        try:
+            mtime = self.jobs_dir.stat().st_mtime_ns
+        except FileNotFoundError:
+            db.execute('DELETE FROM jobs')
+            db.execute('DELETE FROM sync')
+            return
+        synced_at = self._sync_value(db, 'synced_at_ns')
+        if (
+            self._sync_value(db, 'jobs_mtime_ns') == mtime
+            and synced_at is not None
+            and mtime < synced_at - RACY_NS
+        ):
+            return
+        scanned_at = time.time_ns()
+        on_disk = {
+            int(name) for name in os.listdir(self.jobs_dir) if name.isdigit()
+        }
+        indexed = {row[0] for row in db.execute('SELECT id FROM jobs')}
+        complete = True
+        rows = []
+        for job_id in sorted(on_disk - indexed):
+            try:
+                meta = _read(self.meta_path(job_id))
+            except (OSError, json.JSONDecodeError):
+                # Probably still being written; scan again next time.
+                complete = False
+                continue
+            rows.append((job_id, str(meta.get('status')), _dump(meta)))
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            db.executemany(
+                'INSERT OR IGNORE INTO jobs (id, status, meta) '
+                'VALUES (?, ?, ?)', rows)
+            for job_id in indexed - on_disk:
+                if not (self.jobs_dir / str(job_id)).exists():
+                    db.execute('DELETE FROM jobs WHERE id = ?', (job_id,))
+            db.execute(
+                'INSERT OR REPLACE INTO sync (key, value) VALUES (?, ?)',
+                ('jobs_mtime_ns', mtime if complete else -1))
+            db.execute(
+                'INSERT OR REPLACE INTO sync (key, value) VALUES (?, ?)',
+                ('synced_at_ns', scanned_at))
+        except Exception:
+            db.rollback()
+            raise
+        else:
+            db.commit()
+
+    def _query(self, db, ids, statuses, live=True):
+        if ids is not None and not ids:
+            return []
+        clauses = []
+        params = []
+        if ids is not None and len(ids) <= MAX_SQL_IDS:
+            clauses.append('id IN ({})'.format(','.join('?' for _ in ids)))
+            params += [int(job_id) for job_id in ids]
+        if statuses is not None and not live:
+            wanted = sorted(set(statuses))
+            if not wanted:
+                return []
+            clauses.append('status IN ({})'.format(
+                ','.join('?' for _ in wanted)))
+            params += wanted
+        elif statuses is not None:
+            # Nonterminal rows may have advanced on disk, so they are always
+            # candidates; callers filter again after refreshing them.
+            wanted = sorted(set(statuses))
+            terminal = sorted(TERMINAL_STATUSES)
+            clause = 'status NOT IN ({})'.format(
+                ','.join('?' for _ in terminal))
+            if wanted:
+                clause = '(status IN ({}) OR {})'.format(
+                    ','.join('?' for _ in wanted), clause)
+            clauses.append(clause)
+            params += wanted + terminal
+        sql = 'SELECT id, status, meta FROM jobs'
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        rows = db.execute(sql + ' ORDER BY id', params).fetchall()
+        if ids is not None and len(ids) > MAX_SQL_IDS:
+            selected = {int(job_id) for job_id in ids}
+            rows = [row for row in rows if row[0] in selected]
+        return rows
+
+    def _rows(self, ids, statuses, live=True):
+        try:
+            with self._lock:
+                db = self._connect()
+                self._sync_directory(db)
+                return self._query(db, ids, statuses, live)
+        except sqlite3.Error as e:
+            with self._lock:
+                self._discard(e)
+            return self._scan(ids, statuses, live)
+
+    def _discard(self, error):
+        """Drop the connection after ``error``, and a damaged index file."""
+        self.close()
+        if (isinstance(error, sqlite3.DatabaseError)
+                and not isinstance(error, sqlite3.OperationalError)):
+            # Corruption shows up on first use as often as on open; locks
+            # and I/O errors are OperationalErrors and leave the file alone.
+            try:
+                self.path.unlink(missing_ok=True)
+            except OSError:
+                pass
+
+    def _scan(self, ids, statuses, live=True):
+        """Read rows from the job directories when the index is unusable."""
+        try:
+            names = os.listdir(self.jobs_dir)
+        except FileNotFoundError:
+            return []
+        on_disk = sorted(int(name) for name in names if name.isdigit())
+        if ids is not None:
+            selected = {int(job_id) for job_id in ids}
+            on_disk = [job_id for job_id in on_disk if job_id in selected]
+        wanted = None if statuses is None else set(statuses)
+        rows = []
+        for job_id in on_disk:
+            try:
+                meta = _read(self.meta_path(job_id))
+            except (OSError, json.JSONDecodeError):
+                continue
+            status = str(meta.get('status'))
+            if wanted is not None and status not in wanted and (
+                    not live or status in TERMINAL_STATUSES):
+                continue
+            rows.append((job_id, status, _dump(meta)))
+        return rows
+
+    def _current(self, job_id, text):
+        """Re-read a nonterminal job and refresh its row if it changed."""
+        path = self.meta_path(job_id)
+        try:
+            meta = _read(path)
+        except FileNotFoundError:
+            if not path.parent.exists():
+                self.delete(job_id)
+            return None
+        except (OSError, json.JSONDecodeError):
+            return None
+        if _dump(meta) != text:
+            self.put(meta)
+        return meta
+
+    def load(self, ids=None, statuses=None):
+        """Return ``(path, meta)`` pairs ordered by job id.
+
+        ``ids`` and ``statuses`` narrow the rows that are decoded.  Terminal
+        rows come straight from the index; all others are re-read from their
+        ``meta.json`` and the index is updated when they changed.
+        """
+        metas = []
+        for job_id, status, text in self._rows(ids, statuses):
+            if status in TERMINAL_STATUSES:
+                try:
+                    meta = json.loads(text)
+                except json.JSONDecodeError:
+                    continue
+            else:
+                meta = self._current(job_id, text)
+                if meta is None:
+                    continue
+            metas.append((self.meta_path(job_id), meta))
+        return metas
+
+    def finished(self, ids=None, statuses=None):
+        """Return ``(path, meta)`` pairs of terminal jobs from the index alone."""
+        wanted = TERMINAL_STATUSES
+        if statuses is not None:
+            wanted = TERMINAL_STATUSES & set(statuses)
+        metas = []
+        for job_id, _, text in self._rows(ids, wanted, live=False):
+            try:
+                metas.append((self.meta_path(job_id), json.loads(text)))
+            except json.JSONDecodeError:
+                continue
+        return metas
+
+    def active(self):
+        """Return ``(path, meta)`` pairs for every nonterminal job."""
+        return self.load(statuses=())
+
+    def statuses(self, ids):
+        """Return ``{id: status}`` for ``ids``, decoding only live rows."""
+        ids = sorted({int(job_id) for job_id in ids})
+        if not ids:
+            return {}
+        result = {}
+        for job_id, status, text in self._rows(ids, None):
+            if status not in TERMINAL_STATUSES:
+                meta = self._current(job_id, text)
+                if meta is None:
+                    continue
+                status = meta.get('status')
+            result[job_id] = status
+        return result
+
+
+def job_store(state_dir):
+    """Return the process-wide store for ``state_dir``."""
+    key = str(Path(state_dir))
+    with _STORES_LOCK:
+        store = _STORES.get(key)
+        if store is None:
+            store = _STORES[key] = JobStore(state_dir)
+        return store
+
+
+def close_store(state_dir):
+    with _STORES_LOCK:
+        store = _STORES.pop(str(Path(state_dir)), None)
+    if store is not None:
+        store.close()
+
+
+def index_meta(path, meta):
+    """Mirror a freshly written ``state_dir/jobs/<id>/meta.json`` into its index."""
+    job_store(Path(path).parents[2]).put(meta)
@@ -19,9 +19,17 @@ export TASKQ_JOB_ID={job_id}
 export TASKQ_SESSION={session}
 output_file={output_file}
 command_result_file={command_result_file}
+wakeup_file={wakeup_file}
+journal_file={journal_file}
 merge_enabled={merge_enabled}
 submission_id={submission_id}
+if [ {capture_to_file} -eq 1 ]; then
+    exec >> "$output_file" 2>&1
+fi
 printf "[taskq] job {job_id} started at %s\n" "$(date)"
+# Preemption signals are meant for the command; the wrapper outlives them to
+# record its exit code.  The command gets their default handling back.
+trap : USR1 USR2 TERM
 if [ "$#" -eq 0 ]; then
     exitcode=127
 else
@@ -37,6 +45,12 @@ fi
 command_result_tmp="${{command_result_file}}.tmp.$$"
 printf '{{"exitcode":%s,"end_time":"%s","submission_id":"%s"}}\n' "$exitcode" "$command_end_time" "$submission_id" > "$command_result_tmp"
 mv -f "$command_result_tmp" "$command_result_file"
+if [ -n "$journal_file" ]; then
+    printf '{{"id":%s,"event":"result"}}\n' {job_id} >> "$journal_file" 2>/dev/null
+fi
+if [ -p "$wakeup_file" ]; then
+    (exec 3<>"$wakeup_file" && printf . >&3) 2>/dev/null
+fi
 if [ "$merge_enabled" -eq 1 ] && [ "$exitcode" -eq 0 ]; then
     exit 0
 fi
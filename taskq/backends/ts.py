@@ -1,11 +1,51 @@
+import os
 import re
+import json
 import shlex
 import datetime
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 
 from ..common import tqdm, STATUSES, file_tail_lines, tail_lines, dict_simplify
+from ..common import user_cache_dir
 from .base import register_backend, BackendBase
 
 
+INFO_WORKERS = 8
+FINISHED_STATUSES = ('success', 'failed', 'killed')
+INFO_CACHE_VERSION = 1
+TIME_FIELDS = ('enqueue_time', 'start_time', 'end_time')
+
+
+def info_cache_path(socket_path, cache_root=None):
+    """Return where details of finished jobs of a ts socket are kept."""
+    cache_root = user_cache_dir() if cache_root is None else Path(cache_root)
+    if cache_root is None:
+        return None
+    name = re.sub(r'[^A-Za-z0-9_.-]+', '-', str(socket_path)).strip('-')
+    return cache_root / 'ts' / f'{name or "default"}.json'
+
+
+def _encode_details(details):
+    record = dict(details)
+    for key in TIME_FIELDS:
+        if key in record:
+            record[key] = record[key].isoformat()
+    if 'time_run' in record:
+        record['time_run'] = record['time_run'].total_seconds()
+    return record
+
+
+def _decode_details(record):
+    details = dict(record)
+    for key in TIME_FIELDS:
+        if key in details:
+            details[key] = datetime.datetime.fromisoformat(details[key])
+    if 'time_run' in details:
+        details['time_run'] = datetime.timedelta(seconds=details['time_run'])
+    return details
+
+
 @register_backend('ts')
 class TaskSpoolerBackend(BackendBase):
     def __init__(self, name, config):
@@ -15,6 +55,11 @@ class TaskSpoolerBackend(BackendBase):
         self.env.setdefault('TS_SLOTS', str(slots))
         self.env.setdefault('TS_SOCKET', f'/tmp/ts-{socket}.sock')
         self.env = dict_simplify(self.env, not_value=True)
+        self.info_workers = int(self.config.get('info_workers', INFO_WORKERS))
+        self.info_cache = info_cache_path(
+            self.env.get('TS_SOCKET') or os.environ.get('TS_SOCKET', socket))
+        # (job id, listing key) -> details of finished jobs, loaded lazily
+        self._finished_details = None
         self.backend_getset('slots', slots)
 
     def backend_getset(self, key, value=None):
@@ -42,11 +87,16 @@ class TaskSpoolerBackend(BackendBase):
     def backend_kill(self, args):
         self.exec('-K')
 
-    def job_info(self, ids=None, filters=None):
-        info = []
+    def _list_jobs(self):
+        """Return ``(info, key)`` for every job listed by ``ts``.
+
+        ``key`` is the rest of the listing line, which stays the same for as
+        long as a finished job keeps its id.
+        """
+        jobs = []
         tsout = self.exec()
         if not tsout:
-            return info
+            return jobs
         for l in tsout.splitlines()[1:]:
             l = l.strip().split()
             if l[1] == 'finished':
@@ -63,19 +113,30 @@ class TaskSpoolerBackend(BackendBase):
                 exitcode = None
             if status == 'allocating':
                 status = 'queued'
-            info.append({
+            info = {
                 'id': int(job_id),
                 'status': status,
                 'exitcode': exitcode
-            })
+            }
+            jobs.append((info, ' '.join(l[2:])))
+        return jobs
+
+    @staticmethod
+    def _filter_jobs(jobs, ids=None, filters=None):
         if filters is not None and not filters.all:
             for a in STATUSES:
                 if getattr(filters, a):
                     continue
-                info = [i for i in info if i['status'] != a]
+                jobs = [j for j in jobs if j[0]['status'] != a]
         if ids is not None:
-            info = [i for i in info if i['id'] in ids]
-        return info
+            jobs = [j for j in jobs if j[0]['id'] in ids]
+        return jobs
+
+    def job_info(self, ids=None, filters=None):
+        return [
+            info for info, _ in
+            self._filter_jobs(self._list_jobs(), ids, filters)
+        ]
 
     @classmethod
     def get_line(cls, ji, key):
@@ -91,48 +152,123 @@ class TaskSpoolerBackend(BackendBase):
             return None
         return datetime.datetime.strptime(time, '%a %b %d %H:%M:%S %Y')
 
+    def _job_details(self, job_id):
+        ji = self.exec('-i', job_id)
+        start_time = self.get_time(ji, 'Start time: ')
+        end_time = self.get_time(ji, 'End time: ')
+        if not start_time:
+            delta = None
+        elif not end_time:
+            delta = datetime.datetime.now() - start_time
+        else:
+            delta = end_time - start_time
+        try:
+            pid = int(self.exec('-p', job_id, check=False) or -1)
+        except ValueError:
+            pid = None
+        new_info = {
+            'command': self.get_line(ji, 'Command: '),
+            'slots_required':
+                int(self.get_line(ji, 'Slots required: ') or 1),
+            'gpus_required':
+                int(self.get_line(ji, 'GPUs required: ') or 0),
+            'gpu_ids': self.get_line(ji, 'GPU IDs: '),
+            'enqueue_time': self.get_time(ji, 'Enqueue time: '),
+            'start_time': start_time,
+            'end_time': end_time,
+            'time_run': delta,
+            'output_file': self.exec('-o', job_id, check=False),
+            'pid': pid,
+        }
+        return {k: v for k, v in new_info.items() if v is not None}
+
+    def _load_finished_details(self):
+        if self.info_cache is None:
+            return {}
+        try:
+            with open(self.info_cache, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+            if cache.get('version') != INFO_CACHE_VERSION:
+                return {}
+            return {
+                (int(job_id), key): _decode_details(record)
+                for job_id, key, record in cache['jobs']
+            }
+        except (OSError, ValueError, TypeError, KeyError, AttributeError):
+            return {}
+
+    def _save_finished_details(self):
+        if self.info_cache is None:
+            return
+        cache = {
+            'version': INFO_CACHE_VERSION,
+            'jobs': [
+                [job_id, key, _encode_details(details)]
+                for (job_id, key), details in
+                sorted(self._finished_details.items())
+            ],
+        }
+        temporary = self.info_cache.with_name(
+            '.{}.{}.tmp'.format(self.info_cache.name, os.getpid()))
+        try:
+            self.info_cache.parent.mkdir(parents=True, exist_ok=True)
+            with open(temporary, 'w', encoding='utf-8') as f:
+                json.dump(cache, f)
+            os.replace(temporary, self.info_cache)
+        except OSError:
+            # The cache is an optimization; without it ts is just asked again.
+            temporary.unlink(missing_ok=True)
+
     def full_info(
         self, ids=None, filters=None, extra_func=None, tqdm_disable=False
     ):
-        info = self.job_info(ids, filters)
-        for i in tqdm(info, disable=tqdm_disable, desc='info'):
-            ji = self.exec('-i', i['id'])
-            start_time = self.get_time(ji, 'Start time: ')
-            end_time = self.get_time(ji, 'End time: ')
-            if not start_time:
-                delta = None
-            elif not end_time:
-                delta = datetime.datetime.now() - start_time
+        listed = self._list_jobs()
+        if self._finished_details is None:
+            self._finished_details = self._load_finished_details()
+        # Jobs removed or renumbered by `ts -r` or `ts -C` drop out.
+        current = {(i['id'], key) for i, key in listed}
+        stale = [k for k in self._finished_details if k not in current]
+        for k in stale:
+            del self._finished_details[k]
+        changed = bool(stale)
+        jobs = self._filter_jobs(listed, ids, filters)
+        details = {}
+        pending = []
+        for i, key in jobs:
+            cached = self._finished_details.get((i['id'], key))
+            if cached is None:
+                pending.append((i, key))
             else:
-                delta = end_time - start_time
-            try:
-                pid = int(self.exec('-p', i['id'], check=False) or -1)
-            except ValueError:
-                pid = None
-            new_info = {
-                'command': self.get_line(ji, 'Command: '),
-                'slots_required':
-                    int(self.get_line(ji, 'Slots required: ') or 1),
-                'gpus_required':
-                    int(self.get_line(ji, 'GPUs required: ') or 0),
-                'gpu_ids': self.get_line(ji, 'GPU IDs: '),
-                'enqueue_time': self.get_time(ji, 'Enqueue time: '),
-                'start_time': start_time,
-                'end_time': end_time,
-                'time_run': delta,
-                'output_file': self.exec('-o', i['id'], check=False),
-                'pid': pid,
-            }
-            i.update({k: v for k, v in new_info.items() if v is not None})
+                details[i['id']] = cached
+        # Each job costs three ts processes, so query jobs concurrently and
+        # finished ones only once.
+        workers = max(1, min(self.info_workers, len(pending)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = pool.map(
+                self._job_details, [i['id'] for i, _ in pending])
+            for (i, key), new_info in tqdm(
+                zip(pending, results), total=len(pending),
+                disable=tqdm_disable, desc='info',
+            ):
+                details[i['id']] = new_info
+                if i['status'] in FINISHED_STATUSES:
+                    self._finished_details[(i['id'], key)] = new_info
+                    changed = True
+        if changed:
+            self._save_finished_details()
+        info = []
+        for i, _ in jobs:
+            i.update(details[i['id']])
             if extra_func:
                 extra_func(i)
+            info.append(i)
         return info
 
     def output(self, info, tail, shell=False):
         if shell:
             self.exec('-c', info['id'], check=False, shell=True)
             return ''
-        if info['status'] in ['success', 'failed', 'killed']:
+        if info['status'] in FINISHED_STATUSES:
             return tail_lines(self.exec('-c', info['id'], check=False), tail)
         f = info.get('output_file') or self.exec('-o', info['id'], check=False)
         return file_tail_lines(f, tail) if f else ''
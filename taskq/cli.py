@@ -1,12 +1,11 @@
 import sys
 import argparse
 from importlib import resources
+from pathlib import Path
 
-import tomlkit
-
-from . import TOOL_NAME, __version__
+from . import TOOL_NAME, __version__, configcache
 from .common import dict_merge, project_config_dir, user_config_dir
-from .actions import INFO
+from .actions import ACTION_SPECS, INFO
 from .backends import BACKENDS
 
 
@@ -47,57 +46,124 @@ class CLI:
         for option, kwargs in self.base_options.items():
             self.parser.add_argument(*option, **kwargs)
         action_parsers = self.parser.add_subparsers(dest='action')
-        for action in INFO['actions'].values():
-            kwargs = action.parser_kwargs
-            action_parser = action_parsers.add_parser(**kwargs)
-            for option, kwargs in action.options.items():
-                action_parser.add_argument(*option, **kwargs)
+        # Actions are only imported once selected; until then their parsers
+        # carry just the metadata declared in ACTION_SPECS.
+        self.action_parsers = {
+            name: action_parsers.add_parser(
+                name, help=spec.help, aliases=spec.aliases)
+            for name, spec in ACTION_SPECS.items()
+        }
+        self.populated_actions = set()
+
+    def _selected_action(self, args):
+        value_options = {
+            option
+            for options, kwargs in self.base_options.items()
+            if kwargs.get('action') != 'store_true'
+            for option in options
+        }
+        args = iter(args)
+        for arg in args:
+            if arg in value_options:
+                next(args, None)
+            elif not arg.startswith('-'):
+                return INFO['aliases'].get(arg)
+        return None
+
+    def _add_action_options(self, name):
+        parser = self.action_parsers[name]
+        if name in self.populated_actions:
+            return
+        self.populated_actions.add(name)
+        for option, kwargs in INFO['actions'][name].options.items():
+            parser.add_argument(*option, **kwargs)
 
     def _load_config(self, args):
+        explicit = bool(args.rc_file)
+        if explicit:
+            rc_files = [Path(args.rc_file)]
+        else:
+            project_path = project_config_dir() / 'config.toml'
+            args.rc_file = str(project_path)
+            rc_files = []
+            config_dir = user_config_dir()
+            if config_dir:
+                rc_files.append(config_dir / 'config.toml')
+            rc_files.append(project_path)
+        default_path = self._resource_path('taskq', self.default_config)
+        roots = [default_path, *rc_files]
+        if default_path is not None:
+            config = configcache.load(roots)
+            if config is not None:
+                return config
+        sources = []
+        config, complete = self._parse_config(
+            rc_files, sources, required=explicit)
+        if complete and default_path is not None and None not in sources:
+            configcache.save(roots, sources, config)
+        return config
+
+    def _parse_config(self, rc_files, sources, required=False):
+        """Merge the config files, recording each one read in ``sources``.
+
+        Missing ``rc_files`` are skipped unless ``required``.  Returns the
+        config and whether every file could be used.
+        """
         config = {}
+        complete = True
         try:
-            if hasattr(resources, 'files'):
-                text = resources.files('taskq').joinpath(
-                    self.default_config).read_text(encoding='utf-8')
-            else:  # Python 3.8 compatibility.
-                with resources.open_text(
-                    'taskq', self.default_config, encoding='utf-8') as stream:
-                    text = stream.read()
-            config = tomlkit.loads(text)
-            self._hydrate_prompt_assets(config)
-        except (FileNotFoundError, ValueError, tomlkit.exceptions.ParseError) as e:
+            text = self._read_resource('taskq', self.default_config, sources)
+            config = configcache.loads_toml(text)
+            self._hydrate_prompt_assets(config, sources)
+        except (FileNotFoundError, ValueError) as e:
             print(f'Error parsing default config: {e}')
-        if args.rc_file:
-            with open(args.rc_file, 'r', encoding='utf-8') as f:
-                try:
-                    return dict_merge(config, tomlkit.load(f))
-                except tomlkit.exceptions.ParseError as e:
-                    print(f'Error parsing {args.rc_file}: {e}')
-                    return config
-        project_path = project_config_dir() / 'config.toml'
-        args.rc_file = str(project_path)
-        rc_files = []
-        config_dir = user_config_dir()
-        if config_dir:
-            rc_files.append(config_dir / 'config.toml')
-        rc_files.append(project_path)
+            complete = False
         for path in rc_files:
+            sources.append((path, configcache.stamp(path)))
             try:
                 with open(path, 'r', encoding='utf-8') as f:
-                    try:
-                        rc = tomlkit.load(f)
-                    except tomlkit.exceptions.ParseError as e:
-                        print(f'Error parsing {path}: {e}')
-                        continue
-                config = dict_merge(config, rc)
+                    text = f.read()
             except FileNotFoundError:
-                pass
-        return config
+                if required:
+                    raise
+                continue
+            try:
+                rc = configcache.loads_toml(text)
+            except ValueError as e:
+                print(f'Error parsing {path}: {e}')
+                complete = False
+                continue
+            config = dict_merge(config, rc)
+        return config, complete
+
+    @staticmethod
+    def _resource_path(package, name):
+        if not hasattr(resources, 'files'):
+            return None
+        try:
+            path = resources.files(package).joinpath(name)
+        except ModuleNotFoundError:
+            return None
+        return path if isinstance(path, Path) else None
+
+    def _read_resource(self, package, name, sources=None):
+        if sources is not None:
+            # Resources that are not plain files, e.g. inside a zip, cannot
+            # be checked for changes, which keeps the result out of the cache.
+            path = self._resource_path(package, name)
+            sources.append(
+                None if path is None else (path, configcache.stamp(path)))
+        if hasattr(resources, 'files'):
+            return resources.files(package).joinpath(name).read_text(
+                encoding='utf-8')
+        with resources.open_text(  # Python 3.8 compatibility.
+                package, name, encoding='utf-8') as stream:
+            return stream.read()
 
-    def _hydrate_prompt_assets(self, mapping):
+    def _hydrate_prompt_assets(self, mapping, sources=None):
         for key, value in list(mapping.items()):
             if isinstance(value, dict):
-                self._hydrate_prompt_assets(value)
+                self._hydrate_prompt_assets(value, sources)
                 continue
             if not key.endswith('prompt'):
                 continue
@@ -106,14 +172,8 @@ class CLI:
             if '/' in value or '\\' in value:
                 raise ValueError('invalid built-in prompt asset: {!r}'.format(value))
             try:
-                if hasattr(resources, 'files'):
-                    text = resources.files(self.prompt_asset_package).joinpath(
-                        value).read_text(encoding='utf-8')
-                else:  # Python 3.8 compatibility.
-                    with resources.open_text(
-                        self.prompt_asset_package, value,
-                        encoding='utf-8') as stream:
-                        text = stream.read()
+                text = self._read_resource(
+                    self.prompt_asset_package, value, sources)
             except FileNotFoundError as error:
                 raise ValueError(
                     'built-in prompt asset not found: {}'.format(value)) from error
@@ -142,6 +202,9 @@ class CLI:
                 print(__version__)
                 sys.exit(0)
             args = [INFO['default']] + args
+        action = self._selected_action(args)
+        if action is not None:
+            self._add_action_options(action)
         args = self.parser.parse_args(args)
         config = self._load_config(args)
         config = self._resolve_config(args, config)
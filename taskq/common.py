@@ -1,22 +1,56 @@
 import os
 import sys
+import importlib
+from collections.abc import MutableMapping
 from dataclasses import dataclass
 from pathlib import Path
 
-from tqdm import tqdm as tqdm_
-
 from . import TOOL_NAME
 
 
 def tqdm(*args, disable=None, **kwargs):
+    # tqdm is slow to import and most commands never show a progress bar.
+    from tqdm import tqdm as tqdm_
     return tqdm_(*args, **kwargs, delay=1, disable=disable)
 
 
+class LazyRegistry(MutableMapping):
+    """Registry whose entries are registered by importing their modules.
+
+    ``modules`` maps each known name to the module that registers it, so
+    listing the names imports nothing and looking one up imports only its
+    own module.
+    """
+
+    def __init__(self, modules):
+        super().__init__()
+        self.modules = dict(modules)
+        self.entries = {}
+
+    def __getitem__(self, name):
+        if name not in self.entries and name in self.modules:
+            importlib.import_module(self.modules[name])
+        return self.entries[name]
+
+    def __setitem__(self, name, value):
+        self.entries[name] = value
+
+    def __delitem__(self, name):
+        self.modules.pop(name, None)
+        del self.entries[name]
+
+    def __iter__(self):
+        return iter(dict.fromkeys([*self.modules, *self.entries]))
+
+    def __len__(self):
+        return len(set(self.modules) | set(self.entries))
+
+
 STATUSES = [
-    'running', 'queued', 'merging',
+    'running', 'queued', 'suspended', 'merging',
     'success', 'failed', 'killed', 'interrupted',
 ]
-ACTIVE_STATUSES = frozenset({'queued', 'running', 'merging'})
+ACTIVE_STATUSES = frozenset({'queued', 'running', 'suspended', 'merging'})
 
 
 def xdg_config_home(environ=None):
@@ -56,6 +90,7 @@ class FilterArgs:
     force_all: bool = False
     running: bool = False
     queued: bool = False
+    suspended: bool = False
     merging: bool = False
     success: bool = False
     failed: bool = False
@@ -86,11 +121,48 @@ def tail_lines(text, tail):
     return '\n'.join(text.split('\n')[-tail:])
 
 
+TAIL_BLOCK_SIZE = 1 << 16
+
+
+def _line_breaks(data):
+    # Universal newlines: '\r\n', '\r' and '\n' each end one line.
+    return data.count(b'\n') + data.count(b'\r') - data.count(b'\r\n')
+
+
+def read_tail_lines(f, tail, block_size=TAIL_BLOCK_SIZE):
+    """Return the last ``tail`` lines of the binary file ``f``.
+
+    Same result as ``tail_lines`` on the file opened in text mode, but blocks
+    are read backwards from the end, so only about as many bytes as the
+    returned lines are read regardless of the file size.
+    """
+    if tail <= 0:
+        f.seek(0)
+        data = f.read()
+    else:
+        position = f.seek(0, os.SEEK_END)
+        data = b''
+        while position > 0 and _line_breaks(data) < tail:
+            size = min(block_size, position)
+            position -= size
+            f.seek(position)
+            data = f.read(size) + data
+    data = data.replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+    if tail > 0:
+        start = len(data)
+        for _ in range(tail):
+            start = data.rfind(b'\n', 0, start)
+            if start < 0:
+                break
+        data = data[start + 1:]
+    return data.decode('utf-8', errors='replace')
+
+
 def file_tail_lines(file, tail):
     if isinstance(file, str):
         try:
-            with open(file, 'r', encoding='utf-8') as f:
-                return tail_lines(f.read(), tail)
+            with open(file, 'rb') as f:
+                return read_tail_lines(f, tail)
         except FileNotFoundError:
             return file
     return tail_lines(file.read(), tail)
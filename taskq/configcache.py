@@ -0,0 +1,122 @@
+"""Cache of the resolved configuration.
+
+Every command used to parse ``default.toml`` with tomlkit, read each built-in
+prompt it refers to and merge the user and project config files on top.  The
+merged result is now kept as JSON under the user cache directory, together
+with the modification time, size and inode of every file it was built from,
+and reused while none of them changed, so resolving the configuration takes
+a few ``stat`` calls and one small file read.  Config files are parsed with
+:mod:`tomllib` where available; tomlkit is still what ``tq config`` uses to
+rewrite them with their formatting intact.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11.
+    tomllib = None
+
+from .common import user_cache_dir
+
+
+CACHE_VERSION = 1
+# A file written this recently may change again without its modification
+# time moving, so configs built from it are not cached yet.
+RACY_SECONDS = 2
+
+
+def loads_toml(text):
+    """Parse TOML into plain values; errors are ``ValueError`` subclasses."""
+    if tomllib is not None:
+        return tomllib.loads(text)
+    import tomlkit
+    return tomlkit.loads(text).unwrap()
+
+
+def stamp(path):
+    """Return what identifies the current contents of ``path``, if any."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_mtime_ns, st.st_size, st.st_ino]
+
+
+def cache_path(roots, cache_root=None):
+    cache_root = cache_root or user_cache_dir()
+    if cache_root is None:
+        return None
+    key = hashlib.sha1(
+        '\0'.join(str(path) for path in roots).encode('utf-8')).hexdigest()
+    return cache_root / 'config' / f'{key[:16]}.json'
+
+
+def load(roots):
+    """Return the config cached for the files ``roots``, if still current."""
+    path = cache_path(roots)
+    if path is None:
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(data, dict) or data.get('version') != CACHE_VERSION:
+        return None
+    if data.get('roots') != [str(root) for root in roots]:
+        return None
+    sources = data.get('sources')
+    if not isinstance(sources, list):
+        return None
+    for source in sources:
+        if not isinstance(source, list) or len(source) != 2:
+            return None
+        if stamp(source[0]) != source[1]:
+            return None
+    return data.get('config')
+
+
+def save(roots, sources, config):
+    """Cache ``config`` built from ``sources``, ``(path, stamp)`` pairs.
+
+    Each stamp must be taken before its file is read, so that a file
+    rewritten meanwhile no longer matches.  Configs holding values JSON
+    cannot represent, such as TOML datetimes, are not cached.
+    """
+    path = cache_path(roots)
+    if path is None:
+        return False
+    racy = time.time_ns() - RACY_SECONDS * 10 ** 9
+    if any(s is not None and s[0] >= racy for _, s in sources):
+        return False
+    try:
+        text = json.dumps({
+            'version': CACHE_VERSION,
+            'roots': [str(root) for root in roots],
+            'sources': [[str(p), s] for p, s in sources],
+            'config': config,
+        })
+    except (TypeError, ValueError):
+        return False
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(
+            dir=path.parent, prefix=f'.{path.name}.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(text)
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+    except OSError:
+        return False
+    return True
@@ -10,7 +10,7 @@ import time
 from pathlib import Path
 
 from ..backends import git_ref as git_ref_utils
-from ..backends.base import BackendError
+from ..backends.base import BackendError, add_jobs, output_line
 from ..backends.tmux.backend import TmuxBackend
 from ..integration import fast_forward_checked_out, target_integration_lock
 from .agent import (
@@ -66,11 +66,10 @@ def _plain(value):
     return json.loads(json.dumps(value))
 
 
-def _tail_marker(output, marker):
-    for line in reversed(output.splitlines()):
-        if line.startswith(marker):
-            return json.loads(line[len(marker):])
-    raise ValueError('missing {}'.format(marker.rstrip(':')))
+def _marker_value(line, marker):
+    if line is None or not line.startswith(marker):
+        raise ValueError('missing {}'.format(marker.rstrip(':')))
+    return json.loads(line[len(marker):])
 
 
 class ExploreController:
@@ -236,9 +235,14 @@ class ExploreController:
             return
         self._current_event_id = event['id']
         try:
-            output = self.backend.output(
-                {'id': int(job['backend_job_id'])}, 0) or ''
+            info = {'id': int(job['backend_job_id'])}
             role = job['role']
+            if role == 'validation':
+                # Validation only reports its marker line; let the backend
+                # find it instead of reading the whole log.
+                output = output_line(self.backend, info, VALIDATION_MARKER)
+            else:
+                output = self.backend.output(info, 0) or ''
             if role == 'planner':
                 self._finish_planner(job, output)
             elif role == 'optimizer':
@@ -309,6 +313,7 @@ class ExploreController:
         blocked = (
             campaign['status'] != 'active' or
             not self.state.merge_queue_empty(self.campaign_id))
+        attempts = []
         for offset, value in enumerate(directions, 1):
             direction_id = '{}-d{:03d}'.format(self.campaign_id, existing + offset)
             fingerprint = fingerprint_direction(value)
@@ -323,36 +328,45 @@ class ExploreController:
                 self._stall_campaign('planner repeated a tried direction')
                 continue
             if not blocked:
-                self._start_attempt(direction_id, work_root / direction_id)
+                attempts.append((direction_id, work_root / direction_id))
+        self._start_attempts(attempts)
 
-    def _start_attempt(self, direction_id, worktree):
-        if self._free_slots() < 1:
-            return
+    def _start_attempts(self, attempts):
+        """Open attempts for ``(direction_id, worktree)`` pairs.
+
+        Their optimizer jobs are submitted to the backend as one batch.
+        """
         campaign = self.campaign
-        attempt_id = '{}-a'.format(direction_id)
-        branch = 'tq/explore/{}/attempt/{}'.format(
-            self.campaign_id, direction_id.rsplit('-', 1)[-1])
-        meta = git_ref_utils.create_branch_worktree(
-            self.config['repo_root'], branch, worktree,
-            campaign['mainline_head'],
-        )
-        self.state.add_attempt(
-            self.campaign_id, attempt_id, direction_id, branch,
-            meta['git_worktree'], campaign['mainline_head'],
-            metadata={'workspace': meta},
-        )
-        direction = self.state.get_direction(direction_id)
-        optimization = self._phase('optimization')
-        prompt = build_optimizer_prompt(
-            campaign['objective'], direction['metadata'],
-            template=optimization['prompt'],
-            memory=self._memory(), artifacts={},
-            max_files=optimization['max_files'],
-            max_lines=optimization['max_lines'],
-        )
-        self._queue_agent(
-            'optimizer', prompt, worktree, attempt_id, direction_id)
-        self.state.update_direction(direction_id, status='running')
+        jobs = []
+        for direction_id, worktree in attempts[:self._free_slots()]:
+            attempt_id = '{}-a'.format(direction_id)
+            branch = 'tq/explore/{}/attempt/{}'.format(
+                self.campaign_id, direction_id.rsplit('-', 1)[-1])
+            meta = git_ref_utils.create_branch_worktree(
+                self.config['repo_root'], branch, worktree,
+                campaign['mainline_head'],
+            )
+            self.state.add_attempt(
+                self.campaign_id, attempt_id, direction_id, branch,
+                meta['git_worktree'], campaign['mainline_head'],
+                metadata={'workspace': meta},
+            )
+            direction = self.state.get_direction(direction_id)
+            optimization = self._phase('optimization')
+            prompt = build_optimizer_prompt(
+                campaign['objective'], direction['metadata'],
+                template=optimization['prompt'],
+                memory=self._memory(), artifacts={},
+                max_files=optimization['max_files'],
+                max_lines=optimization['max_lines'],
+            )
+            jobs.append(self._agent_job(
+                'optimizer', prompt, worktree, attempt_id, direction_id))
+        if not jobs:
+            return
+        self._queue_jobs(jobs)
+        for job in jobs:
+            self.state.update_direction(job['direction_id'], status='running')
 
     def _finish_mutation(self, job, output):
         event = (
@@ -448,11 +462,11 @@ class ExploreController:
             artifacts = dict(artifacts, validated_head=None)
             self._queue_fix(attempt, artifacts)
 
-    def _finish_validation(self, job, output):
+    def _finish_validation(self, job, marker_line):
         attempt = self.state.get_attempt(job['attempt_id']) if job['attempt_id'] else None
         metadata = job['metadata']
         try:
-            result = _tail_marker(output, VALIDATION_MARKER)
+            result = _marker_value(marker_line, VALIDATION_MARKER)
         except (ValueError, json.JSONDecodeError) as error:
             result = {'checks_passed': False, 'score_error': str(error)}
         if job['status'] != 'success':
@@ -1244,9 +1258,13 @@ class ExploreController:
         if free <= 0:
             return
         planned = self.state.list_directions(self.campaign_id, status='planned')
-        for direction in planned[:free]:
-            path = Path(self.config['work_root']) / 'attempts' / direction['id']
-            self._start_attempt(direction['id'], path)
+        self._start_attempts([
+            (
+                direction['id'],
+                Path(self.config['work_root']) / 'attempts' / direction['id'],
+            )
+            for direction in planned[:free]
+        ])
         active = sum(
             item['status'] not in {
                 'merged', 'abandoned', 'rejected', 'stopped', 'deferred'}
@@ -1358,9 +1376,9 @@ class ExploreController:
             status='completed', finished_at=self._now(), config=config)
         self._cleanup_mainline()
 
-    def _queue_agent(
+    def _agent_job(
         self, role, prompt, cwd, attempt_id=None, direction_id=None,
-        control=False, metadata=None,
+        metadata=None,
     ):
         data = dict(metadata or {})
         phase = self._job_phase({'role': role, 'metadata': data})
@@ -1373,24 +1391,34 @@ class ExploreController:
         ):
             data.setdefault(
                 'starting_head', self.state.get_attempt(attempt_id)['head'])
+        return {
+            'role': role, 'argv': argv, 'cwd': cwd, 'attempt_id': attempt_id,
+            'direction_id': direction_id, 'metadata': data,
+        }
+
+    def _queue_agent(
+        self, role, prompt, cwd, attempt_id=None, direction_id=None,
+        control=False, metadata=None,
+    ):
+        job = self._agent_job(
+            role, prompt, cwd, attempt_id, direction_id, metadata)
         if control:
             control_path = Path(self.config['control_cwd']) / '{}-{}'.format(
                 role, time.time_ns())
             git_ref_utils.create_worktree(
                 self.config['repo_root'], self.campaign['mainline_head'],
                 control_path)
-            cwd = control_path
-            data['control_worktree'] = str(control_path)
-            data['control_head'] = self.campaign['mainline_head']
+            job['cwd'] = control_path
+            job['metadata']['control_worktree'] = str(control_path)
+            job['metadata']['control_head'] = self.campaign['mainline_head']
         try:
             return self._queue_job(
-                role, argv, cwd, attempt_id, direction_id,
-                slots=0 if control else 1, internal=control, metadata=data)
+                **job, slots=0 if control else 1, internal=control)
         except Exception:
             if control:
                 git_ref_utils.remove_worktree({
                     'git_root': self.config['repo_root'],
-                    'git_worktree': str(cwd),
+                    'git_worktree': str(job['cwd']),
                 }, force=True)
             raise
 
@@ -1398,32 +1426,54 @@ class ExploreController:
         self, role, argv, cwd, attempt_id=None, direction_id=None,
         gpus=0, slots=1, internal=False, metadata=None,
     ):
-        metadata = dict(metadata or {})
-        if self._current_event_id is not None:
-            metadata['source_event_id'] = self._current_event_id
+        return self._queue_jobs([{
+            'role': role, 'argv': argv, 'cwd': cwd, 'attempt_id': attempt_id,
+            'direction_id': direction_id, 'gpus': gpus, 'slots': slots,
+            'internal': internal, 'metadata': metadata,
+        }])[0]
+
+    def _queue_jobs(self, jobs):
+        """Submit ``jobs`` to the backend in one batch and record them."""
         job_environment = dict(getattr(self.backend, 'env', {}) or {})
         job_environment.update(os.environ)
         job_environment.update(self.config.get('env') or {})
-        backend_id = self.backend.add(
-            shlex.join([str(value) for value in argv]),
-            gpus=int(gpus), slots=slots,
-            env=job_environment,
-            cwd=str(cwd), internal=internal, workspace_owner='campaign',
-            metadata={
-                'campaign_id': self.campaign_id, 'attempt_id': attempt_id,
-                'direction_id': direction_id, 'role': role,
-                'workflow_metadata': metadata,
-            },
-        )
-        job_id = '{}:{}'.format(self.campaign_id, backend_id)
-        try:
-            self.state.add_job(
-                self.campaign_id, job_id, role, backend_id,
-                attempt_id, direction_id, metadata=metadata)
-        except Exception:
-            self.backend.remove({'id': int(backend_id)})
-            raise
-        return job_id
+        requests = []
+        for job in jobs:
+            metadata = dict(job.get('metadata') or {})
+            if self._current_event_id is not None:
+                metadata['source_event_id'] = self._current_event_id
+            job['metadata'] = metadata
+            requests.append({
+                'command': shlex.join([str(value) for value in job['argv']]),
+                'gpus': int(job.get('gpus', 0)),
+                'slots': job.get('slots', 1),
+                'env': job_environment,
+                'cwd': str(job['cwd']),
+                'internal': job.get('internal', False),
+                'workspace_owner': 'campaign',
+                'metadata': {
+                    'campaign_id': self.campaign_id,
+                    'attempt_id': job.get('attempt_id'),
+                    'direction_id': job.get('direction_id'),
+                    'role': job['role'],
+                    'workflow_metadata': metadata,
+                },
+            })
+        backend_ids = add_jobs(self.backend, requests)
+        job_ids = []
+        for index, (job, backend_id) in enumerate(zip(jobs, backend_ids)):
+            job_id = '{}:{}'.format(self.campaign_id, backend_id)
+            try:
+                self.state.add_job(
+                    self.campaign_id, job_id, job['role'], backend_id,
+                    job.get('attempt_id'), job.get('direction_id'),
+                    metadata=job['metadata'])
+            except Exception:
+                for unrecorded in backend_ids[index:]:
+                    self.backend.remove({'id': int(unrecorded)})
+                raise
+            job_ids.append(job_id)
+        return job_ids
 
     def _active_job(self, role):
         return any(job['status'] not in TERMINAL for job in
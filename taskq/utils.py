@@ -1,3 +1,6 @@
+import re
+
+
 COMMAND_DISPLAY_ESCAPES = {
     '\\': '\\\\',
     '\b': '\\b',
@@ -53,3 +56,39 @@ def timedelta_format(delta, fmt, num_components):
                 continue
         text.append(f'{count}{k}')
     return ''.join(text) or '0s'
+
+
+DURATION_UNITS = {'': 1, 's': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+
+
+def parse_duration(value):
+    """Parse seconds, or a number followed by one of ``s m h d w``."""
+    if isinstance(value, (int, float)):
+        seconds = float(value)
+    else:
+        match = re.fullmatch(
+            r'\s*(\d+(?:\.\d+)?)\s*([smhdw]?)\s*', str(value).lower())
+        if not match:
+            raise ValueError(f'Invalid duration: {value!r}')
+        seconds = float(match.group(1)) * DURATION_UNITS[match.group(2)]
+    if seconds < 0:
+        raise ValueError(f'Invalid duration: {value!r}')
+    return seconds
+
+
+SIZE_UNITS = {'': 1, 'k': 1 << 10, 'm': 1 << 20, 'g': 1 << 30, 't': 1 << 40}
+
+
+def parse_size(value):
+    """Parse bytes, or a number followed by one of ``K M G T`` (binary)."""
+    if isinstance(value, int) and not isinstance(value, bool):
+        size = value
+    else:
+        match = re.fullmatch(
+            r'\s*(\d+(?:\.\d+)?)\s*([kmgt]?)(?:i?b)?\s*', str(value).lower())
+        if not match:
+            raise ValueError(f'Invalid size: {value!r}')
+        size = int(float(match.group(1)) * SIZE_UNITS[match.group(2)])
+    if size < 0:
+        raise ValueError(f'Invalid size: {value!r}')
+    return size
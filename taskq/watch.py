@@ -0,0 +1,124 @@
+"""Block until files in some directories change, using Linux inotify.
+
+``tq wait`` and ``tq outputs --follow`` used to poll job state every second
+or less.  A :class:`Watcher` lets them sleep until a file in one of the job
+directories is written or replaced instead.  inotify is reached through
+``ctypes`` so no extra dependency is needed; where it is missing, or a
+directory cannot be watched (for instance once ``max_user_watches`` is
+exhausted), the watcher is inactive and callers keep polling.
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import time
+
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_IGNORED = 0x00008000
+# Files that are written and closed, or replaced atomically, or go away.
+CHANGES = (
+    IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+    | IN_MOVE_SELF | IN_ATTRIB)
+EVENT = struct.Struct('iIII')
+# Safety net for changes that never touch a watched directory, such as a
+# tmux session dying while no broker runs; the interval callers polled at.
+WATCH_TIMEOUT = 1
+
+
+def _libc():
+    if not hasattr(os, 'O_CLOEXEC'):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        libc.inotify_init1
+        libc.inotify_add_watch
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+class Watcher:
+    """Changes to files directly inside the directories ``paths``.
+
+    With ``modify=True`` every write to an open file is reported too, which
+    is what following a growing log needs.  Use it as a context manager.
+    """
+
+    def __init__(self, paths, modify=False):
+        self.fd = None
+        self.watches = {}
+        paths = list(dict.fromkeys(str(path) for path in paths))
+        libc = _libc() if paths else None
+        if libc is None:
+            return
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            return
+        mask = CHANGES | (IN_MODIFY if modify else 0)
+        for path in paths:
+            wd = libc.inotify_add_watch(fd, os.fsencode(path), mask)
+            if wd < 0:
+                os.close(fd)
+                self.watches = {}
+                return
+            self.watches[wd] = path
+        self.fd = fd
+
+    @property
+    def active(self):
+        return self.fd is not None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    def _read(self):
+        changed = set()
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except OSError as e:
+                if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    return changed
+                raise
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = EVENT.unpack_from(data, offset)
+                offset += EVENT.size
+                name = data[offset:offset + length].rstrip(b'\0')
+                offset += length
+                if mask & IN_IGNORED:
+                    continue
+                path = self.watches.get(wd, '')
+                changed.add(
+                    os.path.join(path, os.fsdecode(name)) if name else path)
+
+    def wait(self, timeout=WATCH_TIMEOUT):
+        """Return the paths changed before ``timeout`` seconds passed.
+
+        A changed directory itself is reported by its own path.  An inactive
+        watcher just sleeps and returns ``None``: anything may have changed.
+        """
+        if self.fd is None:
+            time.sleep(timeout)
+            return None
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        return self._read() if ready else set()
@@ -165,6 +165,23 @@ def reset_fake_backend():
     FakeBackend.reset()
 
 
+@pytest.fixture(autouse=True)
+def isolated_gpu_inventory(monkeypatch, tmp_path):
+    from taskq.backends import gpus
+
+    real_path = gpus.inventory_path
+    monkeypatch.setattr(
+        gpus, 'inventory_path',
+        lambda cache_root=None, fake=False: real_path(
+            tmp_path / 'gpu-cache', fake))
+
+
+@pytest.fixture(autouse=True)
+def isolated_ts_info_cache(monkeypatch, tmp_path):
+    monkeypatch.setattr(
+        'taskq.backends.ts.user_cache_dir', lambda: tmp_path / 'ts-cache')
+
+
 @pytest.fixture
 def fake_backend(monkeypatch):
     from taskq.backends import base
@@ -226,3 +243,9 @@ def write_meta(root, job_id, **overrides):
     meta.update(overrides)
     (job_dir / 'meta.json').write_text(json.dumps(meta), encoding='utf-8')
     return job_dir / 'meta.json'
+
+
+@pytest.fixture(autouse=True)
+def isolated_config_cache(monkeypatch, tmp_path):
+    monkeypatch.setattr(
+        'taskq.configcache.user_cache_dir', lambda: tmp_path / 'config-cache')
@@ -2,7 +2,10 @@ import argparse
 import io
 import json
 import os
+import subprocess
 import sys
+import threading
+import time
 
 import pytest
 
@@ -11,6 +14,7 @@ from taskq.actions.add import AddAction
 from taskq.actions.filter import FilterActionBase
 from taskq.backends.base import BackendError
 from taskq.cli import CLI
+from taskq.watch import Watcher
 
 
 def run_cli(args, rc_file, capsys):
@@ -171,6 +175,58 @@ def test_add_ref_rejected_by_unsupported_backend(fake_backend, rc_file, capsys):
     ]
 
 
+def test_add_time_passes_expected_runtime(
+    fake_backend, rc_file, monkeypatch, capsys
+):
+    code = CLI().main(['-rc', str(rc_file), 'add', '-T', '1h', 'echo', 'hi'])
+    assert code == 2
+    assert "backend 'fake' does not support --time" in capsys.readouterr().err
+
+    monkeypatch.setattr(fake_backend, 'supports_runtime_estimate', True)
+    run_cli(['add', '--time', '90', 'echo', 'hi'], rc_file, capsys)
+    assert fake_backend.instances[-1].calls[-1] == (
+        'add', 'echo hi', None, None, {'runtime': 90.0})
+
+    _, out = run_cli(['add', '-d', '-T', '30m', 'echo', 'hi'], rc_file, capsys)
+    assert out.strip() == f'{TOOL_NAME} add -N 1 -T 1800 echo hi'
+
+    code = CLI().main(['-rc', str(rc_file), 'add', '-T', 'soon', 'echo', 'hi'])
+    assert code == 2
+    assert "Invalid duration: 'soon'" in capsys.readouterr().err
+
+
+def test_add_priority_passes_and_replays(
+    fake_backend, rc_file, monkeypatch, capsys
+):
+    code = CLI().main(['-rc', str(rc_file), 'add', '-P', '3', 'echo', 'hi'])
+    assert code == 2
+    assert "does not support --priority" in capsys.readouterr().err
+
+    monkeypatch.setattr(fake_backend, 'supports_priority', True)
+    run_cli(['add', '--priority', '3', 'echo', 'hi'], rc_file, capsys)
+    assert fake_backend.instances[-1].calls[-1] == (
+        'add', 'echo hi', None, None, {'priority': 3})
+    _, out = run_cli(['add', '-d', '-P', '-1', 'echo', 'hi'], rc_file, capsys)
+    assert out.strip() == f'{TOOL_NAME} add -N 1 -P -1 echo hi'
+
+
+def test_add_preemptible_passes_and_replays(
+    fake_backend, rc_file, monkeypatch, capsys
+):
+    code = CLI().main(
+        ['-rc', str(rc_file), 'add', '--preemptible', 'echo', 'hi'])
+    assert code == 2
+    assert "does not support --preemptible" in capsys.readouterr().err
+
+    monkeypatch.setattr(fake_backend, 'supports_preemption', True)
+    run_cli(['add', '--preemptible', 'echo', 'hi'], rc_file, capsys)
+    assert fake_backend.instances[-1].calls[-1] == (
+        'add', 'echo hi', None, None, {'preemptible': True})
+    _, out = run_cli(
+        ['add', '-d', '--preemptible', 'echo', 'hi'], rc_file, capsys)
+    assert out.strip() == f'{TOOL_NAME} add -N 1 --preemptible echo hi'
+
+
 def test_add_short_ref_and_merge_aliases(
     fake_backend, rc_file, monkeypatch, capsys
 ):
@@ -408,7 +464,7 @@ def test_add_ignores_empty_non_tty_stdin(monkeypatch):
 def test_filter_parse_ids_and_statuses():
     action = FilterActionBase('x', {'name': 'x'})
     args = argparse.Namespace(
-        id='1-3,5', all=False, running=True, queued=False,
+        id='1-3,5', all=False, running=True, queued=False, suspended=False,
         merging=False, success=False, failed=False, killed=False,
         interrupted=True,
     )
@@ -610,6 +666,68 @@ def test_output_follow_waits_through_merging(
     assert out == 'command output\n'
 
 
+def test_wait_notices_changes_outside_watched_directories(
+    fake_backend, rc_file, tmp_path, monkeypatch, capsys
+):
+    # A tmux session dying while no broker runs writes no job file.
+    deadline = time.monotonic() + 0.2
+
+    def fake_job_info(self, ids=None, filters=None):
+        if time.monotonic() < deadline:
+            return [{'id': 1, 'status': 'running'}]
+        return []
+
+    monkeypatch.setattr(fake_backend, 'job_info', fake_job_info)
+    monkeypatch.setattr(
+        fake_backend, 'watch_paths', lambda self, info: [tmp_path],
+        raising=False)
+    started = time.monotonic()
+    run_cli(['wait'], rc_file, capsys)
+
+    assert time.monotonic() - started < 3
+
+
+def test_output_follow_sleeps_until_job_files_change(
+    fake_backend, rc_file, tmp_path, monkeypatch, capsys
+):
+    output_file = tmp_path / 'output.log'
+    output_file.write_text('start\n', encoding='utf-8')
+    result_file = tmp_path / 'command-result.json'
+    fake_backend.jobs[0]['output_file'] = str(output_file)
+    calls = []
+
+    def fake_job_info(self, ids=None, filters=None):
+        calls.append(ids)
+        status = 'success' if result_file.exists() else 'running'
+        return [{'id': 1, 'status': status}]
+
+    def finish():
+        pause = threading.Event()
+        pause.wait(0.1)
+        with open(output_file, 'a', encoding='utf-8') as f:
+            for _ in range(20):
+                f.write('more\n')
+                f.flush()
+        pause.wait(0.1)
+        result_file.write_text('{}', encoding='utf-8')
+
+    monkeypatch.setattr(fake_backend, 'job_info', fake_job_info)
+    monkeypatch.setattr(
+        fake_backend, 'watch_paths', lambda self, info: [tmp_path],
+        raising=False)
+    monkeypatch.setattr('taskq.actions.read.time.sleep', pytest.fail)
+    with Watcher([tmp_path]) as watcher:
+        if not watcher.active:
+            pytest.skip('inotify is not available')
+    thread = threading.Thread(target=finish)
+    thread.start()
+    _, out = run_cli(['outputs', '--follow', '1'], rc_file, capsys)
+    thread.join()
+
+    assert out == 'start\n' + 'more\n' * 20
+    assert len(calls) <= 3
+
+
 def test_write_actions_and_danger_guard(fake_backend, rc_file, capsys):
     with pytest.raises(SystemExit):
         run_cli(['kill'], rc_file, capsys)
@@ -809,3 +927,41 @@ def test_backend_and_config_actions(fake_backend, rc_file, capsys):
 
     run_cli(['config', 'new.key', 'null'], rc_file, capsys)
     assert 'value' not in rc_file.read_text(encoding='utf-8')
+
+
+def test_action_specs_match_registered_actions():
+    from taskq.actions import ACTION_SPECS, INFO
+    for name, spec in ACTION_SPECS.items():
+        assert INFO['actions'][name].name == name
+        for alias in spec.aliases:
+            assert INFO['aliases'][alias] == name
+
+
+def test_cli_startup_imports_only_the_selected_action(tmp_path):
+    # Guards `python -X importtime -m taskq.cli ids` against heavy imports.
+    rc = tmp_path / 'tq.toml'
+    rc.write_text('backend = "dummy"\n', encoding='utf-8')
+    env = dict(
+        os.environ,
+        PYTHONPATH=os.pathsep.join(filter(None, [
+            os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            os.environ.get('PYTHONPATH')])),
+        XDG_CACHE_HOME=str(tmp_path / 'cache'),
+        XDG_CONFIG_HOME=str(tmp_path / 'config'))
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-m', 'taskq.cli',
+         '-rc', str(rc), 'ids'],
+        cwd=tmp_path, env=env, capture_output=True, text=True, check=True)
+    imported = {
+        line.rsplit('|', 1)[-1].strip()
+        for line in result.stderr.splitlines()
+        if line.startswith('import time:')}
+    # Modules loaded through importlib are not reported themselves, but
+    # what the ids action imports in turn is.
+    assert 'taskq.actions.filter' in imported
+    for module in (
+        'blessed', 'tabulate', 'tqdm', 'taskq.actions.add',
+        'taskq.actions.explore', 'taskq.explore', 'taskq.backends.tmux',
+        'taskq.backends.ts',
+    ):
+        assert module not in imported
@@ -1,7 +1,10 @@
+import json
+import os
+import time
 from pathlib import Path
 
 import tomlkit
-from taskq import TOOL_NAME
+from taskq import TOOL_NAME, configcache
 from taskq.cli import CLI
 
 
@@ -216,3 +219,48 @@ gpus = 2
     assert resolved['command'] == 'tmux'
     assert resolved['slots'] == 4
     assert resolved['alloc']['gpus'] == 2
+
+
+def backdate(path, seconds=60):
+    mtime = time.time() - seconds
+    os.utime(path, (mtime, mtime))
+
+
+def test_load_config_reuses_cache_until_a_source_changes(
+    tmp_path, monkeypatch
+):
+    rc = tmp_path / 'tq.toml'
+    rc.write_text('queue = "first"\n', encoding='utf-8')
+    backdate(rc)
+    args = type('Args', (), {'rc_file': str(rc)})()
+    config = CLI()._load_config(args)
+    cached, = (tmp_path / 'config-cache' / 'config').glob('*.json')
+    sources = [Path(p).name for p, _ in json.loads(cached.read_text())['sources']]
+    assert sources[0] == 'default.toml'
+    assert {'merge-conflict.md', 'planning.md', 'tq.toml'} <= set(sources)
+
+    def fail(text):
+        raise AssertionError('config parsed again')
+
+    monkeypatch.setattr(configcache, 'loads_toml', fail)
+    assert CLI()._load_config(args) == config
+    assert config['queue'] == 'first'
+    assert config['merge']['conflict_prompt'].startswith(
+        'Resolve the in-progress Git integration')
+
+    monkeypatch.undo()
+    rc.write_text('queue = "second"\n', encoding='utf-8')
+    assert CLI()._load_config(args)['queue'] == 'second'
+
+
+def test_load_config_does_not_cache_fresh_or_broken_files(tmp_path):
+    rc = tmp_path / 'tq.toml'
+    rc.write_text('queue = "fresh"\n', encoding='utf-8')
+    args = type('Args', (), {'rc_file': str(rc)})()
+    assert CLI()._load_config(args)['queue'] == 'fresh'
+    assert not (tmp_path / 'config-cache').exists()
+
+    rc.write_text('queue = \n', encoding='utf-8')
+    backdate(rc)
+    assert CLI()._load_config(args)['queue'] == 'default'
+    assert not (tmp_path / 'config-cache').exists()
@@ -876,6 +876,33 @@ def test_planner_finishing_behind_merge_barrier_does_not_start_attempt(campaign)
     assert campaign.state.list_jobs(campaign_id='c1', role='optimizer') == []
 
 
+def test_planner_directions_start_optimizers_in_one_backend_batch(campaign):
+    batches = []
+
+    def add_many(requests, desc=None):
+        batches.append([request['metadata']['role'] for request in requests])
+        return [campaign.backend.add(**request) for request in requests]
+
+    campaign.backend.add_many = add_many
+    planner_id = campaign.controller._queue_agent(
+        'planner', 'plan', campaign.mainline, control=True,
+        metadata={'direction_count': 2})
+    planner = campaign.state.get_job(planner_id)
+    campaign.backend.finish(
+        planner['backend_job_id'],
+        'TASKQ_JSON: {"directions":[{"hypothesis":"batch reads"},'
+        '{"hypothesis":"cache writes"}]}')
+    batches.clear()
+
+    campaign.controller.reconcile()
+
+    assert batches == [['optimizer', 'optimizer']]
+    optimizers = campaign.state.list_jobs(campaign_id='c1', role='optimizer')
+    assert len(optimizers) == 2
+    assert {job['direction_id'] for job in optimizers} == {
+        direction['id'] for direction in campaign.state.list_directions('c1')}
+
+
 def test_merge_snapshots_tracked_and_untracked_changes_before_fast_forward(campaign):
     attempt = campaign.commit_change(campaign.attempt('snapshot'), 'accepted\n')
     accepted = attempt['head']
@@ -0,0 +1,71 @@
+import pytest
+
+from taskq.backends import gpus
+from taskq.backends.base import BackendBase, BackendError
+from taskq.backends.gpus import GPUInventory, gpu_inventory
+
+
+def test_gpu_inventory_shares_one_probe_until_it_expires(monkeypatch, tmp_path):
+    path = tmp_path / 'gpus.json'
+    probes = []
+
+    def provider():
+        probes.append(True)
+        return [[0, 1000.0, 1000.0]]
+
+    clock = [1000.0]
+    monkeypatch.setattr(gpus.time, 'time', lambda: clock[0])
+
+    assert GPUInventory(path, ttl=60, provider=provider).count() == 1
+    assert GPUInventory(path, ttl=60, provider=provider).count() == 1
+    assert len(probes) == 1
+
+    clock[0] += 61
+    assert GPUInventory(path, ttl=60, provider=provider).gpus() == [
+        [0, 1000.0, 1000.0]]
+    assert len(probes) == 2
+
+
+def test_gpu_inventory_caches_missing_gpus(tmp_path):
+    probes = []
+    inventory = GPUInventory(
+        tmp_path / 'gpus.json', provider=lambda: probes.append(True))
+
+    assert inventory.gpus() is None
+    assert inventory.gpus() is None
+    assert probes == [True]
+
+
+def test_fake_gpus_stand_in_for_nvidia_smi(monkeypatch):
+    monkeypatch.setenv(gpus.FAKE_GPUS_ENV, '3')
+
+    def probe():
+        raise AssertionError('nvidia-smi must not run')
+
+    monkeypatch.setattr(gpus, 'probe_nvidia_smi', probe)
+    inventory = gpu_inventory()
+
+    assert inventory.path.name.endswith('.fake.json')
+    assert [gpu[0] for gpu in inventory.gpus()] == [0, 1, 2]
+    assert BackendBase._resolve_slots('auto') == 3
+
+
+def test_invalid_fake_gpus_name_the_variable(monkeypatch):
+    monkeypatch.setenv(gpus.FAKE_GPUS_ENV, 'two')
+
+    with pytest.raises(BackendError, match=gpus.FAKE_GPUS_ENV):
+        gpu_inventory()
+
+
+def test_auto_slots_read_published_inventory(monkeypatch):
+    GPUInventory(
+        gpus.inventory_path(),
+        provider=lambda: [[0, 1.0, 1.0], [1, 1.0, 1.0]],
+    ).refresh()
+
+    def probe():
+        raise AssertionError('unexpected GPU probe')
+
+    monkeypatch.setattr(gpus, 'probe_nvidia_smi', probe)
+
+    assert BackendBase._resolve_slots('auto') == 2
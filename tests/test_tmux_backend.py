@@ -1,4 +1,6 @@
 import json
+import shlex
+import signal
 import subprocess
 from pathlib import Path
 
@@ -8,18 +10,17 @@ from taskq import TOOL_NAME
 from taskq.actions.write import RerunAction
 from taskq.backends import BACKENDS
 from taskq.backends import git_ref as git_ref_utils
-from taskq.backends.base import BackendError
+from taskq.backends.base import BackendError, BatchRef
 from taskq.backends.tmux.backend import TmuxBackend
+from taskq.backends.tmux.lineindex import update_index
+from taskq.backends.tmux.outputs import archive_output, rotate_output
 from taskq.common import FilterArgs
 
 
 @pytest.fixture
 def tmux_backend(monkeypatch, tmp_path):
     monkeypatch.setattr('taskq.backends.base.which', lambda command: command)
-    monkeypatch.setattr(
-        'taskq.backends.base.subprocess.check_output',
-        lambda command: b'',
-    )
+    monkeypatch.setattr('taskq.backends.gpus.probe_nvidia_smi', lambda: None)
     monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path))
     backend = TmuxBackend(
         'tmux',
@@ -42,6 +43,8 @@ def tmux_backend(monkeypatch, tmp_path):
         calls.append((tuple(str(a) for a in args), capture_output, check))
         if args[:2] == ('list-sessions', '-F'):
             return '\n'.join(sorted(sessions))
+        if args[:2] == ('list-panes', '-a'):
+            return '\n'.join(f'{session} 4321' for session in sorted(sessions))
         if args and args[0] == 'new-session':
             sessions.add(str(args[3]))
         if args[:2] == ('kill-session', '-t'):
@@ -279,6 +282,95 @@ def test_tmux_add_queues_job_and_ensures_broker(tmux_backend):
     assert tmux_backend.broker_session in tmux_backend.sessions
 
 
+def test_tmux_add_many_reserves_ids_and_checks_broker_once(
+    monkeypatch, tmux_backend
+):
+    reservations = []
+    broker_checks = []
+    probes = []
+    next_ids = tmux_backend._next_ids
+    ensure_broker = tmux_backend._ensure_broker
+    monkeypatch.setattr(
+        tmux_backend, '_next_ids',
+        lambda count: reservations.append(count) or next_ids(count))
+    monkeypatch.setattr(
+        tmux_backend, '_ensure_broker',
+        lambda: broker_checks.append(True) or ensure_broker())
+    tmux_backend._nvidia_gpus_available = lambda: probes.append(True) or True
+
+    job_ids = tmux_backend.add_many([
+        {'command': 'echo first', 'gpus': 1, 'slots': 1},
+        {'command': 'echo second', 'gpus': 1, 'slots': 1,
+         'depends_on': [BatchRef(0)]},
+        {'command': 'echo third', 'gpus': 0, 'slots': 1,
+         'depends_on': [BatchRef(1), 7]},
+    ])
+
+    assert reservations == [3]
+    assert broker_checks == [True]
+    assert probes == [True]
+    first, second, third = (int(job_id) for job_id in job_ids)
+    assert [second, third] == [first + 1, first + 2]
+    assert read_meta(tmux_backend, second)['depends_on'] == [first]
+    assert read_meta(tmux_backend, third)['depends_on'] == [second, 7]
+    assert [
+        int(meta['id']) for _, meta in tmux_backend._job_store().active()
+    ] == [first, second, third]
+
+
+def test_tmux_add_many_validates_before_creating_jobs(tmux_backend):
+    with pytest.raises(BackendError):
+        tmux_backend.add_many([
+            {'command': 'echo ok', 'slots': 1},
+            {'command': 'echo bad', 'slots': 0, 'gpus': 1},
+        ])
+
+    assert not list((tmux_backend.state_dir / 'jobs').glob('*'))
+    assert tmux_backend.broker_session not in tmux_backend.sessions
+
+
+def test_tmux_add_many_removes_created_jobs_when_one_fails(
+    monkeypatch, tmux_backend
+):
+    create_job = tmux_backend._create_job
+
+    def fail_second(job_id, spec, gpus_available):
+        if spec['command'] == 'echo second':
+            raise BackendError('cannot create job')
+        return create_job(job_id, spec, gpus_available)
+
+    monkeypatch.setattr(tmux_backend, '_create_job', fail_second)
+
+    with pytest.raises(BackendError, match='cannot create job'):
+        tmux_backend.add_many([
+            {'command': 'echo first', 'slots': 1},
+            {'command': 'echo second', 'slots': 1},
+        ])
+
+    assert not list((tmux_backend.state_dir / 'jobs').glob('*'))
+    assert tmux_backend._job_store().active() == []
+    assert tmux_backend.broker_session not in tmux_backend.sessions
+
+
+def test_tmux_output_capture_mode_is_recorded_and_validated(
+    monkeypatch, tmux_backend
+):
+    job_id = int(tmux_backend.add('echo hi', gpus=0, slots=1))
+    assert read_meta(tmux_backend, job_id)['output_capture'] == 'pane'
+
+    tmux_backend.output_capture = 'file'
+    job_id = int(tmux_backend.add('echo hi', gpus=0, slots=1))
+    assert read_meta(tmux_backend, job_id)['output_capture'] == 'file'
+    wrapper = (tmux_backend._job_dir(job_id) / 'run.sh').read_text()
+    assert 'if [ 1 -eq 1 ]; then\n    exec >> "$output_file" 2>&1' in wrapper
+
+    with pytest.raises(BackendError, match='output_capture'):
+        TmuxBackend('tmux', {
+            'backend': 'tmux', 'queue': 'test', 'command': 'tmux',
+            'slots': 1, 'output_capture': 'tee',
+        })
+
+
 def test_tmux_environment_encoding_can_explicitly_unset_server_values():
     encoded = TmuxBackend._encode_env({
         'KEEP_ME': 'value with spaces',
@@ -874,6 +966,61 @@ def test_tmux_keeps_current_broker(tmux_backend):
     assert tmux_backend.broker_session not in killed
 
 
+def test_tmux_broker_pid_check_requires_this_queues_broker(tmux_backend):
+    own = shlex.split(tmux_backend._broker_command())
+    assert tmux_backend._is_own_broker(own)
+    assert tmux_backend._is_own_broker(
+        ['sh', '-c', tmux_backend._broker_command(), ''])
+
+    other = [
+        str(tmux_backend.state_dir.parent / 'other') if arg == str(
+            tmux_backend.state_dir) else arg
+        for arg in own
+    ]
+    assert not tmux_backend._is_own_broker(other)
+    assert not tmux_backend._is_own_broker(['sh', '-c', shlex.join(other)])
+    assert not tmux_backend._is_own_broker(['sleep', '100'])
+
+
+def test_tmux_add_skips_tmux_while_broker_token_is_current(
+    monkeypatch, tmp_path, tmux_backend
+):
+    live_pids = {4321}
+    monkeypatch.setattr(
+        tmux_backend, '_broker_pid_alive', lambda pid: pid in live_pids)
+    session_checks = []
+    session_exists = tmux_backend._session_exists
+    monkeypatch.setattr(
+        tmux_backend, '_session_exists',
+        lambda session: session_checks.append(session) or session_exists(
+            session))
+    tmux_backend.add('echo first', gpus=0, slots=1)
+    token = json.loads(tmux_backend.broker_token_file.read_text())
+    assert token['pid'] == 4321
+    assert token['version'] == TmuxBackend.BROKER_VERSION
+
+    tmux_backend.calls.clear()
+    session_checks.clear()
+    tmux_backend.add('echo second', gpus=0, slots=1)
+    assert tmux_backend.calls == []
+    assert session_checks == []
+
+    # A changed tmux config or a dead broker falls back to the full check.
+    monkeypatch.setattr(
+        tmux_backend, '_tmux_config_files',
+        lambda: [tmux_backend.tmux_default_config_file, tmp_path / 'x.conf'])
+    (tmp_path / 'x.conf').write_text('set -g mouse on\n')
+    tmux_backend.add('echo third', gpus=0, slots=1)
+    assert ('source-file', str(tmp_path / 'x.conf')) in [
+        call[0] for call in tmux_backend.calls]
+
+    tmux_backend.calls.clear()
+    live_pids.clear()
+    tmux_backend.add('echo fourth', gpus=0, slots=1)
+    assert session_checks[-1] == tmux_backend.broker_session
+    assert tmux_backend.calls
+
+
 def test_tmux_config_slots_updates_current_broker_config(tmux_backend):
     tmux_backend.sessions.add(tmux_backend.broker_session)
     tmux_backend._broker_version = lambda: TmuxBackend.BROKER_VERSION
@@ -914,6 +1061,65 @@ def test_tmux_job_info_orders_ids_numerically(tmux_backend):
     assert ids == list(range(1, 13))
 
 
+def test_tmux_job_info_refreshes_only_selected_jobs(tmux_backend):
+    for i in range(4):
+        job_id = int(tmux_backend.add(f'sleep {i}', gpus=0, slots=1))
+        meta = read_meta(tmux_backend, job_id)
+        meta['status'] = 'running' if job_id < 4 else 'success'
+        tmux_backend._write_meta(meta)
+    refreshed = []
+    original = tmux_backend._refresh_meta
+
+    def recording_refresh(meta, sessions=None):
+        refreshed.append(meta['id'])
+        return original(meta, sessions)
+
+    tmux_backend._refresh_meta = recording_refresh
+
+    info = tmux_backend.full_info([2], FilterArgs())
+    assert [item['id'] for item in info] == [2]
+    assert refreshed == [2]
+
+    refreshed.clear()
+    info = tmux_backend.job_info(filters=FilterArgs(success=True))
+    assert [item['id'] for item in info] == [4]
+    assert 4 in refreshed
+
+    refreshed.clear()
+    assert tmux_backend.job_info([4], FilterArgs(running=True)) == []
+    assert refreshed == []
+
+
+def test_tmux_full_info_probes_running_sessions_with_one_snapshot(
+    tmux_backend,
+):
+    for i in range(3):
+        job_id = int(tmux_backend.add(f'sleep {i}', gpus=0, slots=1))
+        meta = read_meta(tmux_backend, job_id)
+        meta['status'] = 'running'
+        tmux_backend._write_meta(meta)
+        if job_id != 3:
+            tmux_backend.sessions.add(meta['session'])
+
+    def unexpected_probe(session):
+        raise AssertionError('unexpected per-session probe')
+
+    tmux_backend._session_exists = unexpected_probe
+    tmux_backend._pane_pid = unexpected_probe
+    tmux_backend.calls.clear()
+
+    info = tmux_backend.full_info(filters=FilterArgs())
+
+    assert [item['status'] for item in info] == [
+        'running', 'running', 'interrupted']
+    assert [item.get('pid') for item in info[:2]] == [4321, 4321]
+    snapshots = [
+        call for call in tmux_backend.calls
+        if call[0][:2] == ('list-panes', '-a')
+    ]
+    assert len(snapshots) == 1
+
+
 def test_tmux_output_waits_and_attaches(monkeypatch, tmux_backend, capsys):
     job_id = int(tmux_backend.add('sleep 1', gpus=0, slots=1))
     meta = read_meta(tmux_backend, job_id)
@@ -953,6 +1159,108 @@ def test_tmux_output_capture_and_file_fallback(tmux_backend):
     assert tmux_backend.output({'id': job_id}, 2) == 'c\n'
 
 
+def test_tmux_output_tail_reads_only_end_of_large_log(
+    monkeypatch, tmux_backend
+):
+    job_id = int(tmux_backend.add('echo hi', gpus=0, slots=1))
+    output_file = tmux_backend._job_dir(job_id) / 'output.log'
+    with open(output_file, 'w', encoding='utf-8') as f:
+        for index in range(200000):
+            f.write(f'line {index}\r\n' if index % 2 else f'step {index}\r')
+        f.write('last')
+    read_sizes = []
+    real_open = open
+
+    def counting_open(file, mode='r', *args, **kwargs):
+        f = real_open(file, mode, *args, **kwargs)
+        if str(file) == str(output_file):
+            read = f.read
+            f.read = lambda size=-1: read_sizes.append(size) or read(size)
+        return f
+
+    monkeypatch.setattr('builtins.open', counting_open)
+
+    assert tmux_backend.output({'id': job_id}, 3) == (
+        'step 199998\nline 199999\nlast')
+    assert read_sizes and all(0 < size <= 1 << 16 for size in read_sizes)
+    assert sum(read_sizes) < output_file.stat().st_size // 10
+
+
+def test_tmux_output_reads_archived_log_of_finished_job(tmux_backend):
+    job_id = int(tmux_backend.add('echo hi', gpus=0, slots=1))
+    output_file = tmux_backend._job_dir(job_id) / 'output.log'
+    output_file.write_text('a\nb\n', encoding='utf-8')
+    rotate_output(output_file, compression='gzip')
+    output_file.write_text('c\n', encoding='utf-8')
+    archive_output(output_file, 'gzip')
+
+    assert not output_file.exists()
+    assert tmux_backend.output({'id': job_id}, 0) == 'a\nb\nc\n'
+    assert tmux_backend.output({'id': job_id}, 3) == 'b\nc\n'
+
+
+def test_tmux_output_line_uses_line_index(tmux_backend):
+    job_id = int(tmux_backend.add('echo hi', gpus=0, slots=1))
+    output_file = tmux_backend._job_dir(job_id) / 'output.log'
+    output_file.write_text(
+        'MARK:1\nnoise\nMARK:2\nmore noise\n', encoding='utf-8')
+
+    assert tmux_backend.output_line({'id': job_id}, 'MARK:') == 'MARK:2'
+    # Reads leave the index to the broker.
+    assert not (output_file.parent / 'output.log.idx').exists()
+    assert update_index(output_file)
+    assert tmux_backend.output_line({'id': job_id}, 'MARK:') == 'MARK:2'
+    rotate_output(output_file)
+    output_file.write_text('tail\n', encoding='utf-8')
+    assert tmux_backend.output_line({'id': job_id}, 'MARK:') == 'MARK:2'
+    assert tmux_backend.output_line({'id': job_id}, 'absent') is None
+
+
+def test_tmux_passes_output_policy_to_broker(tmux_backend):
+    tmux_backend.config.update({
+        'output_max_bytes': '1G', 'output_keep': 2,
+        'output_compression': 'gzip', 'job_history_limit': 2000,
+    })
+
+    command = tmux_backend._broker_command()
+
+    assert '--output-max-bytes 1073741824' in command
+    assert '--output-keep 2' in command
+    assert '--output-compression gzip' in command
+    assert '--job-history-limit 2000' in command
+    with pytest.raises(BackendError, match='output_compression'):
+        TmuxBackend('tmux', {
+            'backend': 'tmux', 'queue': 'test', 'command': 'tmux',
+            'slots': 1, 'output_compression': 'lz4',
+        })
+    for key, value in (('output_max_bytes', 'lots'), ('output_keep', '5'),
+                       ('job_history_limit', -1)):
+        with pytest.raises(BackendError, match=key):
+            TmuxBackend('tmux', {
+                'backend': 'tmux', 'queue': 'test', 'command': 'tmux',
+                'slots': 1, key: value,
+            })
+
+
+def test_tmux_kill_continues_suspended_job_before_killing_session(
+    monkeypatch, tmux_backend
+):
+    job_id = int(tmux_backend.add('echo hi', gpus=0, slots=1))
+    meta = read_meta(tmux_backend, job_id)
+    meta.update({'status': 'suspended', 'pid': None})
+    tmux_backend._write_meta(meta)
+    tmux_backend.sessions.add(meta['session'])
+    signals = []
+    monkeypatch.setattr('os.killpg', lambda pid, signum: signals.append(
+        (pid, signum, meta['session'] in tmux_backend.sessions)))
+
+    tmux_backend.kill({'id': job_id})
+
+    assert signals == [(4321, signal.SIGCONT, True)]
+    assert meta['session'] not in tmux_backend.sessions
+    assert read_meta(tmux_backend, job_id)['status'] == 'killed'
+
+
 def test_tmux_kill_remove_and_backend_reset(tmux_backend):
     job_id = int(tmux_backend.add('echo hi', gpus=0, slots=1))
     meta = read_meta(tmux_backend, job_id)
@@ -1008,6 +1316,26 @@ def test_tmux_refresh_marks_missing_running_session_interrupted(tmux_backend):
     assert meta['exitcode'] is None
 
 
+def test_tmux_refresh_settles_suspended_job_whose_session_died(tmux_backend):
+    interrupted = int(tmux_backend.add('echo hi', gpus=0, slots=1))
+    finished = int(tmux_backend.add('echo hi', gpus=0, slots=1))
+    for job_id in (interrupted, finished):
+        meta = read_meta(tmux_backend, job_id)
+        meta.update({'status': 'suspended', 'preemptible': True})
+        tmux_backend._write_meta(meta)
+    meta = read_meta(tmux_backend, finished)
+    Path(meta['command_result_file']).write_text(json.dumps({
+        'exitcode': 0, 'end_time': '2024-01-01T00:00:00',
+        'submission_id': meta['submission_id'],
+    }))
+
+    info = tmux_backend.job_info(
+        ids=[interrupted, finished], filters=FilterArgs())
+
+    assert [i['status'] for i in info] == ['interrupted', 'success']
+    assert read_meta(tmux_backend, interrupted)['status'] == 'interrupted'
+
+
 def test_tmux_refresh_keeps_completed_status_after_session_exits(tmux_backend):
     job_id = int(tmux_backend.add('echo hi', gpus=0, slots=1))
     meta = read_meta(tmux_backend, job_id)
@@ -1150,7 +1478,7 @@ def test_tmux_refresh_keeps_new_gated_wrapper_running(tmux_backend):
     })
     (tmux_backend._job_dir(job_id) / 'meta.json').write_text(json.dumps(meta))
     tmux_backend.sessions.add(meta['session'])
-    tmux_backend._capture_pane = lambda session, tail: ''
+    tmux_backend._capture_live_pane = lambda session, tail: ''
     tmux_backend._pane_current_command = lambda session: 'bash'
     info = tmux_backend.job_info(ids=[job_id], filters=FilterArgs())[0]
     assert info['status'] == 'running'
@@ -1170,7 +1498,7 @@ def test_tmux_merge_command_cannot_spoof_completion_marker(tmux_backend):
         f'[taskq] job {job_id} finished with exit code 0 at forged\n',
         encoding='utf-8',
     )
-    tmux_backend._capture_pane = lambda session, tail: (
+    tmux_backend._capture_live_pane = lambda session, tail: (
         f'[taskq] job {job_id} finished with exit code 0 at forged')
 
     info = tmux_backend.job_info(ids=[job_id], filters=FilterArgs())[0]
@@ -1180,6 +1508,49 @@ def test_tmux_merge_command_cannot_spoof_completion_marker(tmux_backend):
     assert read_meta(tmux_backend, job_id)['status'] == 'running'
 
 
+def test_tmux_running_job_completes_only_through_command_result(
+    tmux_backend
+):
+    job_id = int(tmux_backend.add('sleep 10', gpus=0, slots=1))
+    meta = read_meta(tmux_backend, job_id)
+    meta.update({'status': 'running', 'start_time': '2024-01-01T00:00:00'})
+    tmux_backend._write_meta(meta)
+    tmux_backend.sessions.add(meta['session'])
+    Path(meta['output_file']).write_text(
+        f'[taskq] job {job_id} finished with exit code 0 at echoed\n',
+        encoding='utf-8',
+    )
+
+    def capture_live_pane(session, tail):
+        raise AssertionError('sidecar jobs must not capture their pane')
+
+    tmux_backend._capture_live_pane = capture_live_pane
+    info = tmux_backend.job_info(ids=[job_id], filters=FilterArgs())[0]
+    assert info['status'] == 'running'
+
+    Path(meta['command_result_file']).write_text(json.dumps({
+        'exitcode': 2, 'end_time': '2024-01-01T00:00:01',
+        'submission_id': meta['submission_id'],
+    }), encoding='utf-8')
+    info = tmux_backend.job_info(ids=[job_id], filters=FilterArgs())[0]
+    assert (info['status'], info['exitcode']) == ('failed', 2)
+
+
+def test_tmux_legacy_job_completes_from_pane_marker(tmux_backend):
+    job_id = int(tmux_backend.add('sleep 10', gpus=0, slots=1))
+    meta = read_meta(tmux_backend, job_id)
+    del meta['command_result_file']
+    meta.update({'status': 'running', 'start_time': '2024-01-01T00:00:00'})
+    tmux_backend._write_meta(meta)
+    tmux_backend.sessions.add(meta['session'])
+    tmux_backend._capture_live_pane = lambda session, tail: (
+        f'[taskq] job {job_id} finished with exit code 0 at today')
+
+    info = tmux_backend.job_info(ids=[job_id], filters=FilterArgs())[0]
+
+    assert (info['status'], info['exitcode']) == ('success', 0)
+
+
 def test_tmux_missing_merge_session_without_sidecar_is_interrupted(tmux_backend):
     job_id = int(tmux_backend.add('true', gpus=0, slots=1))
     meta = read_meta(tmux_backend, job_id)
@@ -1197,3 +1568,109 @@ def test_tmux_missing_merge_session_without_sidecar_is_interrupted(tmux_backend)
 
     assert info['status'] == 'interrupted'
     assert info['exitcode'] is None
+
+
+def test_tmux_reads_and_kills_through_live_broker(tmux_backend, monkeypatch):
+    job_id = int(tmux_backend.add('sleep 1', gpus=0, slots=1))
+    meta = read_meta(tmux_backend, job_id)
+    requests = []
+
+    def broker_request(op, **params):
+        requests.append((op, params))
+        if op == 'kill':
+            return {'ok': True, 'killed': params['ids'], 'skipped': []}
+        return {'ok': True, 'jobs': [dict(meta, status='running', pid=99)]}
+
+    def unexpected_refresh(meta, sessions=None):
+        raise AssertionError('broker answers must not be refreshed')
+
+    monkeypatch.setattr(tmux_backend, '_broker_request', broker_request)
+    monkeypatch.setattr(tmux_backend, '_refresh_meta', unexpected_refresh)
+    tmux_backend.calls.clear()
+
+    assert tmux_backend.job_info(ids=[job_id]) == [
+        {'id': job_id, 'status': 'running', 'exitcode': None}]
+    info = tmux_backend.full_info(filters=FilterArgs(running=True))
+    assert [(item['id'], item['pid']) for item in info] == [(job_id, 99)]
+    tmux_backend.kill({'id': job_id})
+
+    assert tmux_backend.calls == []
+    assert requests == [
+        ('list', {'ids': [job_id], 'statuses': None}),
+        ('info', {'ids': None, 'statuses': ['running']}),
+        ('kill', {'ids': [job_id]}),
+    ]
+    assert read_meta(tmux_backend, job_id)['status'] == 'queued'
+
+
+def test_tmux_records_scheduling_hints_and_policy(tmux_backend):
+    job_id = int(tmux_backend.add('echo hi', runtime=90, priority=2))
+    meta = read_meta(tmux_backend, job_id)
+    assert (meta['runtime_estimate'], meta['priority']) == (90.0, 2)
+    info = tmux_backend.full_info([job_id], None)[0]
+    assert (info['runtime_estimate'], info['priority']) == (90.0, 2)
+    with pytest.raises(BackendError, match='runtime'):
+        tmux_backend.add('echo hi', runtime=-1)
+
+    tmux_backend.config.update({'backfill': 'greedy', 'scheduler': 'sjf'})
+    command = tmux_backend._broker_command()
+    assert '--backfill greedy' in command
+    assert '--scheduler sjf' in command
+    for key, value in (('backfill', 'fair'), ('scheduler', 'lottery')):
+        with pytest.raises(BackendError, match=key):
+            TmuxBackend('tmux', {
+                'backend': 'tmux', 'queue': 'test', 'command': 'tmux',
+                'slots': 1, key: value,
+            })
+
+
+def test_tmux_records_user_and_socket_wide_settings(tmux_backend):
+    job_id = int(tmux_backend.add('echo hi'))
+    user = tmux_backend._submitting_user()
+    assert read_meta(tmux_backend, job_id)['user'] == user
+    assert tmux_backend.full_info([job_id], None)[0]['user'] == user
+
+    backend = TmuxBackend('tmux', {
+        'backend': 'tmux', 'queue': 'test', 'command': 'tmux', 'slots': 2,
+        'share': 3, 'user_shares': {'alice': 2},
+        'fair_share_half_life': '12h', 'global_slots': 4,
+    })
+    backend._write_broker_config()
+    assert json.loads(backend.broker_config_file.read_text()) == {
+        'slots': 2, 'share': 3.0, 'user_shares': {'alice': 2.0},
+        'fair_share_half_life': 43200.0, 'global_slots': 4,
+    }
+    for key, value in (
+        ('share', 0), ('user_shares', ['alice']),
+        ('fair_share_half_life', 'soon'), ('global_slots', 0),
+    ):
+        with pytest.raises(BackendError, match=key.split('_')[0]):
+            TmuxBackend('tmux', {
+                'backend': 'tmux', 'queue': 'test', 'command': 'tmux',
+                'slots': 1, key: value,
+            })
+
+
+def test_tmux_records_preemptible_jobs_and_preemption_settings(tmux_backend):
+    job_id = int(tmux_backend.add('echo hi', preemptible=True))
+    assert read_meta(tmux_backend, job_id)['preemptible'] is True
+    assert tmux_backend.full_info([job_id], None)[0]['preemptible'] is True
+    assert 'preemptible' not in read_meta(
+        tmux_backend, int(tmux_backend.add('echo hi')))
+
+    tmux_backend.config.update({
+        'preempt': 'suspend', 'preempt_signal': 'USR1',
+        'preempt_grace': '2m'})
+    command = tmux_backend._broker_command()
+    assert '--preempt suspend' in command
+    assert '--preempt-signal USR1' in command
+    assert '--preempt-grace 2m' in command
+    for key, value in (
+        ('preempt', 'kill'), ('preempt_signal', 'KILL'),
+        ('preempt_grace', 'later'),
+    ):
+        with pytest.raises(BackendError, match='preempt'):
+            TmuxBackend('tmux', {
+                'backend': 'tmux', 'queue': 'test', 'command': 'tmux',
+                'slots': 1, key: value,
+            })
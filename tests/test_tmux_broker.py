@@ -1,5 +1,10 @@
+import datetime
 import json
 import os
+import shutil
+import signal
+import socket
+import sqlite3
 import subprocess
 import threading
 import time
@@ -9,7 +14,13 @@ from pathlib import Path
 
 import pytest
 
-from taskq.backends.tmux import broker, lifecycle
+from taskq.backends.gpus import GPUInventory
+from taskq.backends.tmux import broker, control, fairshare, ledger
+from taskq.backends.tmux import lifecycle, preemption
+from taskq.backends.tmux import scheduling
+from taskq.backends.tmux.dependencies import DependencyGraph
+from taskq.backends.tmux.journal import append_journal, journal_path
+from taskq.backends.tmux.lineindex import indexed_bytes
 
 
 def write_meta(root, job_id, **overrides):
@@ -38,13 +49,18 @@ def write_meta(root, job_id, **overrides):
     meta.update(overrides)
     path = job_dir / 'meta.json'
     path.write_text(json.dumps(meta), encoding='utf-8')
+    append_journal(root, job_id)
     return path
 
 
 @pytest.fixture
 def broker_args(tmp_path):
+    # The queue's state dir sits in a socket dir, where files shared by the
+    # socket's queues are kept.
+    state_dir = tmp_path / 'default'
+    state_dir.mkdir()
     return Namespace(
-        state_dir=str(tmp_path),
+        state_dir=str(state_dir),
         prefix='taskq-test',
         command='tmux',
         config_file=str(tmp_path / 'tmux.conf'),
@@ -75,8 +91,12 @@ def fake_tmux(monkeypatch):
             sessions.add(str(tmux_args[3]))
         return ''
 
+    def fake_session_snapshot(args):
+        return {session: 1234 for session in sessions}
+
     monkeypatch.setattr(broker, 'session_exists', fake_session_exists)
     monkeypatch.setattr(broker, 'pane_pid', fake_pane_pid)
+    monkeypatch.setattr(broker, 'session_snapshot', fake_session_snapshot)
     monkeypatch.setattr(broker, 'tmux', fake_tmux)
     return calls, sessions
 
@@ -302,6 +322,7 @@ def test_broker_waits_for_successful_dependencies(
     dep_meta = read_meta(dep_path)
     dep_meta.update({'status': 'success', 'exitcode': 0})
     dep_path.write_text(json.dumps(dep_meta), encoding='utf-8')
+    append_journal(broker_args.state_dir, 1)
 
     broker.tick(broker_args)
 
@@ -324,6 +345,553 @@ def test_broker_fails_job_when_dependency_fails(
         child['output_file']).read_text(encoding='utf-8')
 
 
+def test_broker_cascades_dependency_failure_in_one_tick(
+    broker_args, fake_tmux, monkeypatch
+):
+    dep_path = write_meta(broker_args.state_dir, 1, status='running')
+    chain = [
+        write_meta(broker_args.state_dir, job_id, depends_on=[job_id - 1])
+        for job_id in range(2, 6)
+    ]
+    unrelated = write_meta(broker_args.state_dir, 6, status='running')
+    fake_tmux[1].update({'session-1', 'session-6'})
+    monkeypatch.setattr(broker, 'query_free_gpus', lambda args: [])
+
+    broker.tick(broker_args)
+    assert [read_meta(path)['status'] for path in chain] == ['queued'] * 4
+
+    dep_meta = read_meta(dep_path)
+    dep_meta.update({'status': 'killed', 'exitcode': None})
+    dep_path.write_text(json.dumps(dep_meta), encoding='utf-8')
+    append_journal(broker_args.state_dir, 1)
+    broker.tick(broker_args)
+
+    assert [read_meta(path)['status'] for path in chain] == ['failed'] * 4
+    assert 'dependency 1 ended with status killed' in Path(
+        read_meta(chain[0])['output_file']).read_text(encoding='utf-8')
+    assert 'dependency 4 ended with status failed' in Path(
+        read_meta(chain[-1])['output_file']).read_text(encoding='utf-8')
+    assert read_meta(unrelated)['status'] == 'running'
+    assert broker_args._dependency_graph.waiting == {}
+
+
+def test_dependency_graph_only_evaluates_changed_jobs():
+    graph = DependencyGraph()
+    lookups = []
+
+    def lookup(ids):
+        lookups.append(sorted(ids))
+        return {1: 'success'}
+
+    active = {
+        2: {'id': 2, 'status': 'running'},
+        3: {'id': 3, 'status': 'queued', 'depends_on': [1, 2]},
+        4: {'id': 4, 'status': 'queued', 'depends_on': [3]},
+    }
+    assert graph.update(active, lookup) == {}
+    assert lookups == [[1]]
+    assert graph.ready == set()
+    assert graph.dependents == {2: {3}, 3: {4}}
+
+    assert graph.update(active, lookup) == {}
+    assert lookups == [[1]]
+
+    active[2]['status'] = 'success'
+    assert graph.update(active, lookup) == {}
+    assert graph.ready == {3}
+
+    del active[2]
+    active[3]['status'] = 'running'
+    graph.update(active, lookup)
+    assert lookups == [[1]]
+    assert graph.ready == set()
+    assert graph.waiting == {4: {3}}
+
+
+def write_running(root, sessions, job_id, **overrides):
+    sessions.add(f'session-{job_id}')
+    return write_meta(
+        root, job_id, status='running',
+        start_time=datetime.datetime.now().isoformat(), **overrides)
+
+
+def test_broker_backfills_only_around_blocked_job_reservation(
+    broker_args, fake_tmux, monkeypatch
+):
+    _, sessions = fake_tmux
+    monkeypatch.setattr(broker, 'query_free_gpus', lambda args: [])
+    write_running(
+        broker_args.state_dir, sessions, 1, runtime_estimate=600)
+    blocked = write_meta(broker_args.state_dir, 2, slots_required=2)
+    unknown = write_meta(broker_args.state_dir, 3)
+    too_long = write_meta(broker_args.state_dir, 4, runtime_estimate=3600)
+    short = write_meta(broker_args.state_dir, 5, runtime_estimate=60)
+
+    broker.tick(broker_args)
+
+    assert read_meta(blocked)['status'] == 'queued'
+    assert read_meta(unknown)['status'] == 'queued'
+    assert read_meta(too_long)['status'] == 'queued'
+    assert read_meta(short)['status'] == 'running'
+
+
+def test_broker_backfills_into_resources_the_blocked_job_leaves(
+    broker_args, fake_tmux, monkeypatch
+):
+    _, sessions = fake_tmux
+    broker_args.slots = 4
+    monkeypatch.setattr(broker, 'query_free_gpus', lambda args: [1])
+    write_running(
+        broker_args.state_dir, sessions, 1, slots_required=2,
+        gpus_required=1, gpu_ids='0')
+    blocked = write_meta(
+        broker_args.state_dir, 2, slots_required=1, gpus_required=2)
+    cpu = write_meta(broker_args.state_dir, 3)
+    gpu = write_meta(broker_args.state_dir, 4, gpus_required=1)
+
+    broker.tick(broker_args)
+
+    # Job 2 takes both GPUs once job 1 ends; only slots are left over.
+    assert read_meta(blocked)['status'] == 'queued'
+    assert read_meta(cpu)['status'] == 'running'
+    assert read_meta(gpu)['status'] == 'queued'
+
+
+def test_broker_learns_run_times_of_successful_commands(
+    broker_args, fake_tmux, monkeypatch
+):
+    _, sessions = fake_tmux
+    monkeypatch.setattr(broker, 'query_free_gpus', lambda args: [])
+    write_meta(
+        broker_args.state_dir, 1, command='eval', status='success',
+        exitcode=0, start_time='2024-01-01T00:00:00',
+        end_time='2024-01-01T00:00:30')
+    write_running(broker_args.state_dir, sessions, 2, command='train')
+    write_meta(
+        broker_args.state_dir, 3, command='train', status='success',
+        exitcode=0, start_time='2024-01-01T00:00:00',
+        end_time='2024-01-01T01:00:00')
+    blocked = write_meta(broker_args.state_dir, 4, slots_required=2)
+    evaluation = write_meta(broker_args.state_dir, 5, command='eval')
+
+    broker.tick(broker_args)
+
+    assert read_meta(blocked)['status'] == 'queued'
+    assert read_meta(evaluation)['status'] == 'running'
+    assert broker.runtime_history(broker_args).estimate(
+        {'command': 'eval'}) == 30
+
+
+@pytest.mark.parametrize('mode, started', [
+    ('greedy', {3}), ('none', set()),
+])
+def test_broker_backfill_modes(
+    broker_args, fake_tmux, monkeypatch, mode, started
+):
+    _, sessions = fake_tmux
+    broker_args.backfill = mode
+    monkeypatch.setattr(broker, 'query_free_gpus', lambda args: [])
+    write_running(broker_args.state_dir, sessions, 1)
+    paths = {
+        2: write_meta(broker_args.state_dir, 2, slots_required=2),
+        3: write_meta(broker_args.state_dir, 3),
+    }
+
+    broker.tick(broker_args)
+
+    assert {
+        job_id for job_id, path in paths.items()
+        if read_meta(path)['status'] == 'running'
+    } == started
+
+
+def test_broker_orders_ready_jobs_by_configured_policy(
+    broker_args, fake_tmux, monkeypatch
+):
+    broker_args.slots = 1
+    broker_args.scheduler = 'priority'
+    monkeypatch.setattr(broker, 'query_free_gpus', lambda args: [])
+    low = write_meta(broker_args.state_dir, 1)
+    high = write_meta(broker_args.state_dir, 2, priority=5)
+
+    broker.tick(broker_args)
+
+    assert read_meta(low)['status'] == 'queued'
+    assert read_meta(high)['status'] == 'running'
+
+
+def test_fair_share_decays_usage_and_yields_only_to_waiting_queues(tmp_path):
+    path = tmp_path / 'fairshare.json'
+    busy = fairshare.FairShare(path, half_life=100)
+    idle = fairshare.FairShare(path, half_life=100)
+    busy.update('busy', 1, [], 0, now=0)
+    busy.update('busy', 1, [('alice', 1, 2), ('bob', 1, 0)], 0, now=10)
+    idle.update('idle', 1, [], 2, now=10)
+    state = busy.update('busy', 1, [], 0, now=110)
+
+    assert state['queues']['busy']['slots'] == pytest.approx(10)
+    assert state['queues']['busy']['gpus'] == pytest.approx(10)
+    assert busy.user_usage() == {'alice': 1.0, 'bob': 0.5}
+    assert busy.user_usage({'alice': 4}) == {'alice': 0.25, 'bob': 0.5}
+    assert busy.reserved_gpus('busy', now=110) == 0
+    idle.update('idle', 1, [], 2, now=110)
+    busy.update('busy', 1, [], 0, now=110)
+    assert busy.reserved_gpus('busy', now=110) == 2
+    assert idle.reserved_gpus('idle', now=110) == 0
+    assert busy.reserved_gpus(
+        'busy', now=110 + fairshare.DEMAND_TTL + 1) == 0
+
+    state = busy.update('busy', 1, [], 0, now=5000)
+    assert set(state['queues']) == {'busy'}
+    assert state['users'] == {}
+
+
+def test_fair_broker_leaves_gpus_to_waiting_queue_under_its_share(
+    tmp_path, broker_args, fake_tmux, monkeypatch
+):
+    _, sessions = fake_tmux
+    monkeypatch.setattr(broker, 'query_free_gpus', lambda args: [1])
+    queues = {}
+    for name in ('busy', 'idle'):
+        queues[name] = Namespace(**vars(broker_args))
+        queues[name].state_dir = str(tmp_path / 'socket' / name)
+        queues[name].scheduler = 'fair'
+    busy, idle = queues['busy'].state_dir, queues['idle'].state_dir
+    write_running(busy, sessions, 1, gpus_required=1, gpu_ids='0', user='a')
+    waiting = write_meta(busy, 2, gpus_required=1)
+    write_meta(idle, 1, gpus_required=2)
+    arbiter = fairshare.FairShare(fairshare.fairshare_path(busy))
+    arbiter.update('busy', 1, [], 0, now=time.time() - 60)
+    arbiter.update('busy', 1, [('a', 1, 1)], 0, now=time.time() - 30)
+
+    broker.tick(queues['idle'])
+    broker.tick(queues['idle'])
+    broker.tick(queues['busy'])
+    assert read_meta(waiting)['status'] == 'queued'
+
+    arbiter.update('idle', 1, [], 0)
+    broker.tick(queues['busy'])
+    assert read_meta(waiting)['status'] == 'running'
+    assert read_meta(waiting)['gpu_ids'] == '1'
+
+
+def test_resource_ledger_claims_gpus_and_global_slots_once(tmp_path):
+    path = tmp_path / 'resources.json'
+    first = ledger.ResourceLedger(path, 'first')
+    second = ledger.ResourceLedger(path, 'second')
+    first.sync({}, now=0)
+    second.sync({}, now=0)
+
+    assert first.claim(1, 1, [0], global_slots=3, now=1)
+    assert not second.claim(1, 1, [0], global_slots=3, now=1)
+    assert second.gpus == {0}
+    assert second.claim(2, 2, [1], global_slots=3, now=1)
+    assert not first.claim(2, 1, [], global_slots=3, now=1)
+    second.release(2)
+    assert first.claim(2, 1, [], global_slots=3, now=1)
+
+    first.sync({1: (1, [0])}, now=2)
+    assert first.slots == 0
+    second.sync({}, now=2)
+    assert (second.gpus, second.slots) == ({0}, 1)
+    second.sync({}, now=3 + ledger.LEDGER_TTL)
+    assert (second.gpus, second.slots) == (set(), 0)
+
+
+def test_brokers_of_different_queues_never_share_a_gpu(
+    tmp_path, broker_args, fake_tmux, monkeypatch
+):
+    _, sessions = fake_tmux
+    monkeypatch.setattr(broker, 'query_free_gpus', lambda args: [0, 1])
+    queues = {}
+    for name in ('first', 'second'):
+        queues[name] = Namespace(**vars(broker_args))
+        queues[name].state_dir = str(tmp_path / 'socket' / name)
+    first = write_meta(queues['first'].state_dir, 1, gpus_required=1)
+    second = write_meta(queues['second'].state_dir, 1, gpus_required=1)
+    third = write_meta(queues['second'].state_dir, 2, gpus_required=1)
+
+    broker.tick(queues['first'])
+    broker.tick(queues['second'])
+
+    assert read_meta(first)['gpu_ids'] == '0'
+    assert read_meta(second)['gpu_ids'] == '1'
+    assert read_meta(third)['status'] == 'queued'
+
+
+def test_broker_respects_slots_shared_by_the_socket(
+    tmp_path, broker_args, fake_tmux, monkeypatch
+):
+    _, sessions = fake_tmux
+    monkeypatch.setattr(broker, 'query_free_gpus', lambda args: [])
+    queues = {}
+    for name in ('first', 'second'):
+        queues[name] = Namespace(**vars(broker_args))
+        queues[name].state_dir = str(tmp_path / 'socket' / name)
+        queues[name].backfill = 'greedy'
+        Path(queues[name].state_dir).mkdir(parents=True)
+        (Path(queues[name].state_dir) / 'broker.json').write_text(
+            json.dumps({'slots': 2, 'global_slots': 3}), encoding='utf-8')
+    write_running(queues['first'].state_dir, sessions, 1, slots_required=2)
+    second = write_meta(queues['second'].state_dir, 1, slots_required=2)
+    small = write_meta(queues['second'].state_dir, 2)
+
+    broker.tick(queues['first'])
+    broker.tick(queues['second'])
+
+    assert read_meta(second)['status'] == 'queued'
+    assert read_meta(small)['status'] == 'running'
+
+
+def test_queue_of_any_policy_leaves_shared_slots_to_waiting_queue(
+    tmp_path, broker_args, fake_tmux, monkeypatch
+):
+    _, sessions = fake_tmux
+    monkeypatch.setattr(broker, 'query_free_gpus', lambda args: [])
+    queues = {}
+    for name in ('flood', 'idle'):
+        queues[name] = Namespace(**vars(broker_args))
+        queues[name].state_dir = str(tmp_path / 'socket' / name)
+        Path(queues[name].state_dir).mkdir(parents=True)
+        (Path(queues[name].state_dir) / 'broker.json').write_text(
+            json.dumps({'slots': 4, 'global_slots': 4}), encoding='utf-8')
+    flood, idle = queues['flood'].state_dir, queues['idle'].state_dir
+    write_running(flood, sessions, 1, slots_required=2)
+    arbiter = fairshare.FairShare(fairshare.fairshare_path(flood))
+    arbiter.update('flood', 1, [], 0, now=time.time() - 60)
+    arbiter.update('flood', 1, [('a', 2, 0)], 0, now=time.time() - 30)
+    broker.tick(queues['flood'])
+    waiting = write_meta(flood, 2)
+    write_meta(idle, 1, slots_required=3)
+
+    broker.tick(queues['idle'])
+    broker.tick(queues['idle'])
+    broker.tick(queues['flood'])
+    assert read_meta(waiting)['status'] == 'queued'
+
+    arbiter.update('idle', 1, [], 0, 0)
+    broker.tick(queues['flood'])
+    assert read_meta(waiting)['status'] == 'running'
+
+
+def test_preemption_picks_lowest_priority_latest_jobs_first():
+    running = [
+        ({'id': 1, 'preemptible': True, 'start_time': '2024-01-01T00:00:00'},
+         1, 1),
+        ({'id': 2, 'preemptible': True, 'start_time': '2024-01-01T01:00:00'},
+         1, 1),
+        ({'id': 3, 'preemptible': True, 'priority': 2}, 1, 1),
+        ({'id': 4, 'start_time': '2024-01-01T02:00:00'}, 1, 1),
+    ]
+    jobs = preemption.candidates(running, 1)
+    assert [meta['id'] for meta, _, _ in jobs] == [2, 1]
+    assert [
+        meta['id'] for meta in preemption.choose_victims(
+            1, 1, 0, 0, jobs, 'requeue')
+    ] == [2]
+    # Suspended jobs keep their GPUs.
+    assert preemption.choose_victims(1, 1, 0, 0, jobs, 'suspend') is None
+    assert preemption.choose_victims(1, 0, 1, 0, jobs, 'suspend') == []
+    with pytest.raises(ValueError, match='preempt_signal'):
+        preemption.parse_signal('KILL')
+    assert preemption.parse_signal('sigusr1') == signal.SIGUSR1
+
+
+def test_broker_requeues_preempted_job_for_urgent_one(
+    broker_args, fake_tmux, monkeypatch
+):
+    calls, sessions = fake_tmux
+    signals = []
+    monkeypatch.setattr(
+        broker.os, 'killpg', lambda pid, signum: signals.append((pid, signum)))
+    broker_args.slots = 1
+    broker_args.preempt_grace = 60
+    victim = write_running(
+        broker_args.state_dir, sessions, 1, preemptible=True)
+    urgent = write_meta(broker_args.state_dir, 2, priority=5)
+    later = write_meta(broker_args.state_dir, 3, priority=5)
+
+    broker.tick(broker_args)
+    assert signals == [(1234, signal.SIGTERM)]
+    assert read_meta(victim)['preempt_time']
+    assert read_meta(urgent)['status'] == 'queued'
+
+    broker.tick(broker_args)
+    assert ('kill-session', '-t', 'session-1') not in calls
+    broker_args.preempt_grace = 0
+    broker.tick(broker_args)
+
+    assert ('kill-session', '-t', 'session-1') in calls
+    meta = read_meta(victim)
+    assert (meta['status'], meta['preemptions']) == ('queued', 1)
+    assert 'preempt_time' not in meta
+    assert read_meta(urgent)['status'] == 'running'
+    assert read_meta(later)['status'] == 'queued'
+    assert 'requeued' in Path(meta['output_file']).read_text()
+
+
+@pytest.mark.parametrize('exitcode, status', [
+    (1, 'failed'), (0, 'success'), (128 + signal.SIGTERM, 'queued')])
+def test_broker_requeues_only_jobs_ended_by_preemption(
+    broker_args, fake_tmux, monkeypatch, exitcode, status
+):
+    _, sessions = fake_tmux
+    monkeypatch.setattr(broker.os, 'killpg', lambda pid, signum: None)
+    broker_args.slots = 1
+    broker_args.preempt_grace = 60
+    job_dir = Path(broker_args.state_dir) / 'jobs' / '1'
+    result_file = job_dir / 'command-result.json'
+    victim = write_running(
+        broker_args.state_dir, sessions, 1, preemptible=True,
+        command_result_file=str(result_file))
+    write_meta(broker_args.state_dir, 2, priority=5)
+    broker.tick(broker_args)
+    assert read_meta(victim)['preempt_time']
+
+    # The job exits within the grace period.
+    result_file.write_text(json.dumps(
+        {'exitcode': exitcode, 'end_time': '2024-01-01T00:00:00'}))
+    broker.tick(broker_args)
+
+    meta = read_meta(victim)
+    assert meta['status'] == status
+    assert 'preempt_time' not in meta
+    assert meta.get('preemptions', 0) == (status == 'queued')
+    if status != 'queued':
+        assert meta['exitcode'] == exitcode
+
+
+def test_broker_suspends_preemptible_job_and_resumes_it(
+    broker_args, fake_tmux, monkeypatch
+):
+    _, sessions = fake_tmux
+    signals = []
+    monkeypatch.setattr(
+        broker.os, 'killpg', lambda pid, signum: signals.append((pid, signum)))
+    monkeypatch.setattr(broker, 'query_free_gpus', lambda args: [])
+    broker_args.slots = 1
+    broker_args.preempt = 'suspend'
+    victim = write_running(
+        broker_args.state_dir, sessions, 1, preemptible=True,
+        gpus_required=1, gpu_ids='0')
+    urgent = write_meta(broker_args.state_dir, 2, priority=5)
+
+    broker.tick(broker_args)
+    assert signals == [(1234, signal.SIGSTOP)]
+    assert read_meta(victim)['status'] == 'suspended'
+    broker.tick(broker_args)
+    assert read_meta(urgent)['status'] == 'running'
+    assert read_meta(victim)['status'] == 'suspended'
+    assert broker.resource_ledger(broker_args).gpus == set()
+
+    sessions.discard('session-2')
+    broker.tick(broker_args)
+    assert read_meta(urgent)['status'] == 'interrupted'
+    assert read_meta(victim)['status'] == 'running'
+    assert signals[-1] == (1234, signal.SIGCONT)
+
+
+def test_kill_continues_suspended_job_before_its_session_goes(
+    broker_args, fake_tmux, monkeypatch
+):
+    calls, sessions = fake_tmux
+    events = []
+    fake = broker.tmux
+
+    def killing_tmux(args, *tmux_args, **kwargs):
+        if tmux_args[:1] == ('kill-session',):
+            events.append('kill-session')
+            sessions.discard(tmux_args[2])
+        return fake(args, *tmux_args, **kwargs)
+
+    monkeypatch.setattr(broker, 'tmux', killing_tmux)
+    monkeypatch.setattr(
+        broker.os, 'killpg', lambda pid, signum: events.append((pid, signum)))
+    sessions.add('session-1')
+    path = write_meta(broker_args.state_dir, 1, status='suspended')
+
+    broker.kill_job(broker_args, path, read_meta(path))
+
+    assert events == [(1234, signal.SIGCONT), 'kill-session']
+    assert read_meta(path)['status'] == 'killed'
+
+
+def test_suspended_job_does_not_hold_slots_back_from_ready_jobs(
+    broker_args, fake_tmux, monkeypatch
+):
+    _, sessions = fake_tmux
+    monkeypatch.setattr(broker, 'query_free_gpus', lambda args: [])
+    broker_args.slots = 2
+    broker_args.preempt = 'suspend'
+    sessions.add('session-1')
+    suspended = write_meta(
+        broker_args.state_dir, 1, status='suspended', slots_required=2,
+        preemptible=True, pid=1234,
+        start_time=datetime.datetime.now().isoformat())
+    write_running(
+        broker_args.state_dir, sessions, 2, priority=5, runtime_estimate=600)
+    ready = write_meta(broker_args.state_dir, 3)
+
+    broker.tick(broker_args)
+
+    assert read_meta(ready)['status'] == 'running'
+    assert read_meta(suspended)['status'] == 'suspended'
+
+
+def test_fair_policy_orders_by_user_usage():
+    policy = scheduling.policy_class('fair')(scheduling.RuntimeHistory())
+    policy.user_usage = {'alice': 0.8, 'bob': 0.1}
+    jobs = [
+        (None, {'id': 1, 'user': 'alice'}),
+        (None, {'id': 2, 'user': 'bob'}),
+        (None, {'id': 3}),
+        (None, {'id': 4, 'user': 'bob'}),
+    ]
+    now = datetime.datetime.now()
+    assert [meta['id'] for _, meta in policy.order(jobs, now)] == [3, 2, 4, 1]
+
+
+def test_shortest_job_first_ages_long_jobs():
+    history = scheduling.RuntimeHistory()
+    history.observe([{
+        'command': 'eval --seed 1', 'status': 'success',
+        'start_time': '2024-01-01T00:00:00',
+        'end_time': '2024-01-01T00:01:00',
+    }])
+    policy = scheduling.policy_class('sjf')(history)
+    now = datetime.datetime(2024, 1, 2)
+    train = {
+        'id': 1, 'command': 'train', 'runtime_estimate': 7200,
+        'enqueue_time': '2024-01-02T00:00:00'}
+    evaluation = {
+        'id': 2, 'command': 'eval --seed 2',
+        'enqueue_time': '2024-01-02T00:00:00'}
+    unknown = {'id': 3, 'command': 'other', 'enqueue_time': None}
+
+    def order(*metas):
+        return [
+            meta['id'] for _, meta in policy.order(
+                [(None, meta) for meta in metas], now)]
+
+    assert history.estimate(evaluation) == 60
+    assert order(train, evaluation, unknown) == [2, 3, 1]
+    train['enqueue_time'] = '2024-01-01T00:00:00'
+    assert order(train, evaluation, unknown) == [1, 2, 3]
+
+
+class ReverseIdPolicy(scheduling.SchedulingPolicy):
+    def key(self, meta, now):
+        return -int(meta['id'])
+
+
+def test_scheduling_policies_plug_in_as_module_and_class():
+    name = f'{__name__}:ReverseIdPolicy'
+    assert scheduling.policy_class(name) is ReverseIdPolicy
+    for name in ('lottery', 'os:path', f'{__name__}:write_meta'):
+        with pytest.raises(ValueError, match='scheduling policy'):
+            scheduling.policy_class(name)
+
+
 def test_broker_runtime_slots_caches_unchanged_config(broker_args, monkeypatch):
     config_path = Path(broker_args.state_dir) / 'broker.json'
     config_path.write_text(json.dumps({'slots': 3}), encoding='utf-8')
@@ -347,7 +915,6 @@ def test_broker_gpu_allocation_and_cpu_minus_one(broker_args, fake_tmux, monkeyp
     p2 = write_meta(broker_args.state_dir, 2, gpus_required=1)
     p3 = write_meta(broker_args.state_dir, 3, gpus_required=0)
     monkeypatch.setattr(broker, 'query_free_gpus', lambda args: [0])
-    monkeypatch.setattr(broker.random, 'shuffle', lambda values: None)
     broker.tick(broker_args)
 
     assert read_meta(p1)['status'] == 'running'
@@ -383,6 +950,84 @@ def test_broker_releases_job_after_pipe_pane(broker_args, fake_tmux, monkeypatch
     assert new_index < pipe_index
 
 
+def test_broker_skips_pipe_pane_for_file_capture(
+    broker_args, fake_tmux, monkeypatch
+):
+    calls, _ = fake_tmux
+    path = write_meta(broker_args.state_dir, 1, output_capture='file')
+    monkeypatch.setattr(broker, 'query_free_gpus', lambda args: [])
+
+    broker.tick(broker_args)
+
+    assert read_meta(path)['status'] == 'running'
+    assert Path(read_meta(path)['start_file']).exists()
+    assert not any(call and call[0] == 'pipe-pane' for call in calls)
+
+
+def test_broker_caps_history_of_file_captured_job_panes(
+    broker_args, fake_tmux, monkeypatch
+):
+    calls, _ = fake_tmux
+    write_meta(broker_args.state_dir, 1)
+    write_meta(broker_args.state_dir, 2, output_capture='file')
+    monkeypatch.setattr(broker, 'query_free_gpus', lambda args: [])
+
+    broker.tick(broker_args)
+
+    starts = [
+        call for call in calls
+        if 'new-session' in call and any('job-' in str(a) for a in call)]
+    assert starts[0][:2] == ('new-session', '-d')
+    assert starts[1][:5] == ('set-option', '-g', 'history-limit', '0', ';')
+    assert starts[1][-4:] == (
+        'set-option', '-g', 'history-limit', str(broker_args.history_limit))
+    assert not any(
+        call[:2] == ('set-option', '-t') and 'history-limit' in call
+        for call in calls)
+
+
+def test_broker_rotates_large_logs_and_archives_finished_jobs(
+    broker_args, fake_tmux, monkeypatch
+):
+    _, sessions = fake_tmux
+    broker_args.output_max_bytes = 100
+    broker_args.output_keep = 2
+    broker_args.output_compression = 'gzip'
+    monkeypatch.setattr(broker, 'query_free_gpus', lambda args: [])
+    path = write_meta(broker_args.state_dir, 1)
+    broker.tick(broker_args)
+    meta = read_meta(path)
+    assert meta['status'] == 'running'
+    sessions.add(meta['session'])
+    output_file = Path(meta['output_file'])
+    output_file.write_text('x' * 50 + '\n', encoding='utf-8')
+
+    broker.tick(broker_args)
+    broker.output_worker(broker_args).shutdown(wait=True)
+    del broker_args._output_worker
+    assert output_file.read_text() == 'x' * 50 + '\n'
+    assert indexed_bytes(output_file) == 51
+
+    with open(output_file, 'a', encoding='utf-8') as f:
+        f.write('y' * 100 + '\n')
+    broker.tick(broker_args)
+    broker.output_worker(broker_args).shutdown(wait=True)
+    del broker_args._output_worker
+    assert output_file.read_text() == ''
+    assert (output_file.parent / 'output.log.1.gz').exists()
+
+    with open(output_file, 'a', encoding='utf-8') as f:
+        f.write('[taskq] job 1 finished with exit code 0\n')
+    sessions.discard(meta['session'])
+    broker.tick(broker_args)
+    broker.output_worker(broker_args).shutdown(wait=True)
+
+    assert read_meta(path)['status'] == 'success'
+    assert not output_file.exists()
+    assert sorted(p.name for p in output_file.parent.glob('output.log*')) == [
+        'output.log.1.gz', 'output.log.2.gz']
+
+
 def test_broker_no_nvidia_smi_fails_gpu_job_but_runs_cpu(
     broker_args, fake_tmux, monkeypatch
 ):
@@ -397,6 +1042,40 @@ def test_broker_no_nvidia_smi_fails_gpu_job_but_runs_cpu(
     assert read_meta(cpu_path)['status'] == 'running'
 
 
+def test_broker_probes_gpus_only_for_ready_gpu_jobs(
+    broker_args, fake_tmux, monkeypatch
+):
+    probes = []
+    monkeypatch.setattr(
+        broker, 'query_free_gpus', lambda args: probes.append(True) or [0, 1])
+    write_meta(broker_args.state_dir, 1, gpus_required=0)
+    broker.tick(broker_args)
+    assert probes == []
+
+    first = write_meta(broker_args.state_dir, 2, gpus_required=1)
+    second = write_meta(broker_args.state_dir, 3, gpus_required=1)
+    broker_args.slots = 3
+    broker.tick(broker_args)
+    assert probes == [True]
+    assert {read_meta(first)['gpu_ids'], read_meta(second)['gpu_ids']} == {
+        '0', '1'}
+
+
+def test_broker_publishes_gpu_inventory_for_the_cli(
+    broker_args, monkeypatch, tmp_path
+):
+    broker_args.gpu_inventory = str(tmp_path / 'gpus.json')
+    broker_args.fake_gpus = 2
+
+    assert broker.query_free_gpus(broker_args) == [0, 1]
+
+    def probe_again():
+        raise AssertionError('unexpected GPU probe')
+
+    inventory = GPUInventory(broker_args.gpu_inventory, provider=probe_again)
+    assert inventory.count() == 2
+
+
 def test_query_free_gpus_filters_visibility_and_threshold(monkeypatch, broker_args):
     broker_args.visible_gpus = '1,2'
     broker_args.gpu_free_perc = 90
@@ -430,6 +1109,75 @@ def test_visible_gpus_from_environment(monkeypatch, broker_args):
     assert broker.visible_gpu_ids(broker_args) == [3, 4]
 
 
+def test_session_snapshot_parses_sessions_and_pane_pids(
+    monkeypatch, broker_args
+):
+    commands = []
+
+    class Result:
+        returncode = 0
+        stdout = 'job-1 101\njob-1 102\ncontroller-a b 103\nbroken x\n'
+        stderr = ''
+
+    def fake_run(cmd, **kwargs):
+        commands.append(cmd)
+        return Result()
+
+    monkeypatch.setattr(subprocess, 'run', fake_run)
+
+    assert broker.session_snapshot(broker_args) == {
+        'job-1': 101,
+        'controller-a b': 103,
+        'broken': None,
+    }
+    assert commands[0][-4:] == [
+        'list-panes', '-a', '-F', broker.SNAPSHOT_FORMAT]
+
+
+def test_session_snapshot_distinguishes_missing_server_from_errors(
+    monkeypatch, broker_args
+):
+    class Result:
+        returncode = 1
+        stdout = ''
+        stderr = 'no server running on /tmp/tmux-0/taskq\n'
+
+    monkeypatch.setattr(subprocess, 'run', lambda *a, **k: Result())
+    assert broker.session_snapshot(broker_args) == {}
+
+    Result.stderr = 'unexpected failure\n'
+    assert broker.session_snapshot(broker_args) is None
+
+
+def test_tick_uses_one_snapshot_instead_of_per_job_probes(
+    broker_args, fake_tmux, monkeypatch
+):
+    _, sessions = fake_tmux
+    for job_id in (1, 2):
+        write_meta(
+            broker_args.state_dir, job_id, status='running',
+            session=f'live-{job_id}')
+        sessions.add(f'live-{job_id}')
+    gone = write_meta(
+        broker_args.state_dir, 3, status='running', session='gone')
+    monkeypatch.setattr(broker, 'query_free_gpus', lambda args: [])
+
+    def unexpected_probe(args, session):
+        raise AssertionError('unexpected per-session probe')
+
+    monkeypatch.setattr(broker, 'session_exists', unexpected_probe)
+    monkeypatch.setattr(broker, 'pane_pid', unexpected_probe)
+
+    broker.tick(broker_args)
+
+    assert read_meta(gone)['status'] == 'interrupted'
+    for job_id in (1, 2):
+        meta = read_meta(Path(broker_args.state_dir) / 'jobs' / str(job_id)
+                         / 'meta.json')
+        assert meta['status'] == 'running'
+        assert meta['pid'] == 1234
+
+
 def test_refresh_running_marks_missing_session_interrupted(broker_args, fake_tmux):
     path = write_meta(broker_args.state_dir, 1, status='running', session='missing')
     refreshed = broker.refresh_running(broker_args, path, read_meta(path))
@@ -479,6 +1227,29 @@ def test_refresh_running_recovers_old_shell_session_with_finished_marker(
     assert ('kill-session', '-t', 'live') in calls
 
 
+def test_refresh_running_ignores_marker_of_job_with_command_result_file(
+    broker_args, fake_tmux
+):
+    calls, sessions = fake_tmux
+    job_dir = Path(broker_args.state_dir) / 'jobs' / '1'
+    path = write_meta(
+        broker_args.state_dir, 1, status='running', session='live',
+        command_result_file=str(job_dir / 'command-result.json'))
+    meta = read_meta(path)
+    Path(meta['output_file']).write_text(
+        '[taskq] job 1 finished with exit code 0 at echoed\n',
+        encoding='utf-8',
+    )
+    sessions.add('live')
+
+    assert broker.refresh_running(broker_args, path, meta)['status'] == (
+        'running')
+    sessions.discard('live')
+    assert broker.refresh_running(
+        broker_args, path, read_meta(path))['status'] == 'interrupted'
+    assert not (path.parent / 'output.log.idx').exists()
+
+
 def test_merge_command_output_cannot_spoof_finished_marker(
     broker_args, fake_tmux
 ):
@@ -731,6 +1502,218 @@ def test_start_job_marks_failed_when_tmux_new_session_fails(
     assert 'bad shell syntax' in Path(meta['output_file']).read_text()
 
 
+def test_broker_wakeup_fifo_delivers_nudges(broker_args):
+    assert broker.wake_broker(broker_args.state_dir) is False
+    fd = broker.open_wakeup(broker_args)
+    try:
+        assert broker.wait_for_wakeup(fd, 0) is False
+        assert broker.wake_broker(broker_args.state_dir) is True
+        assert broker.wake_broker(broker_args.state_dir) is True
+        started = time.monotonic()
+        assert broker.wait_for_wakeup(fd, 5) is True
+        assert time.monotonic() - started < 1
+        assert broker.wait_for_wakeup(fd, 0) is False
+    finally:
+        os.close(fd)
+
+
+def test_wrapper_journals_and_nudges_broker_after_command_result(
+    broker_args, tmp_path,
+):
+    from taskq.backends.tmux.backend import render_wrapper
+
+    job_dir = tmp_path / 'job'
+    job_dir.mkdir()
+    start_file = job_dir / 'start'
+    start_file.touch()
+    wrapper = job_dir / 'run.sh'
+    wrapper.write_text(render_wrapper(
+        job_id=1,
+        argv=['true'],
+        session='taskq-test-1',
+        output_file=job_dir / 'output.log',
+        start_file=start_file,
+        env_exports='',
+        wakeup_file=broker.wakeup_path(broker_args.state_dir),
+        journal_file=journal_path(broker_args.state_dir),
+    ), encoding='utf-8')
+    wrapper.chmod(0o700)
+    fd = broker.open_wakeup(broker_args)
+    try:
+        subprocess.run([str(wrapper)], capture_output=True, check=True)
+        assert (job_dir / 'command-result.json').exists()
+        assert broker.wait_for_wakeup(fd, 0) is True
+    finally:
+        os.close(fd)
+    assert json.loads(journal_path(broker_args.state_dir).read_text()) == {
+        'id': 1, 'event': 'result'}
+
+
+def test_broker_job_table_replays_only_journaled_jobs(
+    broker_args, fake_tmux, monkeypatch,
+):
+    monkeypatch.setattr(broker, 'query_free_gpus', lambda args: [])
+    fake_tmux[1].add('session-1')
+    first = write_meta(broker_args.state_dir, 1, status='running', pid=1234)
+    broker.tick(broker_args)
+    table = broker_args._job_table
+    assert list(table.jobs) == [1]
+    assert journal_path(broker_args.state_dir).read_text() == ''
+
+    write_meta(broker_args.state_dir, 2, depends_on=[1])
+    # Changed without a journal record: invisible until the next checkpoint.
+    meta = read_meta(first)
+    meta['command'] = 'edited'
+    first.write_text(json.dumps(meta), encoding='utf-8')
+    loads = []
+    original_load = table.store.load
+
+    def recording_load(ids=None, statuses=None):
+        loads.append(ids)
+        return original_load(ids=ids, statuses=statuses)
+
+    monkeypatch.setattr(table.store, 'load', recording_load)
+    broker.tick(broker_args)
+    assert loads == [[2]]
+    assert sorted(table.jobs) == [1, 2]
+    assert table.jobs[1][1]['command'] == 'job 1'
+
+    table.checkpoint()
+    assert table.jobs[1][1]['command'] == 'edited'
+
+    restarted = Namespace(**{
+        key: value for key, value in vars(broker_args).items()
+        if not key.startswith('_')
+    })
+    append_journal(broker_args.state_dir, 2, event='remove')
+    shutil.rmtree(Path(broker_args.state_dir) / 'jobs' / '2')
+    broker.tick(restarted)
+    assert sorted(restarted._job_table.jobs) == [1]
+    assert journal_path(broker_args.state_dir).read_text() == ''
+
+
+def serve(server, call):
+    """Run ``call`` in a thread while the broker loop serves ``server``."""
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        future = executor.submit(call)
+        while not future.done():
+            broker.wait_for_wakeup(None, 0.05, server)
+        return future.result(timeout=5)
+
+
+def test_control_socket_serves_job_table_and_kills(
+    broker_args, fake_tmux, monkeypatch, tmp_path,
+):
+    monkeypatch.setattr(broker, 'query_free_gpus', lambda args: [])
+    fake_tmux[1].add('session-2')
+    write_meta(broker_args.state_dir, 1, status='success', exitcode=0)
+    write_meta(broker_args.state_dir, 2, status='running', pid=1234)
+    queued = write_meta(broker_args.state_dir, 3, depends_on=[2])
+    broker.tick(broker_args)
+    path = tmp_path / 'ctl.sock'
+    server = control.open_control(path, broker.control_handlers(broker_args))
+    try:
+        response = serve(server, lambda: control.request(path, 'list'))
+        assert response['jobs'] == [
+            {'id': 1, 'status': 'success', 'exitcode': 0},
+            {'id': 2, 'status': 'running', 'exitcode': None},
+            {'id': 3, 'status': 'queued', 'exitcode': None},
+        ]
+        response = serve(server, lambda: control.request(
+            path, 'info', ids=[3, 1], statuses=['queued']))
+        assert [job['depends_on'] for job in response['jobs']] == [[2]]
+
+        response = serve(
+            server, lambda: control.request(path, 'kill', ids=[1, 3]))
+        assert (response['killed'], response['skipped']) == ([3], [1])
+        assert read_meta(queued)['status'] == 'killed'
+        assert 3 not in broker_args._job_table.jobs
+
+        assert serve(server, lambda: control.request(path, 'bogus')) is None
+    finally:
+        server.close()
+    assert not path.exists()
+    assert control.request(path, 'list') is None
+
+
+def test_control_socket_publishes_status_changes(
+    broker_args, fake_tmux, monkeypatch, tmp_path,
+):
+    monkeypatch.setattr(broker, 'query_free_gpus', lambda args: [])
+    fake_tmux[1].update({'session-1', 'session-2'})
+    write_meta(broker_args.state_dir, 1, status='running', pid=1234)
+    running = write_meta(broker_args.state_dir, 2, status='running', pid=1234)
+    broker.tick(broker_args)
+    path = tmp_path / 'ctl.sock'
+    server = control.open_control(path, broker.control_handlers(broker_args))
+    try:
+        statuses = broker.publish_changes(broker_args, server, {})
+        events = serve(
+            server, lambda: control.subscribe(path, [2], timeout=5))
+        assert len(server.subscribers) == 1
+
+        meta = read_meta(running)
+        broker.kill_job(broker_args, running, meta)
+        broker_args._job_table.update([(running, meta)])
+        broker.kill_job(broker_args, *broker_args._job_table.jobs[1])
+        broker_args._job_table.update([broker_args._job_table.jobs[1]])
+        broker.publish_changes(broker_args, server, statuses)
+
+        assert next(events) == {'id': 2, 'status': 'killed'}
+        events.close()
+        broker.wait_for_wakeup(None, 0.5, server)
+        assert server.subscribers == {}
+    finally:
+        server.close()
+
+
+def test_control_socket_survives_stalled_clients_and_failing_requests(
+    tmp_path, monkeypatch,
+):
+    def failing(request):
+        raise sqlite3.OperationalError('database is locked')
+
+    monkeypatch.setattr(control, 'MAX_BACKLOG', 1 << 16)
+    path = tmp_path / 'ctl.sock'
+    server = control.open_control(
+        path, {'list': lambda request: ({'ok': True}, False),
+               'info': failing})
+    idle = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stopped = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        idle.connect(str(path))
+        stopped.connect(str(path))
+        stopped.sendall(b'{"op":"subscribe"}\n')
+        started = time.monotonic()
+        assert serve(server, lambda: control.request(path, 'list')) == {
+            'ok': True}
+        assert serve(server, lambda: control.request(path, 'info')) is None
+        assert len(server.subscribers) == 1
+
+        # The subscriber never reads; publishing must not block on it.
+        for _ in range(200):
+            server.publish([{'id': 1, 'status': 'x' * 1024}])
+        assert server.subscribers == {}
+        assert time.monotonic() - started < control.REQUEST_TIMEOUT
+    finally:
+        idle.close()
+        stopped.close()
+        server.close()
+
+
+def test_tick_reports_whether_broker_has_pending_work(
+    broker_args, fake_tmux, monkeypatch
+):
+    monkeypatch.setattr(broker, 'query_free_gpus', lambda args: [])
+    assert broker.tick(broker_args) is False
+
+    write_meta(broker_args.state_dir, 1, status='success', exitcode=0)
+    assert broker.tick(broker_args) is False
+
+    write_meta(broker_args.state_dir, 2)
+    assert broker.tick(broker_args) is True
+
+
 def test_tmux_cmd_socket_path(broker_args):
     broker_args.socket_path = '/tmp/taskq.sock'
     assert broker.tmux_cmd(broker_args, 'ls') == [
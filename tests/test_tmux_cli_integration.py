@@ -7,6 +7,7 @@ from pathlib import Path
 
 from taskq import TOOL_NAME
 from taskq.backends.tmux import broker
+from taskq.backends.tmux.outputs import rotate_output
 from taskq.cli import CLI
 
 
@@ -264,3 +265,33 @@ def test_tq_add_dry_run_ref_validates_without_creating_worktree(
     assert not fake_tmux_state.exists()
     assert not state_root.exists()
     assert str(state_root) not in git(repo, 'worktree', 'list', '--porcelain')
+
+
+def test_tq_outputs_reads_a_line_range_across_rotated_segments(
+    tmp_path, monkeypatch, capsys
+):
+    monkeypatch.setattr('taskq.actions.add.STDIN_TTY', True)
+    install_fake_tmux(tmp_path, monkeypatch)
+    rc_file = tmp_path / 'tq.toml'
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+    write_tmux_rc(rc_file)
+    run_cli(['add', 'true'], rc_file, capsys)
+    meta_path = next((tmp_path / 'cache').glob('**/jobs/1/meta.json'))
+    meta = json.loads(meta_path.read_text(encoding='utf-8'))
+    meta.update({'status': 'success', 'exitcode': 0, 'session': None})
+    meta_path.write_text(json.dumps(meta), encoding='utf-8')
+    output_file = Path(meta['output_file'])
+    output_file.write_text('one\ntwo\n', encoding='utf-8')
+
+    code, out = run_cli(['outputs', '-R', '-L', '2-3', '1'], rc_file, capsys)
+    assert code in (None, 0)
+    assert out == 'Job 1:\ntwo\n'
+
+    rotate_output(output_file, compression='gzip')
+    output_file.write_text('three\nfour\n', encoding='utf-8')
+    _, out = run_cli(['outputs', '-R', '-L', '2-3', '1'], rc_file, capsys)
+    assert out == 'Job 1:\ntwo\nthree\n'
+    _, out = run_cli(['outputs', '-L', '4-', '1'], rc_file, capsys)
+    assert out == 'Job 1:\n> four\n'
+    assert CLI().main(['-rc', str(rc_file), 'outputs', '-L', '3-2', '1']) == 2
+    assert 'start is greater than end' in capsys.readouterr().err
@@ -0,0 +1,103 @@
+import io
+import os
+import random
+
+import taskq.backends.tmux.lineindex as lineindex
+from taskq.backends.tmux.broker import finished_exitcode
+from taskq.backends.tmux.lineindex import LineIndex, find_last_line, index_path
+from taskq.backends.tmux.lineindex import update_index
+from taskq.backends.tmux.outputs import read_output, rotate_output
+from taskq.common import read_tail_lines
+
+
+def write_log(path, data):
+    with open(path, 'ab') as f:
+        f.write(data)
+
+
+def test_line_index_follows_appends_like_a_full_read(tmp_path, monkeypatch):
+    # Small blocks put '\r\n' pairs and markers across block boundaries.
+    monkeypatch.setattr(lineindex, 'BLOCK_SIZE', 7)
+    path = tmp_path / 'output.log'
+    path.write_bytes(b'')
+    random.seed(3)
+    for _ in range(40):
+        write_log(path, b''.join(
+            random.choice([b'a', b'\n', b'\r', b'\r\n', b'[taskq] ', b'\xc3\xa9'])
+            for _ in range(random.randint(0, 12))))
+        data = path.read_bytes()
+        text = data.replace(b'\r\n', b'\n').replace(b'\r', b'\n').decode(
+            'utf-8', errors='replace')
+        lines = text.splitlines(keepends=True)
+        with LineIndex(path) as index:
+            assert len(index) == len(lines)
+            for tail in range(0, 6):
+                assert index.tail(tail) == read_tail_lines(
+                    io.BytesIO(data), tail)
+            assert index.lines(2, 5) == ''.join(lines[2:5])
+            expected = next((
+                line.rstrip('\n') for line in reversed(lines)
+                if '[taskq] ' in line), None)
+            assert index.find_last('[taskq] ') == expected
+            assert index.find_last('a') == next((
+                line.rstrip('\n') for line in reversed(lines)
+                if 'a' in line), None)
+
+
+def test_line_index_rebuilds_after_the_log_is_replaced(tmp_path):
+    path = tmp_path / 'output.log'
+    path.write_bytes(b'one\ntwo\nthree\n')
+    assert find_last_line(path, 'two') == 'two'
+    path.write_bytes(b'fourth line\n')
+    assert find_last_line(path, 'two') is None
+    with LineIndex(path) as index:
+        assert index.lines(0, 10) == 'fourth line\n'
+
+    write_log(path, b'five\n')
+    assert rotate_output(path)
+    assert not index_path(path).exists()
+    write_log(path, b'six\n')
+    assert read_output(path, 2) == 'six\n'
+    assert read_output(path, 3) == 'five\nsix\n'
+
+
+def test_finished_exitcode_finds_marker_far_from_the_end(tmp_path):
+    path = tmp_path / 'output.log'
+    path.write_bytes(b'[taskq] job 4 started at now\n')
+    meta = {'id': 4, 'output_file': str(path)}
+    assert finished_exitcode(meta) is None
+    write_log(path, b'[taskq] job 4 finished with exit code 3 at now\n')
+    # Output of processes the job left behind keeps coming.
+    write_log(path, (b'x' * 100 + b'\n') * 1000)
+    assert finished_exitcode(meta) == 3
+    with LineIndex(path) as index:
+        assert index.last_tagged == 2
+
+
+def test_readonly_queries_leave_the_index_to_the_broker(tmp_path):
+    path = tmp_path / 'output.log'
+    path.write_bytes(b'[taskq] one\ntwo\n')
+    with LineIndex(path, readonly=True) as index:
+        assert index.find_last('[taskq] ') == '[taskq] one'
+        assert index.tail(2) == 'two\n'
+    assert not index_path(path).exists()
+
+    assert update_index(path)
+    indexed = index_path(path).read_bytes()
+    write_log(path, b'[taskq] three\nfour\n')
+    os.chmod(tmp_path, 0o500)
+    try:
+        with LineIndex(path, readonly=True) as index:
+            assert index.find_last('[taskq] ') == '[taskq] three'
+            assert index.lines(1, 3) == 'two\n[taskq] three\n'
+            assert len(index) == 4
+        assert find_last_line(path, 'two') == 'two'
+    finally:
+        os.chmod(tmp_path, 0o700)
+    assert index_path(path).read_bytes() == indexed
+
+    # A stale index is ignored rather than rebuilt.
+    path.write_bytes(b'fresh\n')
+    assert find_last_line(path, 'two') is None
+    assert find_last_line(path, 'fresh') == 'fresh'
+    assert index_path(path).read_bytes() == indexed
@@ -0,0 +1,96 @@
+import gzip
+import random
+
+import pytest
+
+from taskq.common import tail_lines
+from taskq.backends.tmux import outputs
+from taskq.backends.tmux.outputs import archive_output, read_output
+from taskq.backends.tmux.outputs import rotate_output, segments
+
+
+def write_log(path, text):
+    with open(path, 'a', encoding='utf-8', newline='') as f:
+        f.write(text)
+
+
+def test_rotated_and_archived_segments_read_as_one_log(tmp_path):
+    path = tmp_path / 'output.log'
+    random.seed(7)
+    written = ''
+    for index in range(6):
+        chunk = ''.join(
+            random.choice(['a', 'b', '\n', '\r\n', 'é'])
+            for _ in range(random.randint(0, 40)))
+        write_log(path, chunk)
+        written += chunk
+        rotate_output(path, compression='gzip' if index % 2 else 'none')
+    write_log(path, 'tail\nend')
+    written += 'tail\nend'
+    expected = written.replace('\r\n', '\n')
+
+    assert read_output(path) == expected
+    for tail in range(1, 30):
+        assert read_output(path, tail) == tail_lines(expected, tail)
+
+    assert archive_output(path, 'gzip')
+    assert not path.exists()
+    assert read_output(path) == expected
+    assert read_output(path, 3) == tail_lines(expected, 3)
+
+
+def test_rotate_output_keeps_newest_segments(tmp_path):
+    path = tmp_path / 'output.log'
+    for index in range(4):
+        write_log(path, f'part {index}\n')
+        assert rotate_output(path, keep=2, compression='gzip')
+
+    assert path.read_text() == ''
+    assert [segment.name for segment in segments(path)] == [
+        'output.log.2.gz', 'output.log.1.gz', 'output.log']
+    assert gzip.decompress(
+        (tmp_path / 'output.log.1.gz').read_bytes()) == b'part 3\n'
+    assert read_output(path) == 'part 2\npart 3\n'
+    assert not rotate_output(path, keep=2)
+
+
+def test_rotate_output_keeps_output_appended_during_the_copy(
+    tmp_path, monkeypatch,
+):
+    path = tmp_path / 'output.log'
+    write_log(path, 'before\n')
+    copy = outputs.shutil.copyfileobj
+    appended = []
+
+    def copy_while_job_writes(source, target):
+        copy(source, target)
+        if not appended:
+            appended.append(True)
+            write_log(path, 'during\n')
+
+    monkeypatch.setattr(outputs.shutil, 'copyfileobj', copy_while_job_writes)
+    assert rotate_output(path)
+    write_log(path, 'after\n')
+
+    assert read_output(path) == 'before\nduring\nafter\n'
+
+
+def test_rotate_output_without_keep_truncates(tmp_path):
+    path = tmp_path / 'output.log'
+    write_log(path, 'progress\n' * 10)
+
+    assert rotate_output(path, keep=0)
+
+    assert segments(path) == [path]
+    assert read_output(path) == ''
+
+
+def test_zstd_compression_needs_zstandard(tmp_path):
+    pytest.importorskip('zstandard')
+    path = tmp_path / 'output.log'
+    write_log(path, 'one\ntwo\n')
+
+    assert archive_output(path, 'zstd')
+
+    assert (tmp_path / 'output.log.1.zst').exists()
+    assert read_output(path, 2) == 'two\n'
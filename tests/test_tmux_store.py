@@ -0,0 +1,120 @@
+import json
+import shutil
+from pathlib import Path
+
+import pytest
+
+from taskq.backends.tmux import store as store_module
+from taskq.backends.tmux.store import JobStore
+
+
+def write_meta(root, job_id, **overrides):
+    job_dir = Path(root) / 'jobs' / str(job_id)
+    job_dir.mkdir(parents=True, exist_ok=True)
+    meta = {
+        'id': job_id,
+        'command': f'job {job_id}',
+        'status': 'queued',
+        'exitcode': None,
+    }
+    meta.update(overrides)
+    path = job_dir / 'meta.json'
+    path.write_text(json.dumps(meta), encoding='utf-8')
+    return path
+
+
+@pytest.fixture
+def counting_reads(monkeypatch):
+    reads = []
+    original = store_module._read
+
+    def counting_read(path):
+        reads.append(int(Path(path).parent.name))
+        return original(path)
+
+    monkeypatch.setattr(store_module, '_read', counting_read)
+    return reads
+
+
+def test_store_indexes_existing_job_directories(tmp_path):
+    write_meta(tmp_path, 1, status='success', exitcode=0)
+    write_meta(tmp_path, 2, status='failed', exitcode=1)
+    write_meta(tmp_path, 10, status='running')
+    store = JobStore(tmp_path)
+
+    assert [meta['id'] for _, meta in store.load()] == [1, 2, 10]
+    assert [meta['id'] for _, meta in store.load(ids=[2, 10])] == [2, 10]
+    assert [
+        meta['id'] for _, meta in store.load(statuses=['success'])
+    ] == [1, 10]
+    assert [meta['id'] for _, meta in store.active()] == [10]
+    assert store.statuses([1, 2, 3]) == {1: 'success', 2: 'failed'}
+    assert (tmp_path / store_module.INDEX_NAME).exists()
+
+
+def test_store_serves_terminal_jobs_without_reading_meta(
+    tmp_path, counting_reads,
+):
+    for job_id in range(1, 6):
+        write_meta(tmp_path, job_id, status='success', exitcode=0)
+    write_meta(tmp_path, 6, status='running')
+    JobStore(tmp_path).load()
+    counting_reads.clear()
+
+    reopened = JobStore(tmp_path)
+    assert len(reopened.load()) == 6
+
+    assert counting_reads == [6]
+
+
+def test_store_rereads_advanced_active_jobs_and_drops_removed(tmp_path):
+    store = JobStore(tmp_path)
+    path = write_meta(tmp_path, 1, status='running')
+    write_meta(tmp_path, 2, status='success', exitcode=0)
+    assert store.statuses([1]) == {1: 'running'}
+
+    meta = json.loads(path.read_text(encoding='utf-8'))
+    meta.update({'status': 'failed', 'exitcode': 3})
+    path.write_text(json.dumps(meta), encoding='utf-8')
+    shutil.rmtree(tmp_path / 'jobs' / '2')
+
+    assert [meta['status'] for _, meta in store.load()] == ['failed']
+    assert store.load(statuses=['success']) == []
+
+
+def test_store_put_updates_terminal_rows(tmp_path):
+    store = JobStore(tmp_path)
+    write_meta(tmp_path, 1, status='success', exitcode=0)
+    store.load()
+
+    meta = {'id': 1, 'status': 'failed', 'exitcode': None}
+    store.put(meta)
+
+    assert store.load(ids=[1])[0][1] == meta
+
+
+def test_store_rebuilds_corrupt_index(tmp_path):
+    write_meta(tmp_path, 1, status='success', exitcode=0)
+    (tmp_path / store_module.INDEX_NAME).write_text(
+        'not a database', encoding='utf-8')
+
+    assert JobStore(tmp_path).statuses([1]) == {1: 'success'}
+
+
+def test_store_falls_back_to_job_directories_when_index_fails(
+    tmp_path, monkeypatch,
+):
+    write_meta(tmp_path, 1, status='success', exitcode=0)
+    write_meta(tmp_path, 2, status='running')
+    store = JobStore(tmp_path)
+    store.load()
+
+    def locked(self, db):
+        raise store_module.sqlite3.OperationalError('database is locked')
+
+    monkeypatch.setattr(JobStore, '_sync_directory', locked)
+
+    assert [meta['id'] for _, meta in store.load()] == [1, 2]
+    assert [meta['id'] for _, meta in store.finished()] == [1]
+    assert store.statuses([1, 2, 3]) == {1: 'success', 2: 'running'}
+    assert (tmp_path / store_module.INDEX_NAME).exists()
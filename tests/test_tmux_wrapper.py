@@ -86,3 +86,34 @@ def test_merge_wrapper_keeps_terminal_marker_for_command_failure(tmp_path):
     assert command_result['exitcode'] == 3
     assert command_result['submission_id'] == 'submission-8'
     assert 'finished with exit code 3' in output_file.read_text(encoding='utf-8')
+
+
+def test_file_capture_wrapper_writes_output_without_pane(tmp_path):
+    output_file = tmp_path / 'job' / 'output.log'
+    start_file = tmp_path / 'job' / 'start'
+    result_file = tmp_path / 'job' / 'command-result.json'
+    start_file.parent.mkdir()
+    start_file.touch()
+    wrapper = start_file.parent / 'run.sh'
+    wrapper.write_text(render_wrapper(
+        job_id=9,
+        argv=['sh', '-c', 'echo out; echo err >&2; exit 4'],
+        session='taskq-test-9',
+        output_file=output_file,
+        start_file=start_file,
+        env_exports='',
+        command_result_file=result_file,
+        submission_id='submission-9',
+        output_capture='file',
+    ), encoding='utf-8')
+    wrapper.chmod(0o700)
+
+    result = subprocess.run([str(wrapper)], capture_output=True, text=True)
+
+    assert result.returncode == 4
+    assert result.stdout == result.stderr == ''
+    lines = output_file.read_text(encoding='utf-8').splitlines()
+    assert lines[0].startswith('[taskq] job 9 started at ')
+    assert lines[1:3] == ['out', 'err']
+    assert lines[3].startswith('[taskq] job 9 finished with exit code 4 ')
+    assert json.loads(result_file.read_text(encoding='utf-8'))['exitcode'] == 4
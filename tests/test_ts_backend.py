@@ -1,4 +1,5 @@
 import datetime
+import json
 import subprocess
 
 import pytest
@@ -12,8 +13,8 @@ from taskq.common import FilterArgs
 def ts_backend(monkeypatch):
     monkeypatch.setattr('taskq.backends.base.which', lambda command: command)
     monkeypatch.setattr(
-        'taskq.backends.base.subprocess.check_output',
-        lambda command: b'GPU 0\nGPU 1\n',
+        'taskq.backends.gpus.probe_nvidia_smi',
+        lambda: [[0, 80.0, 80.0], [1, 80.0, 80.0]],
     )
     calls = []
     responses = {
@@ -88,6 +89,76 @@ def test_ts_full_info_parses_details(ts_backend):
     assert info['pid'] == 123
 
 
+def test_ts_full_info_queries_finished_jobs_once(ts_backend, monkeypatch):
+    def queried():
+        return sorted(
+            call[0] for call in ts_backend.calls
+            if call[0][:1] in [('-i',), ('-p',), ('-o',)])
+
+    ts_backend.full_info(tqdm_disable=True)
+    assert queried() == sorted(
+        (flag, str(job_id)) for flag in '-i -p -o'.split()
+        for job_id in range(1, 6))
+
+    del ts_backend.calls[:]
+    info = ts_backend.full_info(tqdm_disable=True)
+    assert queried() == sorted(
+        (flag, str(job_id)) for flag in '-i -p -o'.split()
+        for job_id in [1, 2])
+    assert [job['id'] for job in info] == [1, 2, 3, 4, 5]
+    assert info[0]['command'] == 'echo run'
+
+    # A cleared and refilled queue reuses ids for other jobs.
+    listing = (
+        'ID State Output E-Level Times Command\n'
+        '3 finished /tmp/o9 0 1 echo new\n')
+    exec_ = TaskSpoolerBackend.exec
+    monkeypatch.setattr(
+        TaskSpoolerBackend, 'exec',
+        lambda self, *args, **kwargs: (
+            listing if not args else exec_(self, *args, **kwargs)))
+    del ts_backend.calls[:]
+    ts_backend.full_info(tqdm_disable=True)
+    assert ('-i', '3') in queried()
+
+
+def test_ts_finished_job_details_persist_per_socket(ts_backend, monkeypatch):
+    exec_ = TaskSpoolerBackend.exec
+    details = '\n'.join([
+        'Command: echo ok',
+        'Enqueue time: Mon Jan 01 09:00:00 2024',
+        'Start time: Mon Jan 01 09:01:00 2024',
+        'End time: Mon Jan 01 09:03:30 2024',
+    ])
+
+    def fake_exec(self, *args, **kwargs):
+        out = exec_(self, *args, **kwargs)
+        return details if args == ('-i', 3) else out
+
+    monkeypatch.setattr(TaskSpoolerBackend, 'exec', fake_exec)
+    expected = ts_backend.full_info(ids=[3], tqdm_disable=True)
+    assert ts_backend.info_cache.name == 'tmp-ts-sock.sock.json'
+
+    other = TaskSpoolerBackend('ts', dict(ts_backend.config))
+    del ts_backend.calls[:]
+    info = other.full_info(ids=[3, 4], tqdm_disable=True)
+    assert ('-i', '4') in [call[0] for call in ts_backend.calls]
+    assert ('-i', '3') not in [call[0] for call in ts_backend.calls]
+    assert info[0] == expected[0]
+    assert info[0]['time_run'] == datetime.timedelta(seconds=150)
+
+    monkeypatch.setattr(
+        TaskSpoolerBackend, 'exec',
+        lambda self, *args, **kwargs: (
+            'ID State Output E-Level Times Command\n'
+            '1 running /tmp/o1 0 1 echo run\n'
+            if not args else exec_(self, *args, **kwargs)))
+    TaskSpoolerBackend('ts', dict(ts_backend.config)).full_info(
+        tqdm_disable=True)
+    cache = json.loads(ts_backend.info_cache.read_text(encoding='utf-8'))
+    assert cache['jobs'] == []
+
+
 def test_ts_add_output_and_write_commands(ts_backend):
     ts_backend.add('echo hello world', gpus=2, slots=3)
     assert ts_backend.calls[-1][0] == ('-G', '2', '-N', '3', 'echo', 'hello', 'world')
@@ -120,11 +191,10 @@ def test_ts_backend_info_getset_and_command(ts_backend):
 def test_ts_init_without_nvidia_smi_uses_one_slot(monkeypatch):
     monkeypatch.setattr('taskq.backends.base.which', lambda command: command)
 
-    def raise_missing(command):
+    def raise_missing(*args, **kwargs):
         raise FileNotFoundError
 
-    monkeypatch.setattr(
-        'taskq.backends.base.subprocess.check_output', raise_missing)
+    monkeypatch.setattr('taskq.backends.gpus.subprocess.run', raise_missing)
     monkeypatch.setattr(TaskSpoolerBackend, 'backend_getset', lambda *a, **k: None)
     backend = TaskSpoolerBackend(
         'ts',
@@ -0,0 +1,33 @@
+import os
+
+import pytest
+
+from taskq.watch import Watcher
+
+
+def test_watcher_reports_replaced_and_written_files(tmp_path):
+    with Watcher([tmp_path, tmp_path]) as watcher:
+        if not watcher.active:
+            pytest.skip('inotify is not available')
+        assert watcher.wait(0) == set()
+        (tmp_path / '.meta.json.tmp').write_text('{}', encoding='utf-8')
+        os.replace(tmp_path / '.meta.json.tmp', tmp_path / 'meta.json')
+        assert str(tmp_path / 'meta.json') in watcher.wait(1)
+        with open(tmp_path / 'output.log', 'w', encoding='utf-8') as f:
+            watcher.wait(1)
+            f.write('line\n')
+            f.flush()
+            # Plain writes to an open file are only reported on request.
+            assert watcher.wait(0.05) == set()
+    with Watcher([tmp_path], modify=True) as watcher:
+        with open(tmp_path / 'output.log', 'a', encoding='utf-8') as f:
+            f.write('more\n')
+            f.flush()
+            assert watcher.wait(1) == {str(tmp_path / 'output.log')}
+
+
+def test_watcher_without_paths_is_inactive(tmp_path):
+    with Watcher([]) as watcher:
+        assert not watcher.active
+    with Watcher([tmp_path / 'missing']) as watcher:
+        assert not watcher.active